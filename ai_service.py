@@ -0,0 +1,191 @@
+"""
+AI Service for SpendWise
+Runs Gemini requests on a bounded background executor so a slow model response
+never holds a Flask worker. Replies are cached by normalized prompt, and
+per-user and global limits keep a burst of AI requests from starving the
+expense API.
+
+Job records live in a JobStore. The app keeps them in MongoDB (MongoJobStore),
+so a poll answered by any worker finds the job; LocalJobStore is the
+single-process default. A finished job is kept for job_ttl seconds from the
+moment it completes.
+
+The client only needs `client.models.generate_content(model=..., contents=...)`
+returning an object with `.text`, so tests can pass a local stub. Pass
+`client_factory` instead to build the client on first use, keeping the SDK
+import off the startup path.
+"""
+
+import hashlib
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+import metrics
+from cache import TTLCache
+
+DEFAULT_MODEL = "gemini-1.5-flash"
+# queued or running jobs are given up on after this long (their worker died)
+STALE_JOB_SECONDS = 3600
+
+
+class AIBusy(Exception):
+    """Raised when the job queue or the user's concurrency limit is full."""
+
+
+class LocalJobStore:
+    """Jobs in this process's memory; fine for a single worker."""
+
+    def __init__(self, maxsize: int = 1000):
+        self._jobs = TTLCache(maxsize=maxsize)
+
+    def save(self, job: Dict[str, Any], ttl: float) -> None:
+        # a copy, so readers never see a record the runner is changing
+        self._jobs.set(job["id"], dict(job), ttl)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._jobs.get(job_id)
+
+
+class MongoJobStore:
+    """Jobs in a MongoDB collection shared by every worker.
+
+    Expiry is a TTL index on `expires_at` (created by init_db.py).
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def save(self, job: Dict[str, Any], ttl: float) -> None:
+        doc = {k: v for k, v in job.items() if k != "id"}
+        doc["expires_at"] = datetime.utcnow() + timedelta(seconds=ttl)
+        self.collection.replace_one({"_id": job["id"]}, doc, upsert=True)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        doc = self.collection.find_one({"_id": job_id}, {"expires_at": 0})
+        if doc is None:
+            return None
+        doc["id"] = doc.pop("_id")
+        return doc
+
+
+class AIService:
+    """Submit prompts as background jobs and poll them by id."""
+
+    def __init__(self, client=None, model: str = DEFAULT_MODEL, max_workers: int = 4,
+                 max_pending: int = 32, per_user_limit: int = 2,
+                 cache_ttl: float = 3600, cache_size: int = 1000, job_ttl: float = 600,
+                 client_factory: Optional[Callable[[], Any]] = None, jobs=None):
+        self._client = client
+        self._client_factory = client_factory
+        self.model = model
+        self.max_pending = max_pending
+        self.per_user_limit = per_user_limit
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ai")
+        self._replies = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        # finished jobs are kept for job_ttl seconds so clients can poll them
+        self.job_ttl = job_ttl
+        self._jobs = jobs or LocalJobStore(maxsize=max(cache_size, max_pending * 4))
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._per_user = {}
+
+    @property
+    def client(self):
+        """The model client, built by `client_factory` on first access."""
+        if self._client is None and self._client_factory is not None:
+            with self._lock:
+                if self._client_factory is not None:
+                    self._client = self._client_factory()
+                    self._client_factory = None
+        return self._client
+
+    @property
+    def available(self) -> bool:
+        return self.client is not None
+
+    @staticmethod
+    def normalize_prompt(prompt: str) -> str:
+        """Collapse whitespace and case so trivially different prompts share a cache entry."""
+        return " ".join(prompt.split()).casefold()
+
+    def _cache_key(self, prompt: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{self.normalize_prompt(prompt)}".encode("utf-8")).hexdigest()
+
+    def cached_reply(self, prompt: str) -> Optional[str]:
+        """Return a previously generated reply for an equivalent prompt, if any."""
+        return self._replies.get(self._cache_key(prompt))
+
+    def submit(self, username: str, prompt: str) -> Dict[str, Any]:
+        """Queue a prompt and return its job record. Raises AIBusy when over a limit."""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise AIBusy("AI service is busy, try again shortly")
+            if self._per_user.get(username, 0) >= self.per_user_limit:
+                raise AIBusy("too many AI requests in progress")
+            self._pending += 1
+            self._per_user[username] = self._per_user.get(username, 0) + 1
+
+        job = {
+            "id": uuid.uuid4().hex,
+            "user": username,
+            "status": "queued",
+            "reply": None,
+            "error": None,
+            "created_at": time.time(),
+        }
+        try:
+            self._jobs.save(job, STALE_JOB_SECONDS)
+        except Exception:
+            self._release(username)
+            raise
+        try:
+            self._executor.submit(self._run, job, prompt)
+        except RuntimeError:
+            self._release(username)
+            raise AIBusy("AI service is shutting down")
+        return job
+
+    def get_job(self, job_id: str, username: str) -> Optional[Dict[str, Any]]:
+        """Return the caller's job, or None if it is unknown, expired or not theirs."""
+        job = self._jobs.get(job_id)
+        if not job or job["user"] != username:
+            return None
+        return job
+
+    def _run(self, job: Dict[str, Any], prompt: str) -> None:
+        try:
+            job["status"] = "running"
+            self._jobs.save(job, STALE_JOB_SECONDS)
+            response = metrics.time_gemini(
+                lambda: self.client.models.generate_content(model=self.model, contents=prompt))
+            job["reply"] = response.text
+            job["status"] = "done"
+            self._replies.set(self._cache_key(prompt), response.text)
+        except Exception as e:
+            job["error"] = str(e)
+            job["status"] = "error"
+        finally:
+            self._release(job["user"])
+        # the expiry starts now that the result is in
+        self._jobs.save(job, self.job_ttl)
+
+    def _release(self, username: str) -> None:
+        with self._lock:
+            self._pending -= 1
+            remaining = self._per_user.get(username, 1) - 1
+            if remaining > 0:
+                self._per_user[username] = remaining
+            else:
+                self._per_user.pop(username, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = self._pending
+        return {"pending": pending, "replies": self._replies.stats()}
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
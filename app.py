@@ -1,37 +1,94 @@
-from flask import Flask, jsonify, request, render_template, redirect, url_for, make_response
+import time
+_IMPORT_STARTED = time.perf_counter()  # create_app() reports boot time from here
+
+from flask import Blueprint, Flask, Response, current_app, g, has_app_context, jsonify, request, render_template, redirect, url_for, make_response, stream_with_context
 from werkzeug.security import generate_password_hash, check_password_hash
 from bson import ObjectId
-from datetime import datetime
+from datetime import datetime, timezone
 from flask_login import LoginManager, UserMixin, login_user, logout_user, current_user, login_required
-from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+from itsdangerous import URLSafeSerializer, URLSafeTimedSerializer, BadSignature, SignatureExpired
 import io
 import csv
+import hashlib
+import hmac
+import json
+import logging
 import math
 import os
+import zlib
 from flask_cors import CORS
-from pymongo import MongoClient
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
 from bson.objectid import ObjectId
 from flask import jsonify
 from flask_login import login_required, current_user
 from collections import defaultdict
-from google import genai # The new SDK
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+import batch_reports
+import change_feed
+import columnar
+import dates
+import forecasting
+import metrics
+import rollups
+import summary
+import versions
+from cache import TTLCache, build_result_cache
+from db_utils import DatabaseHelper, LazyCollection, LazyDatabase, db_stats, get_db
+from ai_service import AIService, AIBusy, MongoJobStore
 
 # Load the key from the .env file
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # ---------------- FLASK APP SETUP ---------------- 
-app = Flask(__name__)
-CORS(app)
-app.secret_key = os.environ.get("FLASK_SECRET", "dev-secret-please-change")
+SECRET_KEY = os.environ.get("FLASK_SECRET", "dev-secret-please-change")
 
-# serializer for token-based auth (optional)
-serializer = URLSafeTimedSerializer(app.secret_key)
+# Every route is registered on this blueprint; create_app() attaches it to an app
+bp = Blueprint('main', __name__)
 
-# Flask-Login setup
+# serializer for token-based auth (optional)
+serializer = URLSafeTimedSerializer(SECRET_KEY)
+TOKEN_MAX_AGE = 60 * 60 * 24 * 30
+
+# Verified tokens (keyed by SHA-256 digest) and session users, so hot requests
+# skip signature checks and the users collection
+AUTH_CACHE_TTL = float(os.environ.get("AUTH_CACHE_TTL", 300))
+token_cache = TTLCache(maxsize=10000, ttl=AUTH_CACHE_TTL)
+user_cache = TTLCache(maxsize=10000, ttl=AUTH_CACHE_TTL)
+# Confirmed (user, group) memberships; only positive answers are cached, so a
+# join takes effect immediately
+membership_cache = TTLCache(maxsize=10000, ttl=AUTH_CACHE_TTL)
+# Optional cap on members per group (0, the default, means no cap). Members are
+# an array in the group document, which every roster read carries and which
+# counts toward its 16 MB limit; set a cap if groups can grow very large.
+GROUP_MAX_MEMBERS = int(os.environ.get("GROUP_MAX_MEMBERS", 0))
+
+# Computed analytics/summary/prediction results; set RESULT_CACHE_URL=redis://...
+# to share one cache between workers
+result_cache = build_result_cache(
+    os.environ.get("RESULT_CACHE_URL"),
+    maxsize=int(os.environ.get("RESULT_CACHE_SIZE", 2048)),
+    ttl=float(os.environ.get("RESULT_CACHE_TTL", 600)),
+)
+# Hot users' expenses as numpy columns for analytics/summary/predict (see
+# columnar.py); opt in with a per-worker memory budget
+column_cache = columnar.ColumnCache(
+    budget_bytes=int(float(os.environ.get("COLUMNAR_CACHE_MB", 0)) * 2**20)
+)
+# Writes reach every worker through MongoDB change streams when CHANGE_FEED=on
+# (needs a replica set, see change_feed.py); they drop cached results and are
+# pushed to browsers on asgi_app.py's /api/events
+CHANGE_FEED = os.environ.get("CHANGE_FEED", "off").lower() == "on"
+event_broker = change_feed.Broker()
+# signs the opaque continuation cursors handed out by paginated endpoints
+cursor_serializer = URLSafeSerializer(SECRET_KEY, salt='page-cursor')
+
+# Flask-Login setup (bound to the app in create_app)
 login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login_page'
+login_manager.login_view = 'main.login_page'
 
 
 class User(UserMixin):
@@ -40,222 +97,468 @@ class User(UserMixin):
         self.name = name or username
 
 
+def create_app(config=None):
+    """Build the Flask app.
+
+    Cheap by design: MongoDB is connected and the Gemini SDK imported on first
+    use, and indexes are created by init_db.py, so workers boot in milliseconds.
+    """
+    started = time.perf_counter()
+    # no-op when the server (e.g. gunicorn --log-config) already set up logging
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"),
+                        format="%(asctime)s %(levelname)s [%(process)d] %(name)s: %(message)s")
+    app = Flask(__name__)
+    app.secret_key = SECRET_KEY
+    if config:
+        app.config.update(config)
+    CORS(app)
+    login_manager.init_app(app)
+    app.register_blueprint(bp)
+    now = time.perf_counter()
+    logger.info("SpendWise app created in %.1f ms (%.1f ms after import began)",
+                (now - started) * 1000, (now - _IMPORT_STARTED) * 1000)
+    return app
+
+
 # ============ MONGODB CONFIGURATION ============
-def init_mongodb():
-    """Initialize MongoDB connection with proper error handling and configuration."""
-    try:
-        mongo_uri = os.getenv("MONGODB_URI", "mongodb://localhost:27017/")
-        db_name = os.getenv("MONGODB_DB_NAME", "SpendWiseDB")
-        
-        # Create MongoClient with connection pooling and timeouts
-        mongo_client = MongoClient(
-            mongo_uri,
-            serverSelectionTimeoutMS=5000,
-            connectTimeoutMS=10000,
-            retryWrites=True,
-            maxPoolSize=50,
-            minPoolSize=10
-        )
-        
-        # Test connection
-        mongo_client.admin.command('ping')
-        print(f"✓ MongoDB connected successfully to {db_name}")
-        
-        return mongo_client, mongo_client[db_name]
-    except Exception as e:
-        print(f"✗ MongoDB connection error: {e}")
-        print("  Ensure MongoDB is running. For local setup, run: mongod")
-        raise
-
-# Initialize MongoDB
-try:
-    mongo_client, db = init_mongodb()
-    # Initialize collections
-    expenses_collection = db["expenses"]
-    users_collection = db["users"]
-    income_col = db["income"]
-    budgets_collection = db["budgets"]
-    groups_collection = db["groups"]
-    
-    # Create indexes for better performance
-    expenses_collection.create_index("user")
-    users_collection.create_index("username", unique=True)
-    users_collection.create_index("email", unique=True)
-    groups_collection.create_index("created_by")
-    print("✓ Database indexes created")
-except Exception as e:
-    print(f"✗ Failed to initialize database: {e}")
-    raise
-
-
-# Initialize the Gemini Client
-try:
+# One pooled, fork-safe client per process, created on first use (see db_utils.py)
+db = LazyDatabase()
+expenses_collection = LazyCollection("expenses")
+users_collection = LazyCollection("users")
+income_col = LazyCollection("income")
+income_totals_collection = LazyCollection("income_totals")
+budgets_collection = LazyCollection("budgets")
+groups_collection = LazyCollection("groups")
+
+
+def make_ai_client():
+    """Build the Gemini client; google.genai is only imported when AI is first used."""
     gemini_key = os.getenv("GEMINI_API_KEY")
-    if gemini_key:
+    if not gemini_key:
+        logger.warning("GEMINI_API_KEY not set. AI features will be unavailable.")
+        return None
+    try:
+        from google import genai  # The new SDK
         client = genai.Client(api_key=gemini_key)
-        print("✓ Gemini AI client initialized")
-    else:
-        client = None
-        print("⚠ GEMINI_API_KEY not set. AI features will be unavailable.")
-except Exception as e:
-    client = None
-    print(f"⚠ Gemini initialization warning: {e}")
+        logger.info("Gemini AI client initialized")
+        return client
+    except Exception as e:
+        logger.warning("Gemini initialization failed: %s", e)
+        return None
+
+
+# Gemini calls run on a bounded background pool; see ai_service.py. Jobs are
+# stored in MongoDB so a poll can land on any worker.
+ai_service = AIService(
+    client_factory=make_ai_client,
+    max_workers=int(os.getenv("AI_MAX_WORKERS", 4)),
+    max_pending=int(os.getenv("AI_MAX_PENDING", 32)),
+    per_user_limit=int(os.getenv("AI_USER_CONCURRENCY", 2)),
+    cache_ttl=float(os.getenv("AI_CACHE_TTL", 3600)),
+    job_ttl=float(os.getenv("AI_JOB_TTL", 600)),
+    jobs=MongoJobStore(LazyCollection("ai_jobs")),
+)
 
 
 @login_manager.user_loader
 def load_user(username):
-    user_doc = users_collection.find_one({'username': username})
-    if user_doc:
-        return User(username, user_doc.get('name'))
+    user = user_cache.get(username)
+    if user is not None:
+        return user
+    record = DatabaseHelper.get_user(db, username)
+    if record:
+        user = User(username, record.name)
+        user_cache.set(username, user)
+        return user
     return None
 
 # ---------------- FRONTEND ROUTES ---------------- #
 
-@app.route("/")
+@bp.route("/")
 def home():
     return render_template("index.html")
 
-@app.route("/add-expense-page")
+@bp.route("/add-expense-page")
 @login_required
 def add_expense_page():
     return render_template("add_expense.html")
 
-@app.route('/add-income')
-@login_required
-def add_income_page():
-    return render_template('income.html')
-
-@app.route('/view-income')
+@bp.route('/view-income')
 @login_required
 def view_income_page():
     return render_template('view_income.html')
 
 
-@app.route("/view-expense-page")
+@bp.route("/view-expense-page")
 @login_required
 def view_expense_page():
     return render_template("view_expenses.html")
 
 
-@app.route('/analytics-page')
+@bp.route('/analytics-page')
 @login_required
 def analytics_page():
     # Page is public — JS will call APIs and redirect to /login on 401 if needed
     return render_template('analytics.html')
 
 
-@app.route('/ai')
+@bp.route('/ai')
 @login_required
 def ai_page():
     return render_template('ai.html')
 
 
-@app.route('/gamification')
+@bp.route('/gamification')
 @login_required
 def gamification_page():
     return render_template('gamification.html')
 
 
 # ============ AI ROUTE ============
-@app.route('/api/ai', methods=['POST'])
+@bp.route('/api/ai', methods=['POST'])
 @login_required
 def ai_feature():
-    """AI-powered expense analysis endpoint."""
-    if not client:
+    """AI-powered expense analysis endpoint.
+
+    Answers from the reply cache when possible; otherwise queues the prompt and
+    returns 202 with a job id to poll at /api/ai/jobs/<job_id>.
+    """
+    if not ai_service.available:
         return jsonify({"error": "AI service not available"}), 503
-    
+
+    username = get_request_username()
+    user_msg = (request.json or {}).get('message')
+    if not user_msg:
+        return jsonify({"error": "Message required"}), 400
+
+    reply = ai_service.cached_reply(user_msg)
+    if reply is not None:
+        return jsonify({"reply": reply, "cached": True}), 200
+
     try:
-        user_msg = request.json.get('message')
-        if not user_msg:
-            return jsonify({"error": "Message required"}), 400
-        
-        response = client.models.generate_content(
-            model="gemini-1.5-flash",
-            contents=user_msg
-        )
-        return jsonify({"reply": response.text}), 200
-    except Exception as e:
-        print(f"AI Error: {e}")
-        return jsonify({"error": str(e)}), 500
+        job = ai_service.submit(username, user_msg)
+    except AIBusy as e:
+        resp = jsonify({"error": str(e)})
+        resp.headers['Retry-After'] = '2'
+        return resp, 429
+    return jsonify({
+        "job_id": job['id'],
+        "status": job['status'],
+        "status_url": url_for('main.ai_job_status', job_id=job['id'])
+    }), 202
+
+
+@bp.route('/api/ai/jobs/<job_id>', methods=['GET'])
+@login_required
+def ai_job_status(job_id):
+    """Poll a queued AI request. status is queued, running, done or error."""
+    job = ai_service.get_job(job_id, get_request_username())
+    if not job:
+        return jsonify({"error": "job not found"}), 404
+    out = {"job_id": job['id'], "status": job['status']}
+    if job['status'] == 'done':
+        out['reply'] = job['reply']
+    elif job['status'] == 'error':
+        logger.warning("AI job %s failed: %s", job['id'], job['error'])
+        out['error'] = job['error']
+    return jsonify(out), 200
 
 
 # ---------------- API ROUTES ---------------- #
 
-@app.route('/add-expense', methods=['POST'])
+@bp.route('/add-expense', methods=['POST'])
 @login_required
 def add_expense():
     # Accept either session-based login (Flask-Login) or Bearer token
-    def get_req_user():
-        # check Authorization header for Bearer token
-        auth = request.headers.get('Authorization', '')
-        if auth.startswith('Bearer '):
-            tok = auth.split(' ', 1)[1]
-            try:
-                data = serializer.loads(tok, max_age=60 * 60 * 24 * 30)
-                return data.get('username')
-            except (SignatureExpired, BadSignature):
-                return None
-        if current_user and current_user.is_authenticated:
-            return current_user.id
-        return None
-
-    user = get_req_user()
+    user = get_request_username()
     if not user:
         return jsonify({'error': 'not authenticated'}), 401
 
     data = request.json or {}
+    try:
+        expense = build_expense(data, user)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    res = expenses_collection.insert_one(expense)
+    rollups.apply_expense(db, expense)
+    record_expense_write(user, upserted=[expense])
+    return jsonify({'message': 'Expense added successfully', 'id': str(res.inserted_id)}), 201
+
+
+def build_expense(data, user):
+    """Validate an expense payload and return the document to insert.
+
+    Shared by /add-expense and the bulk import so both apply the same rules.
+    Raises ValueError with a client-facing message.
+    """
     try:
         amount = float(data.get('amount') or 0)
-    except ValueError:
-        return jsonify({'error': 'invalid amount'}), 400
+    except (TypeError, ValueError):
+        raise ValueError('invalid amount')
 
-    expense = {
+    return {
         'amount': amount,
         'category': data.get('category'),
         'note': data.get('note'),
-        'date': data.get('date') or datetime.utcnow().strftime('%Y-%m-%d'),
+        **dates.date_fields(data.get('date')),
         'user': user
     }
 
-    res = expenses_collection.insert_one(expense)
-    return jsonify({'message': 'Expense added successfully', 'id': str(res.inserted_id)}), 201
 
+# ---------------- BULK IMPORT ---------------- #
+
+IMPORT_BATCH_SIZE = 500
+MAX_IMPORT_BATCH_SIZE = 5000
+# per-row errors listed in the response; the rest are only counted
+MAX_IMPORT_ERRORS = 1000
+
+
+def iter_import_rows(stream, fmt):
+    """Yield (row_number, row_dict, error) from a CSV or NDJSON byte stream."""
+    text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    if fmt == 'csv':
+        for n, row in enumerate(csv.DictReader(text), 1):
+            yield n, row, None
+        return
+    n = 0
+    for line in text:
+        if not line.strip():
+            continue
+        n += 1
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield n, None, 'invalid JSON'
+            continue
+        if not isinstance(row, dict):
+            yield n, None, 'row must be a JSON object'
+            continue
+        yield n, row, None
+
+
+def insert_import_batch(batch, report):
+    """insert_many one batch of (row_number, row_key, doc), recording per-row outcomes."""
+    docs = [doc for _, _, doc in batch]
+    failed = {}
+    try:
+        expenses_collection.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        failed = {err['index']: err for err in e.details.get('writeErrors', [])}
+
+    inserted = [doc for i, doc in enumerate(docs) if i not in failed]
+    rollups.apply_expenses(db, inserted)
+    if inserted:
+        record_expense_write(inserted[0]['user'], upserted=inserted)
+    report['inserted'] += len(inserted)
+
+    for i, err in sorted(failed.items()):
+        row_no, row_key, _ = batch[i]
+        if err.get('code') == 11000:
+            # row_key already imported: a retried upload is a no-op for that row
+            report['duplicates'] += 1
+        else:
+            record_import_error(report, row_no, row_key, err.get('errmsg', 'write failed'))
+
+
+def record_import_error(report, row_no, row_key, message):
+    report['error_count'] += 1
+    if len(report['errors']) < MAX_IMPORT_ERRORS:
+        report['errors'].append({'row': row_no, 'row_key': row_key, 'error': message})
 
-@app.route('/get-expenses', methods=['GET'])
+
+@bp.route('/api/expenses/import', methods=['POST'])
+def api_import_expenses():
+    """Bulk import expenses from a CSV or NDJSON upload.
+
+    The body is the raw file (or a multipart `file` field). Rows use the same
+    fields and validation as /add-expense; an optional `row_key` column makes
+    the import idempotent, so a failed upload can simply be retried.
+    Query params: format=csv|ndjson (default from Content-Type), batch_size.
+    """
+    username = get_request_username()
+    if not username:
+        return jsonify({'error': 'not authenticated'}), 401
+
+    fmt = request.args.get('format')
+    if not fmt:
+        fmt = 'ndjson' if 'json' in (request.mimetype or '') else 'csv'
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({'error': 'format must be csv or ndjson'}), 400
+    try:
+        batch_size = int(request.args.get('batch_size') or IMPORT_BATCH_SIZE)
+    except ValueError:
+        return jsonify({'error': 'invalid batch_size'}), 400
+    batch_size = max(1, min(batch_size, MAX_IMPORT_BATCH_SIZE))
+
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('file')
+        if not upload:
+            return jsonify({'error': 'file required'}), 400
+        stream = upload.stream
+    else:
+        stream = request.stream
+
+    report = {'rows': 0, 'inserted': 0, 'duplicates': 0, 'error_count': 0, 'errors': []}
+    batch = []
+    try:
+        for row_no, row, error in iter_import_rows(stream, fmt):
+            report['rows'] += 1
+            row_key = (row or {}).get('row_key') or None
+            if error is None:
+                try:
+                    doc = build_expense(row, username)
+                except ValueError as e:
+                    error = str(e)
+            if error is not None:
+                record_import_error(report, row_no, row_key, error)
+                continue
+            if row_key is not None:
+                doc['import_key'] = str(row_key)
+            batch.append((row_no, row_key, doc))
+            if len(batch) >= batch_size:
+                insert_import_batch(batch, report)
+                batch = []
+    except UnicodeDecodeError:
+        record_import_error(report, report['rows'] + 1, None, 'file must be UTF-8 encoded')
+    if batch:
+        insert_import_batch(batch, report)
+
+    return jsonify(report), 200
+
+
+@bp.route('/get-expenses', methods=['GET'])
 @login_required
 def get_expenses():
     # allow token or session
-    auth = request.headers.get('Authorization', '')
-    username = None
-    if auth.startswith('Bearer '):
-        tok = auth.split(' ', 1)[1]
-        try:
-            data = serializer.loads(tok, max_age=60 * 60 * 24 * 30)
-            username = data.get('username')
-        except (SignatureExpired, BadSignature):
-            username = None
-    if not username and current_user and current_user.is_authenticated:
-        username = current_user.id
+    username = get_request_username()
     if not username:
         return jsonify({'error': 'not authenticated'}), 401
+    etag = data_etag(versions.user_key(username))
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    try:
+        out, next_cursor = expenses_page(username, request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    resp = tag_response(jsonify(out), etag)
+    if next_cursor:
+        resp.headers['X-Next-Cursor'] = next_cursor
+    return resp, 200
+
+
+def expenses_page(username, args):
+    """Return (expenses, next_cursor) for one page of a user's expenses.
+
+    `args` holds the limit/cursor/from/to/category query params. Raises
+    ValueError for invalid params.
+    """
+    query, limit = expenses_page_query(username, args)
+    # Newest first on the (user, date, _id) index; fetch one extra row to know if
+    # there is a next page without counting the whole history.
+    docs = list(expenses_collection.find(query, EXPENSE_FIELDS)
+                .sort(EXPENSE_PAGE_SORT)
+                .limit(limit + 1))
+    return shape_expenses_page(docs, limit)
+
+
+def expenses_page_query(username, args):
+    """Return (query, limit) for one page of a user's expenses (shared with asgi_app.py)."""
+    limit = parse_page_limit(args.get('limit'))
+    base = {'user': username}
+    if args.get('category'):
+        base['category'] = args['category']
+    cursor = args.get('cursor')
+    query = combine_filters(
+        base,
+        date_range_filter(args.get('from'), args.get('to')),
+        keyset_filter(*decode_cursor(cursor)) if cursor else None
+    )
+    return query, limit
+
+
+def shape_expenses_page(docs, limit):
+    """Turn up to limit + 1 fetched docs into (expenses, next_cursor)."""
+    has_more = len(docs) > limit
+    docs = docs[:limit]
 
-    expenses = list(expenses_collection.find({'user': username}, { }))
-    # convert _id to string and keep fields
     out = []
-    for e in expenses:
+    for e in docs:
         out.append({
             'id': str(e.get('_id')),
             'amount': e.get('amount'),
             'category': e.get('category'),
             'note': e.get('note'),
-            'date': e.get('date')
+            'date': dates.format_date(e.get('date'))
         })
-    return jsonify(out), 200
+    return out, (encode_cursor(docs[-1]) if has_more else None)
+
+
+# ---------------- PAGINATION HELPERS ---------------- #
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Fields returned by /get-expenses (_id is included by default)
+EXPENSE_FIELDS = {'amount': 1, 'category': 1, 'note': 1, 'date': 1}
+EXPENSE_PAGE_SORT = [('date', -1), ('_id', -1)]
+
+
+def parse_page_limit(raw):
+    """Validate a `limit` query param, falling back to DEFAULT_PAGE_SIZE."""
+    if not raw:
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise ValueError('invalid limit')
+    if limit < 1:
+        raise ValueError('invalid limit')
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def date_range_filter(date_from=None, date_to=None):
+    """Return a `date` filter for inclusive YYYY-MM-DD bounds (either may be omitted).
+
+    Matches native and, until the date migration finishes, legacy string dates.
+    """
+    return dates.range_filter(date_from, date_to)
+
+
+def combine_filters(*filters):
+    """AND together query dicts, skipping empty ones (several may carry $or)."""
+    filters = [f for f in filters if f]
+    if not filters:
+        return {}
+    return filters[0] if len(filters) == 1 else {'$and': filters}
+
+
+def encode_cursor(doc):
+    """Opaque continuation cursor pointing just after `doc` in (date, _id) order."""
+    return cursor_serializer.dumps({'d': dates.encode_value(doc.get('date')), 'i': str(doc['_id'])})
+
+
+def decode_cursor(token):
+    try:
+        data = cursor_serializer.loads(token)
+        return dates.decode_value(data['d']), ObjectId(data['i'])
+    except Exception:
+        raise ValueError('invalid cursor')
+
+
+def keyset_filter(date, oid):
+    """Documents strictly after (date, oid) when sorted by date desc, _id desc."""
+    return dates.keyset_after('date', date, oid)
 
 
 # ---------------- ADD INCOME ----------------
-@app.route("/add-income", methods=["GET", "POST"])
+@bp.route("/add-income", methods=["GET", "POST"])
+@login_required
 def add_income():
+    username = current_user.id
     if request.method == "POST":
         amount = request.form.get("amount")
         source = request.form.get("source")
@@ -264,193 +567,414 @@ def add_income():
 
         if not amount or not source or not date:
             return "Missing fields", 400
+        try:
+            income = {
+                "amount": float(amount),
+                "source": source,
+                "note": note,
+                "date": dates.parse_date(date),
+                "user": username
+            }
+        except ValueError:
+            return "Invalid amount or date", 400
+
+        # make sure the running total exists before it is incremented
+        income_total(username)
+        income_col.insert_one(income)
+        income_totals_collection.update_one(
+            {"_id": username}, {"$inc": {"total": income["amount"], "count": 1}}, upsert=True
+        )
+        bump_versions(versions.income_key(username))
 
-        income_col.insert_one({
-            "amount": float(amount),
-            "source": source,
-            "note": note,
-            "date": datetime.strptime(date, "%Y-%m-%d")
-        })
+        return redirect(url_for("main.add_income"))
 
-        return redirect(url_for("add_income"))
-
-    # total income
-    total = 0
-    result = income_col.aggregate([
-        {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
-    ])
-    for r in result:
-        total = r["total"]
-
-    return render_template("income.html", total_income=total)
-
-
-# ---------------- VIEW ALL INCOME ----------------
-@app.route("/view-income")
-def view_income():
-    data = []
-    for inc in income_col.find().sort("date", -1):
-        data.append({
-            "amount": inc["amount"],
-            "source": inc["source"],
-            "note": inc.get("note", ""),
-            "date": inc["date"].strftime("%Y-%m-%d")
-        })
-    return jsonify(data)
+    return render_template("income.html", total_income=income_total(username))
 
 
-@app.route('/api/analytics', methods=['GET'])
-@login_required
-def analytics_api():
-    # Accept either session-based login or Bearer token
+@bp.route('/api/get-income', methods=['GET'])
+def get_income():
+    """One page of the caller's income, newest first.
+
+    Query params: limit (default 100, max 500), cursor (the `next_cursor` of
+    the previous page), from/to (YYYY-MM-DD). `total` is the running total
+    over all of the user's income.
+    """
     username = get_request_username()
     if not username:
         return jsonify({'error': 'not authenticated'}), 401
+    etag = data_etag(versions.income_key(username))
+    cached = not_modified(etag)
+    if cached:
+        return cached
 
-    # Expenses are stored with key 'user' (username); support legacy 'user_id' as well
-    expenses = list(expenses_collection.find({'$or': [{'user': username}, {'user_id': username}]}))
-
-    if not expenses:
-        return jsonify({
-            "total_spent": 0,
-            "prediction_next_month": 0,
-            "top_merchant": "N/A",
-            "spending_by_category": [],
-            "monthly_trend": []
-        })
-
-    # ---- Total Spent ----
-    total_spent = sum(float(e['amount']) for e in expenses)
-
-    # ---- Spending by Category ----
-    category_map = defaultdict(float)
-    for e in expenses:
-        category_map[e.get('category', 'Other')] += float(e['amount'])
-
-    spending_by_category = [
-        {"category": k, "total_spent": v}
-        for k, v in category_map.items()
-    ]
-
-    # ---- Monthly Trend ----
-    monthly_map = defaultdict(float)
-    for e in expenses:
-        date = e.get('date')
-        if isinstance(date, str):
-            month = date[:7]  # YYYY-MM
-        else:
-            month = datetime.now().strftime('%Y-%m')
-        monthly_map[month] += float(e['amount'])
-
-    monthly_trend = [
-        {"month": k, "total_spent": v}
-        for k, v in sorted(monthly_map.items())
-    ]
-
-    # ---- Top Merchant ----
-    merchant_map = defaultdict(float)
-    for e in expenses:
-        merchant_map[e.get('note', 'Unknown')] += float(e['amount'])
-
-    top_merchant = max(merchant_map, key=merchant_map.get)
+    try:
+        limit = parse_page_limit(request.args.get('limit'))
+        cursor = request.args.get('cursor')
+        query = combine_filters(
+            {'user': username},
+            date_range_filter(request.args.get('from'), request.args.get('to')),
+            keyset_filter(*decode_cursor(cursor)) if cursor else None
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # (user, date, _id) index: reads one page, not every tenant's income
+    docs = list(income_col.find(query, INCOME_FIELDS)
+                .sort([('date', -1), ('_id', -1)])
+                .limit(limit + 1))
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+
+    incomes = [{
+        'id': str(inc['_id']),
+        'amount': inc.get('amount'),
+        'source': inc.get('source'),
+        'note': inc.get('note') or '',
+        'date': dates.format_date(inc.get('date'))
+    } for inc in docs]
+    return tag_response(jsonify({
+        'incomes': incomes,
+        'total': income_total(username),
+        'next_cursor': encode_cursor(docs[-1]) if has_more else None
+    }), etag), 200
+
+
+# Fields returned by /api/get-income (_id is included by default)
+INCOME_FIELDS = {'amount': 1, 'source': 1, 'note': 1, 'date': 1}
+
+
+def income_total(username):
+    """The user's total income from the income_totals counter.
+
+    Maintained with $inc by add_income; users whose income predates the
+    counter get it backfilled from one index-backed aggregation.
+    """
+    doc = income_totals_collection.find_one({'_id': username}, {'total': 1})
+    if doc:
+        return doc.get('total', 0)
+    rows = list(income_col.aggregate([
+        {'$match': {'user': username}},
+        {'$group': {'_id': None, 'total': {'$sum': '$amount'}, 'count': {'$sum': 1}}}
+    ]))
+    total = rows[0]['total'] if rows else 0
+    count = rows[0]['count'] if rows else 0
+    income_totals_collection.update_one(
+        {'_id': username}, {'$setOnInsert': {'total': total, 'count': count}}, upsert=True
+    )
+    return total
 
-    # ---- Simple Prediction (avg) ----
-    prediction = total_spent / max(len(monthly_trend), 1)
 
-    return jsonify({
-        "total_spent": total_spent,
-        "prediction_next_month": round(prediction, 2),
-        "top_merchant": top_merchant,
-        "spending_by_category": spending_by_category,
-        "monthly_trend": monthly_trend
-    })
+@bp.route('/api/analytics', methods=['GET'])
+@login_required
+def analytics_api():
+    # Accept either session-based login or Bearer token
+    username = get_request_username()
+    if not username:
+        return jsonify({'error': 'not authenticated'}), 401
+    etag = data_etag(versions.user_key(username))
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    result = result_cache.get_or_compute(
+        etag, [versions.user_key(username)], lambda: compute_analytics(username)
+    )
+    return tag_response(jsonify(result), etag)
+
+
+def compute_analytics(username):
+    # Served from the incrementally maintained rollups (see rollups.py) instead of
+    # rescanning every expense.
+    user_rollups = user_rollup_docs(username)
+    result = rollups.build_analytics(user_rollups)
+    # same number as /api/predict
+    result['prediction_next_month'] = forecasting.get_forecast(
+        db, username, lambda: user_rollups['months'])['prediction']
+    return result
+
+
+def user_rollup_docs(username):
+    """The user's rollup documents: from their cached columns when the column
+    cache is on, else from the rollup collections."""
+    columns = user_columns(username)
+    if columns is not None:
+        return columnar.rollup_docs(columns)
+    return rollups.get_user_rollups(db, username)
+
+
+def user_columns(username):
+    """The user's expenses as cached columns (see columnar.py), or None when off."""
+    if not column_cache.enabled:
+        return None
+    key = versions.user_key(username)
+    # the version data_etag() just read for this request, if any
+    version = g.get('data_versions', {}).get(key) if has_app_context() else None
+    if version is None:
+        version = versions.get_versions(db, key)[key]
+    return column_cache.get(username, version, lambda: expenses_collection.find(
+        rollups.owner_filter(username), columnar.FIELDS))
 
 
-@app.route('/api/summary', methods=['GET'])
+@bp.route('/api/summary', methods=['GET'])
 def api_summary():
     # Resolve username from Bearer token or session
     username = get_request_username()
     if not username:
         return jsonify({'error':'unauthorized'}), 401
 
-    user_filter = {'user': username}
-    # Total sum
-    pipeline_total = [
-        {'$match': user_filter},
-        {'$group': {'_id': None, 'total': {'$sum': '$amount'}}}
-    ]
-    total_res = list(expenses_collection.aggregate(pipeline_total))
-    total = total_res[0]['total'] if total_res else 0.0
-
-    # Totals by category
-    pipeline_cat = [
-        {'$match': user_filter},
-        {'$group': {'_id': '$category', 'total': {'$sum': '$amount'}}},
-        {'$sort': {'total': -1}}
-    ]
-    cat_res = list(expenses_collection.aggregate(pipeline_cat))
-    by_category = [{'category': r['_id'], 'total': r['total']} for r in cat_res]
-
-    # Monthly totals (YYYY-MM)
-    pipeline_month = [
-        {'$match': user_filter},
-        {'$project': {'amount': '$amount', 'year_month': {'$substr': ['$date', 0, 7]}}},
-        {'$group': {'_id': '$year_month', 'total': {'$sum': '$amount'}}},
-        {'$sort': {'_id': 1}}
-    ]
-    month_res = list(expenses_collection.aggregate(pipeline_month))
-    monthly = [{'month': r['_id'], 'total': r['total']} for r in month_res]
-
-    # top merchants by note/merchant field (if note used to store merchant)
-    pipeline_merch = [
-        {'$match': user_filter},
-        {'$match': {'note': {'$ne': None}}},
-        {'$group': {'_id': '$note', 'total': {'$sum': '$amount'}}},
-        {'$sort': {'total': -1}},
-        {'$limit': 10}
-    ]
-    merch_res = list(expenses_collection.aggregate(pipeline_merch))
-    top_merchants = [{'merchant': r['_id'], 'total': r['total']} for r in merch_res]
-
-    return jsonify({'total': total, 'by_category': by_category, 'monthly': monthly, 'top_merchants': top_merchants}), 200
+    try:
+        sections = summary.parse_sections(request.args.get('sections'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    etag = data_etag(versions.user_key(username))
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    result = result_cache.get_or_compute(
+        etag, [versions.user_key(username)], lambda: compute_summary(username, sections)
+    )
+    return tag_response(jsonify(result), etag), 200
+
+
+def compute_summary(username, sections):
+    # The user's cached columns when the column cache is on, else the nightly
+    # report (see batch_reports.py) when nothing changed since it ran,
+    # otherwise a single $facet scan of the user's expenses
+    columns = user_columns(username)
+    if columns is not None:
+        return columnar.summarize(columns, sections)
+    report = batch_reports.load_report(db, username)
+    if report:
+        return {s: report['summary'][s] for s in sections}
+    return summary.run_summary(expenses_collection, {'user': username}, sections)
 
 
 def get_request_username():
-    """Helper: return username from Bearer token or current_user session."""
+    """Helper: return username from Bearer token or current_user session.
+
+    Resolved once per request and memoized on flask.g; verified tokens are
+    cached by digest so repeat requests skip the signature check.
+    """
+    if '_auth_username' in g:
+        return g._auth_username
     username = None
     auth = request.headers.get('Authorization', '')
     if auth and auth.startswith('Bearer '):
-        token = auth.split(' ', 1)[1]
-        try:
-            data = serializer.loads(token, max_age=60 * 60 * 24 * 30)
-            # tokens in this app are created as {'username': ...}
-            username = data.get('username') or data.get('user') or data.get('id')
-        except (SignatureExpired, BadSignature, Exception):
-            username = None
+        username = resolve_token(auth.split(' ', 1)[1])
     if not username:
         if current_user and getattr(current_user, 'is_authenticated', False):
             # User ID is stored on .id in UserMixin
             username = getattr(current_user, 'id', None)
+    g._auth_username = username
     return username
 
 
+def resolve_token(token):
+    """Return the username for a signed auth token, or None if invalid/expired."""
+    key = hashlib.sha256(token.encode('utf-8')).hexdigest()
+    username = token_cache.get(key)
+    if username is not None:
+        return username
+    try:
+        data, signed_at = serializer.loads(token, max_age=TOKEN_MAX_AGE, return_timestamp=True)
+    except (SignatureExpired, BadSignature):
+        return None
+    if not isinstance(data, dict):
+        return None
+    # tokens in this app are created as {'username': ...}
+    username = data.get('username') or data.get('user') or data.get('id')
+    if username:
+        # never cache a token past its own expiry
+        remaining = TOKEN_MAX_AGE - (datetime.now(timezone.utc) - signed_at).total_seconds()
+        token_cache.set(key, username, min(token_cache.ttl, remaining))
+    return username
+
+
+# ---------------- CONDITIONAL GET ---------------- #
+
+def data_etag(*keys, parts=()):
+    """Strong ETag for this request derived from the data versions of `keys`.
+
+    Only reads the small data_versions documents, so a matching If-None-Match
+    is answered without touching the expenses collection. `parts` adds inputs
+    the response depends on besides the data, such as a defaulted month.
+    """
+    current = versions.get_versions(db, *keys)
+    # compute paths read the same versions again (see user_columns)
+    g.data_versions = current
+    return versions.etag_for(current, request.path, request.query_string.decode('utf-8'), *parts)
+
+
+def not_modified(etag):
+    """Return a 304 response if the client already holds `etag`, else None."""
+    if request.if_none_match.contains(etag):
+        return tag_response(Response(status=304), etag)
+    return None
+
+
+def bump_versions(*keys):
+    """Record a write: bump the scopes' data versions and drop their cached results."""
+    versions.bump(db, *keys)
+    result_cache.invalidate(*keys)
+    announce(*keys)
+
+
+def announce(*keys):
+    """Publish a write to this worker's /api/events subscribers.
+
+    With the change feed running, every worker (this one included) hears it
+    from MongoDB instead.
+    """
+    if not change_feed_consumer.running:
+        event_broker.publish(keys)
+
+
+def record_expense_write(username, *keys, upserted=(), removed=()):
+    """bump_versions() for a write to the user's expenses (plus any other `keys`).
+
+    With the column cache on, the user's version is bumped on its own so its
+    new value is known and this worker's cached columns can be patched.
+    """
+    user_key = versions.user_key(username)
+    if not column_cache.enabled:
+        bump_versions(user_key, *keys)
+        return
+    version = versions.bump_and_get(db, user_key)
+    bump_versions(*keys)
+    result_cache.invalidate(user_key)
+    announce(user_key)
+    column_cache.apply(username, version, upserted=upserted, removed=removed)
+
+
+def tag_response(resp, etag):
+    # no-cache: the browser may store the body but must revalidate every time
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    return resp
+
+
+@bp.route('/api/cache/stats', methods=['GET'])
+def api_cache_stats():
+    """Hit/miss counters for the in-process caches."""
+    if not get_request_username():
+        return jsonify({'error': 'not authenticated'}), 401
+    return jsonify({
+        'tokens': token_cache.stats(),
+        'users': user_cache.stats(),
+        'results': result_cache.stats(),
+        'columns': column_cache.stats(),
+        'events': dict(event_broker.stats(), feed=change_feed_consumer.running),
+    }), 200
+
+
+@bp.route('/api/db/stats', methods=['GET'])
+def api_db_stats():
+    """This worker's MongoDB pool settings and DatabaseHelper operation timings."""
+    if not get_request_username():
+        return jsonify({'error': 'not authenticated'}), 401
+    return jsonify(db_stats()), 200
+
+
+# ---------------- METRICS ---------------- #
+# Per-endpoint latency, MongoDB command and Gemini timings (see metrics.py)
+
+# when set, scrapers must send "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+# without a token /metrics is 404 unless explicitly opened with METRICS_PUBLIC=1
+# (route names, traffic and error rates are not for the public internet)
+METRICS_PUBLIC = os.environ.get("METRICS_PUBLIC", "0") == "1"
+
+
+@bp.before_app_request
+def start_request_metrics():
+    metrics.start_request()
+    ensure_change_feed()
+
+
+@bp.after_app_request
+def record_request_metrics(resp):
+    # streamed bodies (CSV reports) are timed to the first byte
+    metrics.finish_request(request.endpoint, request.method, resp.status_code)
+    return resp
+
+
+@bp.teardown_app_request
+def record_failed_request(error):
+    # only still pending when the view raised and no response was produced
+    if error is not None:
+        metrics.finish_request(request.endpoint, request.method, 500)
+
+
+@bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    if METRICS_TOKEN:
+        auth = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(auth.encode('utf-8'), f'Bearer {METRICS_TOKEN}'.encode('utf-8')):
+            return jsonify({'error': 'not authenticated'}), 401
+    elif not METRICS_PUBLIC:
+        return jsonify({'error': 'not found'}), 404
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+# ---------------- CHANGE FEED / LIVE UPDATES ---------------- #
+
+def drop_changed(keys, unversioned):
+    """Broker listener: forget what this worker cached for the changed scopes."""
+    if change_feed.RESET in keys:
+        # results are keyed by data version and cannot go stale; columns can,
+        # if a missed change skipped the version bump
+        column_cache.clear()
+        return
+    result_cache.invalidate(*keys)
+    # versioned writes are caught by the version check (or patched in place);
+    # only writes that skipped the bump leave cached columns looking current
+    prefix = versions.user_key('')
+    for key in unversioned:
+        if key.startswith(prefix):
+            column_cache.invalidate(key[len(prefix):])
+
+
+change_feed_consumer = change_feed.ChangeFeed(get_db, event_broker)
+event_broker.add_listener(drop_changed)
+
+
+def ensure_change_feed():
+    """Start this process's change stream consumer (idempotent and fork-safe)."""
+    if CHANGE_FEED:
+        change_feed_consumer.start()
+
+
+def event_scopes(username, group_ids):
+    """The version scopes a user's /api/events stream follows."""
+    return [versions.user_key(username), versions.income_key(username),
+            versions.groups_key(username), *(versions.group_key(g) for g in group_ids)]
+
+
+@bp.route('/api/events', methods=['GET'])
+def api_events():
+    """Live updates are streamed by asgi_app.py only.
+
+    An open stream would pin one of this server's threads for SSE_MAX_SECONDS,
+    so the WSGI app answers 204, which tells EventSource not to reconnect.
+    Pages only open the stream when rendered with live_updates on.
+    """
+    return Response(status=204)
+
+
+@bp.app_context_processor
+def live_updates_flag():
+    # set by asgi_app.py when the change feed is on; see /api/events
+    return {'live_updates': current_app.config.get('LIVE_UPDATES', False)}
+
+
 # ---------------- EXPENSE EDIT / DELETE ---------------- #
 
-@app.route('/api/expense/<expense_id>', methods=['PUT'])
+@bp.route('/api/expense/<expense_id>', methods=['PUT'])
 def update_expense(expense_id):
     data = request.json or {}
     # auth
-    auth = request.headers.get('Authorization', '')
-    username = None
-    if auth.startswith('Bearer '):
-        tok = auth.split(' ', 1)[1]
-        try:
-            data_tok = serializer.loads(tok, max_age=60 * 60 * 24 * 30)
-            username = data_tok.get('username')
-        except (SignatureExpired, BadSignature):
-            username = None
-    if not username and current_user and current_user.is_authenticated:
-        username = current_user.id
+    username = get_request_username()
     if not username:
         return jsonify({'error': 'not authenticated'}), 401
     try:
@@ -473,197 +997,280 @@ def update_expense(expense_id):
     if 'note' in data:
         update['note'] = data['note']
     if 'date' in data:
-        update['date'] = data['date']
+        try:
+            update.update(dates.date_fields(data['date']))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
     if update:
-        expenses_collection.update_one({'_id': oid}, {'$set': update})
+        updated = expenses_collection.find_one_and_update(
+            {'_id': oid, 'user': username}, {'$set': update},
+            return_document=ReturnDocument.AFTER
+        )
+        if updated:
+            rollups.replace_expense(db, existing, updated)
+            record_expense_write(username, expense_group_key(existing), upserted=[updated])
     return jsonify({'message': 'updated'}), 200
 
 
-@app.route('/api/expense/<expense_id>', methods=['DELETE'])
+@bp.route('/api/expense/<expense_id>', methods=['DELETE'])
 def delete_expense(expense_id):
     try:
         oid = ObjectId(expense_id)
     except Exception:
         return jsonify({'error': 'invalid id'}), 400
     # auth
-    auth = request.headers.get('Authorization', '')
-    username = None
-    if auth.startswith('Bearer '):
-        tok = auth.split(' ', 1)[1]
-        try:
-            data_tok = serializer.loads(tok, max_age=60 * 60 * 24 * 30)
-            username = data_tok.get('username')
-        except (SignatureExpired, BadSignature):
-            username = None
-    if not username and current_user and current_user.is_authenticated:
-        username = current_user.id
+    username = get_request_username()
     if not username:
         return jsonify({'error': 'not authenticated'}), 401
 
-    res = expenses_collection.delete_one({'_id': oid, 'user': username})
-    if res.deleted_count == 0:
+    deleted = expenses_collection.find_one_and_delete({'_id': oid, 'user': username})
+    if not deleted:
         return jsonify({'error': 'not found'}), 404
+    rollups.apply_expense(db, deleted, -1)
+    record_expense_write(username, expense_group_key(deleted), removed=[deleted])
     return jsonify({'message': 'deleted'}), 200
 
 
+def expense_group_key(expense):
+    """Version scope of the group an expense belongs to, if any."""
+    return versions.group_key(expense['group_id']) if expense.get('group_id') else None
+
+
 # ============ BUDGETS ============
 
-@app.route('/api/budget', methods=['GET'])
+@bp.route('/api/budget', methods=['GET'])
 @login_required
 def get_budget():
     # auth
-    auth = request.headers.get('Authorization', '')
-    username = None
-    if auth.startswith('Bearer '):
-        tok = auth.split(' ', 1)[1]
-        try:
-            data_tok = serializer.loads(tok, max_age=60 * 60 * 24 * 30)
-            username = data_tok.get('username')
-        except (SignatureExpired, BadSignature):
-            username = None
-    if not username and current_user and current_user.is_authenticated:
-        username = current_user.id
+    username = get_request_username()
     if not username:
         return jsonify({'error': 'not authenticated'}), 401
+    # without ?month= the answer changes when the month rolls over
+    month = budget_month(request.args.get('month'))
+    etag = data_etag(versions.user_key(username), parts=(month,))
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    return tag_response(jsonify(budget_for(username, month)), etag), 200
+
+
+def budget_month(month=None):
+    """The requested budget month, defaulting to the current one."""
+    return month or datetime.utcnow().strftime('%Y-%m')
 
-    # default month = current month
-    month = request.args.get('month') or datetime.utcnow().strftime('%Y-%m')
+
+def budget_for(username, month=None):
+    """Return {'month', 'amount'} for a user's budget (default: current month)."""
+    month = budget_month(month)
     doc = budgets_collection.find_one({'user': username, 'month': month})
     if not doc:
-        return jsonify({'month': month, 'amount': 0.0}), 200
-    return jsonify({'month': doc['month'], 'amount': doc['amount']}), 200
+        return {'month': month, 'amount': 0.0}
+    return {'month': doc['month'], 'amount': doc['amount']}
 
 
-@app.route('/api/budget', methods=['POST'])
+@bp.route('/api/budget', methods=['POST'])
 def set_budget():
     # auth
-    auth = request.headers.get('Authorization', '')
-    username = None
-    if auth.startswith('Bearer '):
-        tok = auth.split(' ', 1)[1]
-        try:
-            data_tok = serializer.loads(tok, max_age=60 * 60 * 24 * 30)
-            username = data_tok.get('username')
-        except (SignatureExpired, BadSignature):
-            username = None
-    if not username and current_user and current_user.is_authenticated:
-        username = current_user.id
+    username = get_request_username()
     if not username:
         return jsonify({'error': 'not authenticated'}), 401
 
     data = request.json or {}
-    month = data.get('month') or datetime.utcnow().strftime('%Y-%m')
+    month = budget_month(data.get('month'))
     try:
         amount = float(data.get('amount') or 0)
     except Exception:
         return jsonify({'error': 'invalid amount'}), 400
 
     budgets_collection.update_one({'user': username, 'month': month}, {'$set': {'amount': amount}}, upsert=True)
+    bump_versions(versions.user_key(username))
     return jsonify({'month': month, 'amount': amount}), 200
 
 
-@app.route('/api/reports')
+# rows formatted per CSV chunk / documents fetched per cursor batch
+EXPORT_BATCH_SIZE = 500
+
+
+def stream_csv(header, rows, compress=False):
+    """Yield CSV bytes for `rows` in chunks of EXPORT_BATCH_SIZE, optionally gzipped."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    # wbits=31 writes a gzip container (16 + max window size)
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def drain():
+        data = buf.getvalue().encode('utf-8')
+        buf.seek(0)
+        buf.truncate(0)
+        return compressor.compress(data) if compressor else data
+
+    writer.writerow(header)
+    for i, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if i % EXPORT_BATCH_SIZE == 0:
+            chunk = drain()
+            if chunk:
+                yield chunk
+    chunk = drain()
+    if compressor:
+        chunk += compressor.flush()
+    if chunk:
+        yield chunk
+
+
+def csv_response(header, rows, filename):
+    """Stream a CSV attachment, gzip-encoded when the client accepts it."""
+    use_gzip = request.accept_encodings['gzip'] > 0
+    resp = Response(stream_with_context(stream_csv(header, rows, use_gzip)), mimetype='text/csv')
+    resp.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    resp.headers['Vary'] = 'Accept-Encoding'
+    if use_gzip:
+        resp.headers['Content-Encoding'] = 'gzip'
+    return resp
+
+
+@bp.route('/api/reports')
 def api_reports():
-    """Return CSV or (stub) PDF reports. Query params: type=expenses|summary, format=csv|pdf"""
+    """Stream CSV or (stub) PDF reports.
+
+    Query params: type=expenses|summary, format=csv|pdf, from/to=YYYY-MM-DD (inclusive)
+    """
     username = get_request_username()
     if not username:
         return jsonify({'error':'unauthorized'}), 401
 
     rtype = request.args.get('type', 'expenses')
     fmt = request.args.get('format', 'csv')
+    try:
+        query = combine_filters({'user': username},
+                                date_range_filter(request.args.get('from'), request.args.get('to')))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
     if rtype == 'expenses':
-        docs = list(expenses_collection.find({'user': username}).sort('date', -1))
         if fmt == 'csv':
-            output = io.StringIO()
-            writer = csv.writer(output)
-            writer.writerow(['id','date','amount','category','note'])
-            for d in docs:
-                writer.writerow([str(d.get('_id')), d.get('date'), d.get('amount'), d.get('category',''), d.get('note','')])
-            csvdata = output.getvalue()
-            output.close()
-            resp = make_response(csvdata)
-            resp.headers['Content-Type'] = 'text/csv'
-            resp.headers['Content-Disposition'] = 'attachment; filename=expenses.csv'
-            return resp
+            # The cursor is consumed lazily while the response is sent, so memory
+            # stays bounded by one batch no matter how long the history is.
+            docs = (expenses_collection.find(query, EXPENSE_FIELDS)
+                    .sort([('date', -1), ('_id', -1)])
+                    .batch_size(EXPORT_BATCH_SIZE))
+            rows = ([str(d.get('_id')), dates.format_date(d.get('date')), d.get('amount'), d.get('category',''), d.get('note','')]
+                    for d in docs)
+            return csv_response(['id','date','amount','category','note'], rows, 'expenses.csv')
         else:
             return jsonify({'error':'pdf not implemented yet'}), 501
 
     elif rtype == 'summary':
-        pipeline = [
-            {'$match': {'user': username}},
-            {'$project': {'amount': '$amount', 'year_month': {'$substr': ['$date', 0, 7]}}},
-            {'$group': {'_id': '$year_month', 'total': {'$sum': '$amount'}}},
-            {'$sort': {'_id': 1}}
-        ]
-        monthly = list(expenses_collection.aggregate(pipeline))
         if fmt == 'csv':
-            output = io.StringIO()
-            writer = csv.writer(output)
-            writer.writerow(['year_month','total'])
-            for m in monthly:
-                writer.writerow([m['_id'], m['total']])
-            csvdata = output.getvalue()
-            output.close()
-            resp = make_response(csvdata)
-            resp.headers['Content-Type'] = 'text/csv'
-            resp.headers['Content-Disposition'] = 'attachment; filename=summary.csv'
-            return resp
+            if request.args.get('from') or request.args.get('to'):
+                monthly = summary.monthly_totals(expenses_collection, query)
+            else:
+                monthly = compute_summary(username, ('monthly',))['monthly']
+            rows = ([m['month'], m['total']] for m in monthly)
+            return csv_response(['year_month','total'], rows, 'summary.csv')
         else:
             return jsonify({'error':'pdf not implemented yet'}), 501
     else:
         return jsonify({'error':'unknown report type'}), 400
 
 
-@app.route('/api/predict')
+@bp.route('/api/predict')
 def api_predict():
-    """Return a naive forecast for next month's total using simple linear regression on monthly totals."""
+    """Forecast next month's total (and per category) from the user's monthly rollups."""
     username = get_request_username()
     if not username:
         return jsonify({'error':'unauthorized'}), 401
+    etag = data_etag(versions.user_key(username))
+    cached = not_modified(etag)
+    if cached:
+        return cached
 
-    pipeline = [
-        {'$match': {'user': username}},
-        {'$project': {'amount': '$amount', 'year_month': {'$substr': ['$date', 0, 7]}}},
-        {'$group': {'_id': '$year_month', 'total': {'$sum': '$amount'}}},
-        {'$sort': {'_id': 1}}
-    ]
-    monthly = list(expenses_collection.aggregate(pipeline))
-    vals = [m['total'] for m in monthly]
-    if len(vals) < 2:
-        pred = vals[-1] if vals else 0.0
-        return jsonify({'prediction': pred, 'method': 'fallback'}), 200
-
-    n = len(vals)
-    xs = list(range(n))
-    ys = vals
-    x_mean = sum(xs)/n
-    y_mean = sum(ys)/n
-    num = sum((xs[i]-x_mean)*(ys[i]-y_mean) for i in range(n))
-    den = sum((xs[i]-x_mean)**2 for i in range(n))
-    b = num/den if den != 0 else 0.0
-    a = y_mean - b * x_mean
-    next_x = n
-    pred = a + b * next_x
-    return jsonify({'prediction': float(pred), 'method': 'linear_regression', 'n_points': n}), 200
+    result = result_cache.get_or_compute(
+        etag, [versions.user_key(username)], lambda: predict_for(username)
+    )
+    return tag_response(jsonify(result), etag), 200
 
 
+def predict_for(username):
+    """Forecast next month's total for a user (a lookup unless their data changed)."""
+    return forecasting.get_forecast(db, username, lambda: user_rollup_docs(username)['months'])
+
+
+# ---------------- DASHBOARD ---------------- #
+
+# Sections of /api/summary the dashboard renders
+DASHBOARD_SECTIONS = ('total', 'by_category', 'monthly')
+
+# Runs the dashboard's independent queries side by side on the shared MongoClient pool
+dashboard_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("DASHBOARD_WORKERS", 8)), thread_name_prefix='dashboard'
+)
+
+
+@bp.route('/api/dashboard', methods=['GET'])
+def api_dashboard():
+    """Everything the expenses dashboard needs in one response.
+
+    Combines the first /get-expenses page, /api/budget, /api/summary (through
+    compute_summary and the result cache) and /api/predict (a stored forecast
+    lookup). The queries run concurrently; an unchanged dashboard is answered
+    with 304 from the user's data version and the budget month alone.
+    """
+    username = get_request_username()
+    if not username:
+        return jsonify({'error': 'not authenticated'}), 401
+
+    # the pool threads have no request context, so pass plain values
+    page_args = {'limit': request.args.get('limit')}
+    try:
+        parse_page_limit(page_args['limit'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    month = budget_month(request.args.get('month'))
+    etag = data_etag(versions.user_key(username), parts=(month,))
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    # the summary comes from compute_summary and the result cache, as /api/summary's does
+    summary_key = versions.etag_for(g.data_versions, 'dashboard-summary', *DASHBOARD_SECTIONS)
+    futures = {
+        'expenses': dashboard_pool.submit(expenses_page, username, page_args),
+        'budget': dashboard_pool.submit(budget_for, username, month),
+        'summary': dashboard_pool.submit(
+            result_cache.get_or_compute, summary_key, [versions.user_key(username)],
+            lambda: compute_summary(username, DASHBOARD_SECTIONS)
+        ),
+        'prediction': dashboard_pool.submit(predict_for, username),
+    }
+    expenses, next_cursor = futures['expenses'].result()
+    user_summary = futures['summary'].result()
+    payload = {
+        'expenses': expenses,
+        'next_cursor': next_cursor,
+        'budget': futures['budget'].result(),
+        'summary': user_summary,
+        'prediction': futures['prediction'].result(),
+    }
+
+    return tag_response(jsonify(payload), etag), 200
 
 
 # ---------------- AUTH ROUTES ---------------- #
 
-@app.route('/signup')
+@bp.route('/signup')
 def signup_page():
     return render_template('signup.html')
 
 
-@app.route('/login')
+@bp.route('/login')
 def login_page():
     return render_template('login.html')
 
 
-@app.route('/api/signup', methods=['POST'])
+@bp.route('/api/signup', methods=['POST'])
 def api_signup():
     data = request.json or {}
 
@@ -675,25 +1282,20 @@ def api_signup():
         return jsonify({'error': 'username, email and password required'}), 400
 
     # check duplicate username OR email
-    if users_collection.find_one({
-        '$or': [{'username': username}, {'email': email}]
-    }):
+    if DatabaseHelper.user_or_email_taken(db, username, email):
         return jsonify({'error': 'user already exists'}), 409
 
     hashed = generate_password_hash(password)
 
-    users_collection.insert_one({
-        'username': username,
-        'email': email,
-        'password': hashed,
-        'created_at': datetime.utcnow()
-    })
+    # the unique indexes catch a concurrent signup that passed the check above
+    if not DatabaseHelper.create_user(db, username, email, hashed):
+        return jsonify({'error': 'user already exists'}), 409
 
     return jsonify({'message': 'signup successful'}), 201
 
 
 
-@app.route('/api/login', methods=['POST'])
+@bp.route('/api/login', methods=['POST'])
 def api_login():
     data = request.json or {}
     identifier = data.get('username')  # can be username OR email
@@ -703,39 +1305,34 @@ def api_login():
         return jsonify({'error': 'credentials required'}), 400
 
     # 🔍 search by username OR email
-    user = users_collection.find_one({
-        '$or': [
-            {'username': identifier},
-            {'email': identifier}
-        ]
-    })
+    user = DatabaseHelper.find_login_user(db, identifier)
 
     if not user:
         return jsonify({'error': 'invalid credentials'}), 401
 
-    if not check_password_hash(user['password'], password):
+    if not check_password_hash(user.password_hash, password):
         return jsonify({'error': 'invalid credentials'}), 401
 
-    login_user(User(user['username'], user.get('email')))
-    token = serializer.dumps({'username': user['username']})
+    login_user(User(user.username, user.email))
+    token = serializer.dumps({'username': user.username})
 
     return jsonify({'message': 'login successful', 'token': token}), 200
 
 
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     logout_user()
-    return redirect(url_for('home'))
+    return redirect(url_for('main.home'))
 
 
 # ============ BUDGET GROUPS ============
 
-@app.route('/budgeting')
+@bp.route('/budgeting')
 def budgeting_page():
     return render_template('budgeting.html')
 
-@app.route('/api/group', methods=['POST'])
+@bp.route('/api/group', methods=['POST'])
 def api_create_group():
     username = get_request_username()
     if not username:
@@ -755,156 +1352,216 @@ def api_create_group():
     }
     res = groups_collection.insert_one(doc)
     group_id = str(res.inserted_id)
+    bump_versions(versions.groups_key(username))
     token = serializer.dumps({'group_id': group_id, 'inviter': username})
     invite_link = f"{request.host_url.rstrip('/')}/join-group/{token}"
     return jsonify({'group_id': group_id, 'invite_token': token, 'invite_link': invite_link}), 201
 
-@app.route('/api/groups', methods=['GET'])
+@bp.route('/api/groups', methods=['GET'])
 def api_list_groups():
     username = get_request_username()
     if not username:
         return jsonify({'error': 'not authenticated'}), 401
-    docs = list(groups_collection.find({'members': username}))
-    out = []
-    for d in docs:
-        out.append({
-            'id': str(d.get('_id')),
-            'name': d.get('name'),
-            'budget': d.get('budget', 0),
-            'members': d.get('members', [])
-        })
-    return jsonify(out), 200
+    etag = data_etag(versions.groups_key(username))
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    docs = groups_collection.find({'members': username}, GROUP_LIST_FIELDS)
+    return tag_response(jsonify([group_list_item(d) for d in docs]), etag), 200
+
+
+GROUP_LIST_FIELDS = {'name': 1, 'budget': 1, 'members': 1}
 
 
-@app.route('/api/group', methods=['GET'])
+def group_list_item(d):
+    return {
+        'id': str(d.get('_id')),
+        'name': d.get('name'),
+        'budget': d.get('budget', 0),
+        'members': d.get('members', [])
+    }
+
+
+@bp.route('/api/group', methods=['GET'])
 def api_list_groups_alias():
     """Alias kept for older frontend code that requests /api/group (singular)."""
     return api_list_groups()
 
-@app.route('/api/group/<group_id>', methods=['GET'])
+@bp.route('/api/group/<group_id>', methods=['GET'])
 def api_get_group(group_id):
     username = get_request_username()
     if not username:
         return jsonify({'error': 'not authenticated'}), 401
-    try:
-        oid = ObjectId(group_id)
-    except Exception:
-        return jsonify({'error': 'invalid group id'}), 400
-    group = groups_collection.find_one({'_id': oid})
+    denied = authorize_group(group_id, username)
+    if denied:
+        return denied
+    etag = data_etag(versions.group_key(group_id))
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    group = groups_collection.find_one({'_id': ObjectId(group_id)},
+                                       {'name': 1, 'budget': 1, 'members': 1})
     if not group:
         return jsonify({'error': 'group not found'}), 404
-    if username not in group.get('members', []):
-        return jsonify({'error': 'forbidden'}), 403
-    # group expenses
-    ex_docs = list(expenses_collection.find({'group_id': group_id}))
-    expenses = []
-    total = 0.0
-    by_category = {}
-    for e in ex_docs:
-        amt = float(e.get('amount') or 0)
-        total += amt
-        cat = e.get('category') or 'Uncategorized'
-        by_category[cat] = by_category.get(cat, 0) + amt
-        expenses.append({
-            'id': str(e.get('_id')),
-            'amount': amt,
-            'category': cat,
-            'note': e.get('note'),
-            'date': e.get('date'),
-            'added_by': e.get('user')
-        })
-    by_category_list = [{'category': k, 'total': v} for k, v in by_category.items()]
-    return jsonify({
+    # Totals come from the group rollups (see rollups.py); the expenses
+    # themselves are paged through /api/group/<id>/expenses.
+    buckets = rollups.get_group_rollups(db, group_id)
+    out = {
         'id': group_id,
         'name': group.get('name'),
         'budget': group.get('budget', 0),
         'members': group.get('members', []),
-        'total_spent': total,
-        'by_category': by_category_list,
-        'expenses': expenses
-    }), 200
+    }
+    out.update(rollups.build_group_summary(buckets))
+    return tag_response(jsonify(out), etag), 200
 
 
-@app.route('/api/group/<group_id>/invite', methods=['GET'])
-def api_group_invite(group_id):
-    """Return a short-lived invite link (token) for a group. Caller must be a member."""
+@bp.route('/api/group/<group_id>/expenses', methods=['GET'])
+def api_group_expenses(group_id):
+    """One page of a group's ledger, newest first.
+
+    Query params: limit (default 100, max 500), cursor (the `next_cursor` of
+    the previous page), from/to (YYYY-MM-DD).
+    """
     username = get_request_username()
     if not username:
         return jsonify({'error': 'not authenticated'}), 401
+    denied = authorize_group(group_id, username)
+    if denied:
+        return denied
+    etag = data_etag(versions.group_key(group_id))
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    try:
+        limit = parse_page_limit(request.args.get('limit'))
+        cursor = request.args.get('cursor')
+        query = combine_filters(
+            {'group_id': group_id},
+            date_range_filter(request.args.get('from'), request.args.get('to')),
+            keyset_filter(*decode_cursor(cursor)) if cursor else None
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # (group_id, date, _id) index
+    docs = list(expenses_collection.find(query, dict(EXPENSE_FIELDS, user=1))
+                .sort([('date', -1), ('_id', -1)])
+                .limit(limit + 1))
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+
+    expenses = [{
+        'id': str(e['_id']),
+        'amount': float(e.get('amount') or 0),
+        'category': e.get('category') or rollups.DEFAULT_GROUP_CATEGORY,
+        'note': e.get('note'),
+        'date': dates.format_date(e.get('date')),
+        'added_by': e.get('user')
+    } for e in docs]
+    return tag_response(jsonify({
+        'expenses': expenses,
+        'next_cursor': encode_cursor(docs[-1]) if has_more else None
+    }), etag), 200
+
+
+def authorize_group(group_id, username):
+    """Return an error response unless `username` is a member of the group, else None.
+
+    One _id lookup that matches on membership and returns only _id, so the
+    members array never leaves the server; confirmed memberships are cached.
+    """
+    if membership_cache.get((username, group_id)):
+        return None
     try:
         oid = ObjectId(group_id)
     except Exception:
         return jsonify({'error': 'invalid group id'}), 400
-    group = groups_collection.find_one({'_id': oid})
-    if not group:
-        return jsonify({'error': 'group not found'}), 404
-    if username not in group.get('members', []):
+    if groups_collection.find_one({'_id': oid, 'members': username}, {'_id': 1}):
+        membership_cache.set((username, group_id), True)
+        return None
+    # Not a member: tell a missing group apart from a forbidden one
+    if groups_collection.find_one({'_id': oid}, {'_id': 1}):
         return jsonify({'error': 'forbidden'}), 403
+    return jsonify({'error': 'group not found'}), 404
+
+
+@bp.route('/api/group/<group_id>/invite', methods=['GET'])
+def api_group_invite(group_id):
+    """Return a short-lived invite link (token) for a group. Caller must be a member."""
+    username = get_request_username()
+    if not username:
+        return jsonify({'error': 'not authenticated'}), 401
+    denied = authorize_group(group_id, username)
+    if denied:
+        return denied
     token = serializer.dumps({'group_id': group_id, 'inviter': username})
     invite_link = f"{request.host_url.rstrip('/')}/join-group/{token}"
     return jsonify({'invite_link': invite_link, 'invite_token': token}), 200
 
-@app.route('/api/group/<group_id>/expense', methods=['POST'])
+@bp.route('/api/group/<group_id>/expense', methods=['POST'])
 def api_add_group_expense(group_id):
     username = get_request_username()
     if not username:
         return jsonify({'error': 'not authenticated'}), 401
-    try:
-        oid = ObjectId(group_id)
-    except Exception:
-        return jsonify({'error': 'invalid group id'}), 400
-    group = groups_collection.find_one({'_id': oid})
-    if not group:
-        return jsonify({'error': 'group not found'}), 404
-    if username not in group.get('members', []):
-        return jsonify({'error': 'forbidden'}), 403
+    denied = authorize_group(group_id, username)
+    if denied:
+        return denied
     data = request.json or {}
     try:
-        amount = float(data.get('amount') or 0)
-    except Exception:
-        return jsonify({'error': 'invalid amount'}), 400
-    expense = {
-        'amount': amount,
-        'category': data.get('category'),
-        'note': data.get('note'),
-        'date': data.get('date') or datetime.utcnow().strftime('%Y-%m-%d'),
-        'user': username,
-        'group_id': group_id
-    }
+        expense = build_expense(data, username)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    expense['group_id'] = group_id
     res = expenses_collection.insert_one(expense)
+    rollups.apply_expense(db, expense)
+    record_expense_write(username, versions.group_key(group_id), upserted=[expense])
     return jsonify({'message': 'Expense added to group', 'id': str(res.inserted_id)}), 201
 
-@app.route('/join-group/<token>')
+@bp.route('/join-group/<token>')
 def join_group(token):
     try:
-        data = serializer.loads(token, max_age=60 * 60 * 24 * 30)
+        data = serializer.loads(token, max_age=TOKEN_MAX_AGE)
     except (SignatureExpired, BadSignature, Exception):
         return jsonify({'error': 'invalid or expired token'}), 400
     group_id = data.get('group_id')
     if not group_id:
         return jsonify({'error': 'invalid token payload'}), 400
     if not (current_user and current_user.is_authenticated):
-        return redirect(url_for('login_page'))
+        return redirect(url_for('main.login_page'))
     username = current_user.id
     try:
         oid = ObjectId(group_id)
     except Exception:
         return jsonify({'error': 'invalid group id'}), 400
-    groups_collection.update_one({'_id': oid}, {'$addToSet': {'members': username}})
-    return redirect(url_for('budgeting_page'))
+    match = {'_id': oid}
+    if GROUP_MAX_MEMBERS:
+        # existing members rejoin freely; newcomers only while there is room
+        match['$or'] = [{'members': username},
+                        {f'members.{GROUP_MAX_MEMBERS - 1}': {'$exists': False}}]
+    group = groups_collection.find_one_and_update(
+        match, {'$addToSet': {'members': username}},
+        projection={'members': 1}, return_document=ReturnDocument.AFTER
+    )
+    if group:
+        membership_cache.set((username, group_id), True)
+        # every member's group list shows the member roster
+        bump_versions(versions.group_key(group_id),
+                      *[versions.groups_key(m) for m in group.get('members', [])])
+    elif groups_collection.find_one({'_id': oid}, {'_id': 1}):
+        return jsonify({'error': 'group is full'}), 409
+    return redirect(url_for('main.budgeting_page'))
+
+
+app = create_app()
 
 
 if __name__ == "__main__":
-    # Print diagnostic info at startup to help diagnose route registration issues
-    import os
-    print('Starting SpendWise app')
-    print('cwd:', os.getcwd())
-    try:
-        print('Registered routes:')
-        for r in app.url_map.iter_rules():
-            print(' ', r.endpoint, r.rule)
-    except Exception as _:
-        print('Could not list url_map')
+    # Route registration details are logged with LOG_LEVEL=DEBUG
+    logger.info('Starting SpendWise app (cwd: %s)', os.getcwd())
+    for r in app.url_map.iter_rules():
+        logger.debug('route %s %s', r.endpoint, r.rule)
     # Disable the reloader on Windows to avoid transient socket errors when restarting
     app.run(debug=True, use_reloader=False)
 
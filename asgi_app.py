@@ -0,0 +1,390 @@
+"""
+ASGI Entry Point for SpendWise
+Serves the read-heavy routes as async handlers on Motor, the asyncio MongoDB
+driver, so one worker keeps many requests in flight while they wait on MongoDB
+instead of parking a thread per request:
+
+    GET  /get-expenses, /api/summary, /api/analytics, /api/groups (and /api/group)
+    GET  /api/events (Server-Sent Events; one idle coroutine per open page)
+    POST /api/ai
+
+The queries a handler needs are sent together with asyncio.gather; cached
+routes read the data versions first and only query on a result-cache miss.
+With the column cache on (COLUMNAR_CACHE_MB), /api/summary and /api/analytics
+compute through app.py's path on a thread instead, since the columns live in
+this process and are loaded with pymongo. Every other
+route is the unchanged Flask app from app.py, run on a thread pool behind the
+same server, so sessions, tokens, caches and queued AI jobs are shared.
+
+    pip install -r requirements-async.txt
+    uvicorn asgi_app:app --workers 4 --port 5000
+
+Compare it with the WSGI app using benchmarks/asgi_vs_wsgi.py.
+"""
+
+import asyncio
+import contextlib
+import functools
+import os
+import time
+
+from a2wsgi import WSGIMiddleware
+from itsdangerous import BadSignature
+from pymongo.errors import DuplicateKeyError
+from starlette.applications import Starlette
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Mount, Route
+from werkzeug.http import parse_etags
+
+import app as wsgi
+import batch_reports
+import change_feed
+import forecasting
+import metrics
+import rollups
+import summary
+import versions
+from ai_service import AIBusy
+from db_utils import close_async_db, get_async_db
+
+# threads running the Flask routes in each worker
+WSGI_THREADS = int(os.getenv("ASGI_WSGI_THREADS", 10))
+
+# Pages open /api/events only when it is served here with the change feed on
+LIVE_UPDATES = wsgi.CHANGE_FEED
+wsgi.app.config['LIVE_UPDATES'] = LIVE_UPDATES
+# an /api/events stream ends after this long and the browser reconnects
+SSE_MAX_SECONDS = float(os.getenv("SSE_MAX_SECONDS", 300))
+SSE_HEARTBEAT_SECONDS = 15
+# X-Accel-Buffering: nginx would otherwise hold events back
+SSE_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+# Flask-Login keeps the user id in Flask's signed session cookie
+_session_serializer = wsgi.app.session_interface.get_signing_serializer(wsgi.app)
+_SESSION_MAX_AGE = int(wsgi.app.permanent_session_lifetime.total_seconds())
+_flask_urls = wsgi.app.url_map.bind('')
+
+
+# ---------------- REQUEST HELPERS ---------------- #
+
+def request_username(request):
+    """Same rules as app.get_request_username: Bearer token, then the session."""
+    auth = request.headers.get('authorization', '')
+    if auth.startswith('Bearer '):
+        username = wsgi.resolve_token(auth.split(' ', 1)[1])
+        if username:
+            return username
+    cookie = request.cookies.get(wsgi.app.config['SESSION_COOKIE_NAME'])
+    if not cookie:
+        return None
+    try:
+        return _session_serializer.loads(cookie, max_age=_SESSION_MAX_AGE).get('_user_id')
+    except BadSignature:
+        return None
+
+
+def json_response(body, status=200, etag=None):
+    # Flask's JSON provider, so both modes return identical bodies
+    resp = Response(wsgi.app.json.dumps(body) + '\n', status_code=status,
+                    media_type='application/json')
+    if etag:
+        tag_response(resp, etag)
+    return resp
+
+
+def tag_response(resp, etag):
+    resp.headers['ETag'] = f'"{etag}"'
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    return resp
+
+
+async def get_versions(db, *keys):
+    """versions.get_versions on Motor."""
+    found = {
+        d['_id']: d.get('v', 0)
+        async for d in db[versions.VERSIONS_COLLECTION].find({'_id': {'$in': list(keys)}})
+    }
+    return {k: found.get(k, 0) for k in keys}
+
+
+async def read_etag(request, db, keys):
+    """The data versions of `keys` and this request's ETag (app.data_etag on Motor)."""
+    current = await get_versions(db, *keys)
+    return current, versions.etag_for(current, request.url.path, request.scope['query_string'].decode('utf-8'))
+
+
+def client_holds(request, etag):
+    return parse_etags(request.headers.get('if-none-match')).contains(etag)
+
+
+async def gather_with_versions(request, db, keys, *loads):
+    """Read the data versions of `keys` and run `loads` (coroutine functions).
+
+    Returns (versions, etag, results), with results None when the client
+    already holds etag. Loads run concurrently with the version read, except
+    on a revalidation (If-None-Match), where the versions go first so a 304
+    costs one small query.
+    """
+    if 'if-none-match' in request.headers:
+        current, etag = await read_etag(request, db, keys)
+        if client_holds(request, etag):
+            return current, etag, None
+        return current, etag, await asyncio.gather(*(load() for load in loads))
+    current, *results = await asyncio.gather(get_versions(db, *keys), *(load() for load in loads))
+    etag = versions.etag_for(current, request.url.path, request.scope['query_string'].decode('utf-8'))
+    return current, etag, results
+
+
+def not_modified(etag):
+    return tag_response(Response(status_code=304), etag)
+
+
+def instrumented(handler):
+    """Record an async route in the same metrics as its Flask twin (main.<name>).
+
+    MongoDB time per request is not attributed here: Motor runs commands on
+    its own threads.
+    """
+    endpoint = f"main.{handler.__name__}"
+
+    @functools.wraps(handler)
+    async def wrapper(request):
+        started = time.perf_counter()
+        status = 500
+        try:
+            resp = await handler(request)
+            status = resp.status_code
+            return resp
+        finally:
+            metrics.http_request_duration.observe(time.perf_counter() - started, endpoint, request.method)
+            metrics.http_requests.inc(endpoint, request.method, str(status))
+    return wrapper
+
+
+# ---------------- ASYNC ROUTES ---------------- #
+
+@instrumented
+async def get_expenses(request):
+    username = request_username(request)
+    if not username:
+        return json_response({'error': 'not authenticated'}, 401)
+    try:
+        query, limit = wsgi.expenses_page_query(username, request.query_params)
+    except ValueError as e:
+        return json_response({'error': str(e)}, 400)
+
+    db = get_async_db()
+    page = (db['expenses'].find(query, wsgi.EXPENSE_FIELDS)
+            .sort(wsgi.EXPENSE_PAGE_SORT).limit(limit + 1))
+    _, etag, results = await gather_with_versions(
+        request, db, [versions.user_key(username)], lambda: page.to_list(limit + 1))
+    if results is None:
+        return not_modified(etag)
+
+    out, next_cursor = wsgi.shape_expenses_page(results[0], limit)
+    resp = json_response(out, etag=etag)
+    if next_cursor:
+        resp.headers['X-Next-Cursor'] = next_cursor
+    return resp
+
+
+@instrumented
+async def api_summary(request):
+    username = request_username(request)
+    if not username:
+        return json_response({'error': 'unauthorized'}, 401)
+    try:
+        sections = summary.parse_sections(request.query_params.get('sections'))
+    except ValueError as e:
+        return json_response({'error': str(e)}, 400)
+
+    db = get_async_db()
+    key = versions.user_key(username)
+    current, etag = await read_etag(request, db, [key])
+    if client_holds(request, etag):
+        return not_modified(etag)
+
+    result = wsgi.result_cache.lookup(etag)
+    if result is not None:
+        return json_response(result, etag=etag)
+    if wsgi.column_cache.enabled:
+        # the column cache lives in this process; share app.compute_summary's path
+        result = await asyncio.to_thread(wsgi.compute_summary, username, sections)
+    else:
+        report = await db[batch_reports.REPORTS_COLLECTION].find_one(
+            {'_id': username}, {'version': 1, 'report': 1})
+        if report and report.get('version') == current[key]:
+            result = {s: report['report']['summary'][s] for s in sections}
+        else:
+            rows = await db['expenses'].aggregate(
+                summary.build_pipeline({'user': username}, sections)).to_list(1)
+            result = summary.shape_result(rows[0] if rows else None, sections)
+    wsgi.result_cache.store(etag, result, [key])
+    return json_response(result, etag=etag)
+
+
+@instrumented
+async def analytics_api(request):
+    username = request_username(request)
+    if not username:
+        return json_response({'error': 'not authenticated'}, 401)
+
+    db = get_async_db()
+    key = versions.user_key(username)
+    current, etag = await read_etag(request, db, [key])
+    if client_holds(request, etag):
+        return not_modified(etag)
+
+    result = wsgi.result_cache.lookup(etag)
+    if result is not None:
+        return json_response(result, etag=etag)
+    if wsgi.column_cache.enabled:
+        # the column cache lives in this process; share app.compute_analytics' path
+        result = await asyncio.to_thread(wsgi.compute_analytics, username)
+    else:
+        projection = {'_id': 0, 'user': 0}
+        months, merchants, forecast = await asyncio.gather(
+            db[rollups.ROLLUPS_COLLECTION].find({'user': username}, projection).to_list(None),
+            db[rollups.MERCHANTS_COLLECTION].find({'user': username}, projection).to_list(None),
+            db[forecasting.FORECASTS_COLLECTION].find_one({'_id': username}, {'version': 1, 'result': 1}))
+        result = rollups.build_analytics({'months': months, 'merchants': merchants})
+        # forecasting.get_forecast, with the cached forecast already fetched
+        if forecast and forecast.get('version') == current[key]:
+            forecast = forecast['result']
+        else:
+            forecast = forecasting.forecast_user(months)
+            try:
+                await db[forecasting.FORECASTS_COLLECTION].update_one(
+                    *forecasting.forecast_upsert(username, current[key], forecast), upsert=True)
+            except DuplicateKeyError:
+                pass  # a concurrent request stored this version (or a newer one) first
+        result['prediction_next_month'] = forecast['prediction']
+    wsgi.result_cache.store(etag, result, [key])
+    return json_response(result, etag=etag)
+
+
+@instrumented
+async def api_list_groups(request):
+    username = request_username(request)
+    if not username:
+        return json_response({'error': 'not authenticated'}, 401)
+
+    db = get_async_db()
+    _, etag, results = await gather_with_versions(
+        request, db, [versions.groups_key(username)],
+        lambda: db['groups'].find({'members': username}, wsgi.GROUP_LIST_FIELDS).to_list(None))
+    if results is None:
+        return not_modified(etag)
+    return json_response([wsgi.group_list_item(d) for d in results[0]], etag=etag)
+
+
+@instrumented
+async def ai_feature(request):
+    """Same contract as app.ai_feature: a cached reply (200) or a queued job (202)."""
+    username = request_username(request)
+    if not username:
+        return json_response({'error': 'not authenticated'}, 401)
+    # the first call builds the Gemini client, which imports the SDK
+    if not await asyncio.to_thread(lambda: wsgi.ai_service.available):
+        return json_response({"error": "AI service not available"}, 503)
+
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    user_msg = (data or {}).get('message') if isinstance(data, dict) else None
+    if not user_msg:
+        return json_response({"error": "Message required"}, 400)
+
+    reply = wsgi.ai_service.cached_reply(user_msg)
+    if reply is not None:
+        return json_response({"reply": reply, "cached": True})
+
+    try:
+        job = wsgi.ai_service.submit(username, user_msg)
+    except AIBusy as e:
+        resp = json_response({"error": str(e)}, 429)
+        resp.headers['Retry-After'] = '2'
+        return resp
+    return json_response({
+        "job_id": job['id'],
+        "status": job['status'],
+        "status_url": _flask_urls.build('main.ai_job_status', {'job_id': job['id']})
+    }, 202)
+
+
+async def api_events(request):
+    """Server-Sent Events naming the user's scopes as they change.
+
+    Each event is {"scope": "user" | "income" | "groups"} or
+    {"scope": "group", "id": <group_id>}; clients refetch what they show.
+    Streams end after SSE_MAX_SECONDS and the browser reconnects; a client
+    that joins a group reconnects to follow it. Without the change feed the
+    answer is 204, which stops EventSource from retrying.
+    """
+    if not LIVE_UPDATES:
+        return Response(status_code=204)
+    username = request_username(request)
+    if not username:
+        return json_response({'error': 'not authenticated'}, 401)
+    db = get_async_db()
+    groups = await db['groups'].find({'members': username}, {'_id': 1}).to_list(None)
+
+    loop = asyncio.get_running_loop()
+    pending = asyncio.Queue(maxsize=change_feed.MAX_PENDING)
+
+    def offer(scope):
+        # invalidations repeat; a full queue means the client refetches anyway
+        if not pending.full():
+            pending.put_nowait(scope)
+
+    def deliver(scope):
+        # called on the change feed thread and the Flask threads
+        try:
+            loop.call_soon_threadsafe(offer, scope)
+        except RuntimeError:
+            pass  # the worker is shutting down
+
+    sub = wsgi.event_broker.subscribe(wsgi.event_scopes(username, [str(d['_id']) for d in groups]),
+                                      deliver)
+
+    async def stream():
+        try:
+            yield change_feed.RETRY_FRAME
+            deadline = loop.time() + SSE_MAX_SECONDS
+            while loop.time() < deadline:
+                timeout = min(SSE_HEARTBEAT_SECONDS, max(deadline - loop.time(), 0))
+                try:
+                    scope = await asyncio.wait_for(pending.get(), timeout)
+                except asyncio.TimeoutError:
+                    yield change_feed.KEEPALIVE_FRAME
+                    continue
+                yield change_feed.sse_frame(scope)
+        finally:
+            wsgi.event_broker.unsubscribe(sub)
+
+    return StreamingResponse(stream(), media_type='text/event-stream', headers=SSE_HEADERS)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(_app):
+    # one change stream consumer per worker process
+    wsgi.ensure_change_feed()
+    yield
+    close_async_db()
+
+
+app = Starlette(
+    routes=[
+        Route('/get-expenses', get_expenses, methods=['GET']),
+        Route('/api/summary', api_summary, methods=['GET']),
+        Route('/api/analytics', analytics_api, methods=['GET']),
+        Route('/api/groups', api_list_groups, methods=['GET']),
+        Route('/api/group', api_list_groups, methods=['GET']),
+        Route('/api/ai', ai_feature, methods=['POST']),
+        Route('/api/events', api_events, methods=['GET']),
+        # every other route (and other methods on the paths above) is Flask's
+        Mount('/', app=WSGIMiddleware(wsgi.app, workers=WSGI_THREADS)),
+    ],
+    lifespan=lifespan,
+)
@@ -0,0 +1,218 @@
+"""
+Batch Reports for SpendWise
+Precomputes every user's report (summary, monthly trend, top merchants and
+forecast) in one pass over the expenses collection, so daytime reads are a
+single _id lookup instead of an aggregation. Run it nightly, like init_db.py:
+
+    python batch_reports.py                 # all users, one process per CPU
+    python batch_reports.py --workers 4
+
+Expenses are streamed once sorted by user (the (user, date, _id) index),
+grouped into chunks of users and scored on a process pool. In dual mode
+(EXPENSE_OWNERS, see rollups.py) legacy `user_id` expenses are merged in from
+a second stream sorted by `user_id`; as on the live paths, the summary counts
+`user` documents only and the forecast counts both. Each report names the
+owner fields behind its sections, so load_report() consumers can tell:
+
+    {"summary": {"total": ..., "by_category": [...], "monthly": [...], "top_merchants": [...]},
+     "forecast": {"prediction": ..., ...},
+     "owners": {"summary": ["user"], "forecast": ["user", "user_id"]}}
+
+Results are written with one unordered bulk_write per chunk into
+`precomputed_reports` (and the forecasts cache, see forecasting.py), each
+stamped with the user's data version read before the scan and never over a
+newer stamp. Any later write bumps that version, so read paths only trust a
+report whose version is still current.
+"""
+
+import heapq
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+import dates
+import forecasting
+import rollups
+import summary
+import versions
+
+load_dotenv()
+
+REPORTS_COLLECTION = "precomputed_reports"
+
+# users per task sent to a worker process
+CHUNK_USERS = 500
+
+EXPENSE_PROJECTION = {"_id": 0, "user": 1, "user_id": 1, "amount": 1, "category": 1,
+                      "note": 1, "date": 1, "ym": 1}
+
+# owner fields each report section counts (recorded in the report)
+REPORT_OWNERS = {
+    "summary": ["user"],
+    "forecast": ["user", "user_id"] if rollups.LEGACY_OWNERS else ["user"],
+}
+
+
+# ---------------- SCORING (runs in worker processes) ---------------- #
+
+def _sorted_totals(totals: Dict[Any, float], key: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    rows = sorted(totals.items(), key=lambda kv: kv[1], reverse=True)
+    return [{key: k, "total": t} for k, t in rows[:limit]]
+
+
+def build_report(expenses: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Summary sections (same shape as summary.run_summary) plus the forecast,
+    and the owner fields each counted (REPORT_OWNERS)."""
+    total = 0.0
+    by_category = {}
+    monthly = {}
+    merchants = {}
+    buckets = {}
+    for e in expenses:
+        amount = float(e.get("amount") or 0)
+        category = e.get("category")
+        # summary.run_summary matches on `user` only
+        if e.get("user"):
+            month = dates.month_of(e)
+            total += amount
+            by_category[category] = by_category.get(category, 0.0) + amount
+            monthly[month] = monthly.get(month, 0.0) + amount
+            if e.get("note") is not None:
+                merchants[e["note"]] = merchants.get(e["note"], 0.0) + amount
+        # the same (month, category) buckets expense_rollups holds
+        bucket = (rollups.expense_month(e), rollups.DEFAULT_CATEGORY if category is None else category)
+        buckets[bucket] = buckets.get(bucket, 0.0) + amount
+
+    month_docs = [{"month": m, "category": c, "total": t} for (m, c), t in buckets.items()]
+    return {
+        "summary": {
+            "total": total,
+            "by_category": _sorted_totals(by_category, "category"),
+            "monthly": [{"month": m, "total": t} for m, t in sorted(monthly.items(), key=lambda kv: kv[0] or "")],
+            "top_merchants": _sorted_totals(merchants, "merchant", summary.TOP_MERCHANTS_LIMIT),
+        },
+        "forecast": forecasting.forecast_user(month_docs),
+        "owners": {section: list(fields) for section, fields in REPORT_OWNERS.items()},
+    }
+
+
+def score_chunk(chunk: List[Tuple[str, List[Dict[str, Any]]]]) -> List[Tuple[str, Dict[str, Any], int]]:
+    """Worker entry point: [(user, expenses)] -> [(user, report, expense count)]."""
+    return [(username, build_report(expenses), len(expenses)) for username, expenses in chunk]
+
+
+# ---------------- STREAMING AND WRITING ---------------- #
+
+def iter_user_chunks(db, chunk_users: int = CHUNK_USERS) -> Iterable[List[Tuple[str, List[Dict[str, Any]]]]]:
+    """Stream expenses sorted by owner, yielding chunks of (user, expenses)."""
+    streams = [db["expenses"].find({"user": {"$type": "string"}}, EXPENSE_PROJECTION)
+               .sort("user", 1).batch_size(5000)]
+    if rollups.LEGACY_OWNERS:
+        # the sparse user_id index; documents that also carry `user` are in the first stream
+        legacy = (db["expenses"].find({"user_id": {"$type": "string"}}, EXPENSE_PROJECTION)
+                  .sort("user_id", 1).batch_size(5000))
+        streams.append(doc for doc in legacy if not doc.get("user"))
+    chunk = []
+    current, docs = None, []
+    for doc in heapq.merge(*streams, key=rollups.expense_owner):
+        owner = rollups.expense_owner(doc)
+        if owner != current:
+            if docs:
+                chunk.append((current, docs))
+                if len(chunk) >= chunk_users:
+                    yield chunk
+                    chunk = []
+            current, docs = owner, []
+        docs.append(doc)
+    if docs:
+        chunk.append((current, docs))
+    if chunk:
+        yield chunk
+
+
+def _user_versions(db) -> Dict[str, int]:
+    """Every user's current data version, read once before the scan."""
+    prefix = versions.user_key("")
+    return {
+        d["_id"][len(prefix):]: d.get("v", 0)
+        for d in db[versions.VERSIONS_COLLECTION].find({"_id": {"$regex": f"^{prefix}"}})
+    }
+
+
+def write_results(db, results: List[Tuple[str, Dict[str, Any], int]], user_versions: Dict[str, int]) -> None:
+    """Store reports and forecasts, leaving any a request already stored for a
+    newer version (see versions.store_stamped)."""
+    now = datetime.utcnow()
+    reports, forecasts = [], []
+    for username, report, _ in results:
+        version = user_versions.get(username, 0)
+        reports.append((username, version, {"report": report, "computed_at": now}))
+        forecasts.append((username, version, {"result": report["forecast"], "computed_at": now}))
+    versions.store_stamped(db[REPORTS_COLLECTION], reports)
+    versions.store_stamped(db[forecasting.FORECASTS_COLLECTION], forecasts)
+
+
+def run(db, workers: Optional[int] = None, chunk_users: int = CHUNK_USERS) -> Dict[str, Any]:
+    """Precompute reports for every user; returns counts and throughput."""
+    started = time.perf_counter()
+    user_versions = _user_versions(db)
+    counts = {"users": 0, "docs": 0}
+
+    def collect(future):
+        results = future.result()
+        write_results(db, results, user_versions)
+        counts["users"] += len(results)
+        counts["docs"] += sum(n for _, _, n in results)
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # bound the chunks in flight so memory does not grow with the user count
+        pending = deque()
+        for chunk in iter_user_chunks(db, chunk_users):
+            pending.append(pool.submit(score_chunk, chunk))
+            if len(pending) >= workers * 2:
+                collect(pending.popleft())
+        while pending:
+            collect(pending.popleft())
+
+    elapsed = time.perf_counter() - started
+    counts["seconds"] = round(elapsed, 2)
+    counts["users_per_s"] = round(counts["users"] / elapsed, 1) if elapsed else 0.0
+    counts["docs_per_s"] = round(counts["docs"] / elapsed, 1) if elapsed else 0.0
+    return counts
+
+
+# ---------------- READ PATH ---------------- #
+
+def load_report(db, username: str) -> Optional[Dict[str, Any]]:
+    """The user's precomputed report if no write happened since it was built, else None."""
+    key = versions.user_key(username)
+    version = versions.get_versions(db, key)[key]
+    doc = db[REPORTS_COLLECTION].find_one({"_id": username, "version": version}, {"report": 1})
+    return doc["report"] if doc else None
+
+
+if __name__ == "__main__":
+    import db_utils
+
+    workers = None
+    if "--workers" in sys.argv:
+        workers = int(sys.argv[sys.argv.index("--workers") + 1])
+
+    try:
+        db = db_utils.get_db()
+        db.client.admin.command('ping')
+        print(f"✓ Connected to {db.name}")
+        counts = run(db, workers=workers)
+        print(f"✓ Precomputed reports for {counts['users']} users from {counts['docs']} expenses "
+              f"in {counts['seconds']}s ({counts['users_per_s']} users/s, {counts['docs_per_s']} docs/s)")
+        db_utils.close_db()
+    except Exception as e:
+        print(f"✗ Batch reports failed: {e}")
+        sys.exit(1)
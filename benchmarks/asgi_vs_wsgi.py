@@ -0,0 +1,116 @@
+"""
+ASGI vs WSGI Benchmark for SpendWise
+Drives the async read routes against both serving modes and reports
+requests/s and latency percentiles per route. Run the two servers with the
+same number of worker processes pinned to the same cores, against the same
+database, e.g. on 4 cores:
+
+    taskset -c 0-3 gunicorn -w 4 --threads 8 -b 127.0.0.1:5001 app:app
+    taskset -c 0-3 uvicorn asgi_app:app --workers 4 --port 5002
+
+    python benchmarks/asgi_vs_wsgi.py --wsgi http://127.0.0.1:5001 --asgi http://127.0.0.1:5002
+
+(run one server at a time if they would share the cores; pin the driver to
+other cores). Each route is driven on its own with load.drive(). A benchmark
+user is created if needed and given --expenses expenses through the bulk
+import endpoint. Results are printed as a table and, with --json, written to
+a file.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import load
+
+ROUTES = ["/get-expenses", "/api/summary", "/api/analytics", "/api/groups"]
+CATEGORIES = ["Food", "Rent", "Transport", "Shopping", "Bills", "Health"]
+
+
+async def prepare_user(client, username, password, expenses):
+    """Sign up and log in the benchmark user; seed expenses on first use."""
+    await client.post("/api/signup", json={"username": username, "email": f"{username}@bench.local",
+                                           "password": password})
+    r = await client.post("/api/login", json={"username": username, "password": password})
+    r.raise_for_status()
+    token = r.json()["token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    r = await client.get("/get-expenses", params={"limit": 1}, headers=headers)
+    if r.status_code == 200 and not r.json():
+        start = date.today() - timedelta(days=730)
+        rows = "\n".join(json.dumps({
+            "amount": round(random.uniform(2, 250), 2),
+            "category": random.choice(CATEGORIES),
+            "note": f"merchant {random.randint(1, 40)}",
+            "date": (start + timedelta(days=random.randint(0, 729))).isoformat(),
+            "row_key": f"bench-{i}",
+        }) for i in range(expenses))
+        r = await client.post("/api/expenses/import", params={"format": "ndjson"},
+                              content=rows.encode("utf-8"), headers=headers)
+        r.raise_for_status()
+        print(f"  seeded {r.json()['inserted']} expenses for {username}")
+    return headers
+
+
+async def bench_mode(name, base_url, args):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        print(f"{name}: {base_url}")
+        client.headers.update(await prepare_user(client, args.user, args.password, args.expenses))
+        results = {}
+        for path in args.routes:
+            await load.drive([client], {path: 1}, args.concurrency, args.warmup)
+            results[path] = (await load.drive([client], {path: 1}, args.concurrency, args.duration))["overall"]
+            r = results[path]
+            print(f"  {path:<16} {r['rps']:>9.1f} req/s   p50 {r['p50_ms']:>7.2f} ms   "
+                  f"p99 {r['p99_ms']:>7.2f} ms   errors {r['errors']}")
+        return results
+
+
+async def main(args):
+    report = {"concurrency": args.concurrency, "duration_s": args.duration, "modes": {}}
+    for name, url in (("wsgi", args.wsgi), ("asgi", args.asgi)):
+        if url:
+            report["modes"][name] = await bench_mode(name, url, args)
+
+    if len(report["modes"]) == 2:
+        print("asgi / wsgi:")
+        for path in args.routes:
+            w, a = report["modes"]["wsgi"][path], report["modes"]["asgi"][path]
+            ratio = a["rps"] / w["rps"] if w["rps"] else 0.0
+            print(f"  {path:<16} throughput x{ratio:.2f}   p99 {w['p99_ms']:.2f} -> {a['p99_ms']:.2f} ms")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--wsgi", help="base URL of the Flask (WSGI) server")
+    parser.add_argument("--asgi", help="base URL of the asgi_app server")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=15, help="seconds per route")
+    parser.add_argument("--warmup", type=float, default=3, help="seconds per route before measuring")
+    parser.add_argument("--expenses", type=int, default=2000, help="expenses seeded for a new user")
+    parser.add_argument("--user", default="bench_user")
+    parser.add_argument("--password", default="bench-password")
+    parser.add_argument("--routes", nargs="+", default=ROUTES)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+    if not (args.wsgi or args.asgi):
+        parser.error("give --wsgi and/or --asgi")
+
+    try:
+        asyncio.run(main(args))
+    except httpx.HTTPError as e:
+        print(f"✗ Benchmark failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,178 @@
+"""
+Columnar Cache Benchmark for SpendWise
+Compares a user's expenses held as BSON-style dicts with the numpy columns of
+columnar.py, at increasing history sizes:
+
+    python benchmarks/column_cache.py --sizes 1000 5000 20000
+    python benchmarks/column_cache.py --routes --mongomock --json columnar.json
+
+compute: memory held per user (tracemalloc for the dicts, array bytes for the
+columns) and the time to build the analytics and summary results from each,
+the dict path being the per-expense Python loops of rollups.py.
+
+--routes: /api/analytics, /api/summary and /api/predict through the Flask test
+client with the column cache off and on. Cached results are dropped before
+every call (the data version is left alone), so each call does its compute
+path: rollups, nightly report or $facet aggregation when off, the cached
+columns when on. Use a scratch database (MONGODB_DB_NAME=SpendWiseBench).
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import seed  # also puts the project root on sys.path
+import micro
+
+import columnar
+import dates
+import rollups
+import summary
+
+ROUTES = {
+    "analytics_api": "/api/analytics",
+    "api_summary": "/api/summary",
+    "api_predict": "/api/predict",
+}
+
+
+def make_docs(size, seed_value):
+    rng = random.Random(seed_value)
+    start = dates.today() - timedelta(days=seed.HISTORY_DAYS)
+    return [dict(seed._random_expense(rng, seed.username(0), start), _id=ObjectId()) for _ in range(size)]
+
+
+def dict_summary(docs):
+    """summary.run_summary()'s sections computed with Python loops over dicts."""
+    total, by_category, monthly, merchants = 0.0, {}, {}, {}
+    for d in docs:
+        amount = float(d.get("amount") or 0)
+        total += amount
+        by_category[d.get("category")] = by_category.get(d.get("category"), 0.0) + amount
+        month = dates.month_of(d)
+        monthly[month] = monthly.get(month, 0.0) + amount
+        if d.get("note") is not None:
+            merchants[d["note"]] = merchants.get(d["note"], 0.0) + amount
+    return {
+        "total": total,
+        "by_category": [{"category": c, "total": t}
+                        for c, t in sorted(by_category.items(), key=lambda kv: -kv[1])],
+        "monthly": [{"month": m, "total": t} for m, t in sorted(monthly.items())],
+        "top_merchants": [{"merchant": m, "total": t} for m, t in
+                          sorted(merchants.items(), key=lambda kv: -kv[1])[:summary.TOP_MERCHANTS_LIMIT]],
+    }
+
+
+def dict_analytics(docs):
+    months, merchants = rollups._bucket_deltas(docs)
+    return rollups.build_analytics({
+        "months": [{"month": m, "category": c, "total": t} for (_, m, c), (t, _) in months.items()],
+        "merchants": [{"merchant": m, "total": t} for (_, m), (t, _) in merchants.items()],
+    })
+
+
+def time_call(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(timings), 4)
+
+
+def bench_compute(size, args):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    docs = make_docs(size, args.seed + size)
+    dict_bytes = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    cols = columnar.UserColumns.from_docs(1, docs, columnar.StringTable())
+
+    result = {
+        "dict_bytes_per_expense": round(dict_bytes / size, 1),
+        "column_bytes_per_expense": round(cols.nbytes / size, 1),
+        "dict_analytics_ms": time_call(lambda: dict_analytics(docs), args.repeat),
+        "column_analytics_ms": time_call(lambda: rollups.build_analytics(columnar.rollup_docs(cols)), args.repeat),
+        "dict_summary_ms": time_call(lambda: dict_summary(docs), args.repeat),
+        "column_summary_ms": time_call(lambda: columnar.summarize(cols), args.repeat),
+    }
+    print(f"  memory   dict {result['dict_bytes_per_expense']:>8.1f} B/expense   "
+          f"columns {result['column_bytes_per_expense']:>6.1f} B/expense")
+    for name in ("analytics", "summary"):
+        d, c = result[f"dict_{name}_ms"], result[f"column_{name}_ms"]
+        print(f"  {name:<10}dict {d:>8.3f} ms   columns {c:>8.3f} ms   x{d / c if c else 0:.1f}")
+    return result
+
+
+def bench_routes(appmod, size, args):
+    db = appmod.db
+    seed.clear(db)
+    seed.seed(db, users=1, expenses=size, groups=0, income=0, seed_value=args.seed + size)
+    user = seed.username(0)
+    client = appmod.app.test_client()
+    resp = client.post("/api/login", json={"username": user, "password": seed.BENCH_PASSWORD})
+    if resp.status_code != 200:
+        raise RuntimeError(f"login failed: {resp.status_code}")
+    key = appmod.versions.user_key(user)
+
+    results = {}
+    for mode, budget in (("dicts", 0), ("columns", args.budget_mb * 2**20)):
+        appmod.column_cache = columnar.ColumnCache(budget)
+        for name, path in ROUTES.items():
+            r = micro.time_route(client, path, args.repeat, lambda: appmod.result_cache.invalidate(key))
+            results[f"{mode}_{name}"] = r
+            print(f"  {mode:<8} {name:<14} median {r['median_ms']:>9.3f} ms   p95 {r['p95_ms']:>9.3f} ms")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Columnar cache vs dicts for SpendWise analytics")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000],
+                        help="expenses of the measured user")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--routes", action="store_true", help="also time the routes against the database")
+    parser.add_argument("--budget-mb", type=float, default=64, help="column cache budget for --routes")
+    parser.add_argument("--mongomock", action="store_true", help="use the in-memory stand-in")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    report = {
+        "benchmark": "columnar",
+        "started_at": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "repeat": args.repeat,
+        "sizes": {},
+    }
+    appmod = None
+    if args.routes:
+        if args.mongomock:
+            seed.use_mongomock()
+        import app as appmod
+        report["backend"] = "mongomock" if args.mongomock else "mongodb"
+    try:
+        for size in args.sizes:
+            print(f"size {size}:")
+            report["sizes"][str(size)] = {"compute": bench_compute(size, args)}
+            if appmod:
+                report["sizes"][str(size)]["routes"] = bench_routes(appmod, size, args)
+        if appmod:
+            seed.clear(appmod.db)
+    except Exception as e:
+        print(f"✗ Columnar benchmark failed: {e}")
+        sys.exit(1)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Results written to {args.json}")
@@ -0,0 +1,190 @@
+"""
+HTTP Load Driver for SpendWise
+Logs in as seeded users (see seed.py) and drives a weighted mix of routes
+against a running server with concurrent closed-loop clients, then reports
+throughput and latency percentiles, overall and per route, as JSON:
+
+    python benchmarks/load.py --url http://127.0.0.1:5000 --users 50 --concurrency 64 \\
+        --duration 30 --json load.json
+    python benchmarks/load.py --url ... --baseline load.json    # exits 1 on a regression
+
+With --baseline, every route whose throughput dropped or whose p99 grew by
+more than --tolerance (default 10%) against the saved run is reported.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import seed
+
+# route -> relative weight, roughly what the pages request
+DEFAULT_MIX = {
+    "/get-expenses": 4,
+    "/api/dashboard": 2,
+    "/api/summary": 2,
+    "/api/analytics": 2,
+    "/api/predict": 1,
+    "/api/groups": 1,
+}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p90_ms": round(percentile(latencies, 90), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(latencies[-1], 2) if latencies else 0.0,
+    }
+
+
+async def login(base_url: str, username: str, password: str, connections: int) -> httpx.AsyncClient:
+    """A client holding the user's session cookie and Bearer token."""
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    client = httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30)
+    r = await client.post("/api/login", json={"username": username, "password": password})
+    if r.status_code != 200:
+        await client.aclose()
+        raise httpx.HTTPError(f"login as {username} returned {r.status_code}")
+    client.headers["Authorization"] = f"Bearer {r.json()['token']}"
+    return client
+
+
+async def drive(clients: List[httpx.AsyncClient], mix: Dict[str, int], concurrency: int,
+                duration: float, seed_value: int = 0) -> Dict[str, Any]:
+    """Run `concurrency` closed-loop workers for `duration` seconds.
+
+    Worker i sends requests as clients[i % len(clients)], picking routes by
+    weight from `mix`. Only 200 and 304 responses count as successes.
+    """
+    paths, weights = list(mix), list(mix.values())
+    latencies = {p: [] for p in paths}
+    errors = {p: 0 for p in paths}
+    deadline = time.perf_counter() + duration
+
+    async def worker(i: int):
+        client = clients[i % len(clients)]
+        rng = random.Random(seed_value + i)
+        while time.perf_counter() < deadline:
+            path = rng.choices(paths, weights)[0]
+            started = time.perf_counter()
+            try:
+                ok = (await client.get(path)).status_code in (200, 304)
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies[path].append((time.perf_counter() - started) * 1000)
+            else:
+                errors[path] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "overall": summarize([x for p in paths for x in latencies[p]], sum(errors.values()), elapsed),
+        "routes": {p: summarize(latencies[p], errors[p], elapsed) for p in paths},
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Describe every route (and the overall mix) that regressed against `baseline`."""
+    regressions = []
+    pairs: List[Tuple[str, Dict, Dict]] = [("overall", report["overall"], baseline.get("overall", {}))]
+    pairs += [(p, r, baseline.get("routes", {}).get(p, {})) for p, r in report["routes"].items()]
+    for name, now, before in pairs:
+        if not before:
+            continue
+        if before.get("rps") and now["rps"] < before["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {before['rps']} -> {now['rps']} req/s")
+        if before.get("p99_ms") and now["p99_ms"] > before["p99_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p99 {before['p99_ms']} -> {now['p99_ms']} ms")
+    return regressions
+
+
+async def main(args) -> Dict[str, Any]:
+    mix = {p: DEFAULT_MIX.get(p, 1) for p in args.routes} if args.routes else DEFAULT_MIX
+    connections = math.ceil(args.concurrency / args.users)
+    clients = await asyncio.gather(*(
+        login(args.url, seed.username(i), seed.BENCH_PASSWORD, connections) for i in range(args.users)
+    ))
+    try:
+        if args.warmup:
+            await drive(clients, mix, args.concurrency, args.warmup, args.seed)
+        result = await drive(clients, mix, args.concurrency, args.duration, args.seed)
+    finally:
+        await asyncio.gather(*(c.aclose() for c in clients))
+    return {
+        "benchmark": "load",
+        "url": args.url,
+        "started_at": datetime.utcnow().isoformat() + "Z",
+        "users": args.users,
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "mix": mix,
+        **result,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent HTTP load driver for SpendWise")
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--users", type=int, default=20, help="seeded users to log in as")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=5)
+    parser.add_argument("--routes", nargs="+", help=f"routes to drive (default: {' '.join(DEFAULT_MIX)})")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--baseline", help="earlier --json report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+
+    try:
+        report = asyncio.run(main(args))
+    except httpx.HTTPError as e:
+        print(f"✗ Load test failed: {e}")
+        sys.exit(1)
+
+    # the human-readable summary goes to stderr so stdout stays pure JSON
+    o = report["overall"]
+    print(f"✓ {o['requests']} requests, {o['errors']} errors, {o['rps']} req/s, "
+          f"p50 {o['p50_ms']} ms, p99 {o['p99_ms']} ms", file=sys.stderr)
+    for path, r in report["routes"].items():
+        print(f"  {path:<16} {r['rps']:>9.1f} req/s   p50 {r['p50_ms']:>7.2f} ms   "
+              f"p99 {r['p99_ms']:>7.2f} ms", file=sys.stderr)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Report written to {args.json}", file=sys.stderr)
+    else:
+        print(json.dumps(report))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"✗ Regression: {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"✓ No regressions against {args.baseline}", file=sys.stderr)
@@ -0,0 +1,124 @@
+"""
+Micro-benchmarks for SpendWise Read Routes
+Times analytics_api, api_summary, api_reports, api_predict and api_get_group
+in-process through the Flask test client (no network, no server) at
+increasing data sizes:
+
+    python benchmarks/micro.py --sizes 100 1000 10000 --repeat 20
+    python benchmarks/micro.py --mongomock --json micro.json   # in-memory stand-in
+
+For each size the bench data is reseeded (see seed.py): one measured user with
+SIZE expenses who belongs to a group holding SIZE group expenses, among
+--background users. Calls are timed cold by default: the user's and group's
+data versions are bumped first, as a write would, so cached results, stored
+forecasts and nightly reports are stale and each route does its full work.
+--warm times repeat reads instead. Use a scratch database
+(MONGODB_DB_NAME=SpendWiseBench).
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import seed  # also puts the project root on sys.path
+
+ROUTES = {
+    "analytics_api": "/api/analytics",
+    "api_summary": "/api/summary",
+    "api_reports": "/api/reports?type=expenses",
+    "api_reports_summary": "/api/reports?type=summary",
+    "api_predict": "/api/predict",
+    "api_get_group": "/api/group/{group_id}",
+}
+
+
+def time_route(client, path, repeat, before=None):
+    timings = []
+    for _ in range(repeat):
+        if before:
+            before()
+        started = time.perf_counter()
+        resp = client.get(path)
+        resp.get_data()  # drain streamed bodies (CSV reports)
+        timings.append((time.perf_counter() - started) * 1000)
+        if resp.status_code != 200:
+            raise RuntimeError(f"{path} returned {resp.status_code}")
+    timings.sort()
+    return {
+        "median_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(timings[min(len(timings) - 1, int(0.95 * len(timings)))], 3),
+        "min_ms": round(timings[0], 3),
+    }
+
+
+def bench_size(appmod, size, args):
+    db = appmod.db
+    seed.clear(db)
+    seed.seed(db, users=args.background, expenses=args.expenses, groups=0,
+              income=args.income, seed_value=args.seed, first_user=1)
+    seed.seed(db, users=1, expenses=size, groups=1, members=1, group_expenses=size,
+              income=args.income, seed_value=args.seed + size)
+    user = seed.username(0)
+    group_id = str(db["groups"].find_one({"members": user}, {"_id": 1})["_id"])
+
+    client = appmod.app.test_client()
+    resp = client.post("/api/login", json={"username": user, "password": seed.BENCH_PASSWORD})
+    if resp.status_code != 200:
+        raise RuntimeError(f"login failed: {resp.status_code}")
+
+    keys = (appmod.versions.user_key(user), appmod.versions.group_key(group_id))
+    before = None if args.warm else (lambda: appmod.bump_versions(*keys))
+    results = {}
+    for name, path in ROUTES.items():
+        results[name] = time_route(client, path.format(group_id=group_id), args.repeat, before)
+        r = results[name]
+        print(f"  {name:<20} median {r['median_ms']:>9.3f} ms   p95 {r['p95_ms']:>9.3f} ms")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for SpendWise read routes")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000],
+                        help="expenses of the measured user (and of their group)")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--background", type=int, default=50, help="other seeded users")
+    parser.add_argument("--expenses", type=int, default=200, help="expenses per background user")
+    parser.add_argument("--income", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--warm", action="store_true", help="time cached repeat reads")
+    parser.add_argument("--mongomock", action="store_true", help="use the in-memory stand-in")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    if args.mongomock:
+        seed.use_mongomock()
+    import app as appmod
+
+    report = {
+        "benchmark": "micro",
+        "started_at": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "backend": "mongomock" if args.mongomock else "mongodb",
+        "mode": "warm" if args.warm else "cold",
+        "repeat": args.repeat,
+        "sizes": {},
+    }
+    try:
+        for size in args.sizes:
+            print(f"size {size}:")
+            report["sizes"][str(size)] = bench_size(appmod, size, args)
+        seed.clear(appmod.db)
+    except Exception as e:
+        print(f"✗ Micro-benchmark failed: {e}")
+        sys.exit(1)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Results written to {args.json}")
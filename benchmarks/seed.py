@@ -0,0 +1,207 @@
+"""
+Synthetic Data for SpendWise Benchmarks
+Seeds MongoDB with users, expenses, groups and income in the shapes app.py
+writes, and maintains the rollups and income totals the read paths rely on, so
+a seeded user behaves like one who entered the data through the app.
+The same --seed always produces the same data.
+
+    python benchmarks/seed.py --users 200 --expenses 500 --groups 20 --income 24
+    python benchmarks/seed.py --clear                # remove the seeded data only
+
+Point it at a scratch database (MONGODB_DB_NAME=SpendWiseBench); indexes are
+created with init_db.py first. Seeded users are bench00000, bench00001, ...
+with the password BENCH_PASSWORD, so the load driver (load.py) can log in as
+them. Everything seeded is keyed by that prefix and --clear removes only it.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash
+
+import dates
+import rollups
+import versions
+
+USER_PREFIX = "bench"
+BENCH_PASSWORD = "bench-password"
+
+CATEGORIES = ["Food", "Rent", "Transport", "Shopping", "Bills", "Health", "Travel", "Entertainment"]
+INCOME_SOURCES = ["Salary", "Freelance", "Dividends", "Refund"]
+MERCHANTS = 60
+HISTORY_DAYS = 730
+INSERT_BATCH = 5000
+
+# derived collections holding per-user documents keyed by username
+USER_KEYED = ["forecasts", "precomputed_reports", "income_totals"]
+
+
+def username(i: int) -> str:
+    return f"{USER_PREFIX}{i:05d}"
+
+
+def _random_expense(rng: random.Random, user: str, start: datetime) -> Dict[str, Any]:
+    # log-normal amounts: many small purchases, a few large ones
+    return {
+        "amount": round(rng.lognormvariate(3.2, 0.9), 2),
+        "category": rng.choice(CATEGORIES),
+        "note": f"Merchant {rng.randint(1, MERCHANTS)}",
+        **dates.date_fields(start + timedelta(days=rng.randrange(HISTORY_DAYS))),
+        "user": user,
+    }
+
+
+def _insert_expenses(db, docs: List[Dict[str, Any]]) -> None:
+    """Insert like the app does: the expenses, then their rollup deltas."""
+    if docs:
+        db["expenses"].insert_many(docs, ordered=False)
+        rollups.apply_expenses(db, docs)
+
+
+def seed(db, users: int = 100, expenses: int = 200, groups: int = 10, members: int = 5,
+         group_expenses: int = 100, income: int = 12, seed_value: int = 42,
+         first_user: int = 0) -> Dict[str, int]:
+    """Seed `users` users with `expenses` expenses and `income` income entries each,
+    plus `groups` groups of `members` members with `group_expenses` expenses each."""
+    rng = random.Random(seed_value)
+    start = dates.today() - timedelta(days=HISTORY_DAYS)
+    names = [username(first_user + i) for i in range(users)]
+    counts = {"users": users, "expenses": 0, "groups": 0, "income": 0}
+
+    # hashing is deliberately slow; every bench user shares one hash
+    password_hash = generate_password_hash(BENCH_PASSWORD)
+    now = datetime.utcnow()
+    db["users"].insert_many([
+        {"username": u, "email": f"{u}@bench.local", "password": password_hash, "created_at": now}
+        for u in names
+    ], ordered=False)
+
+    batch = []
+    for u in names:
+        for _ in range(expenses):
+            batch.append(_random_expense(rng, u, start))
+            if len(batch) >= INSERT_BATCH:
+                _insert_expenses(db, batch)
+                counts["expenses"] += len(batch)
+                batch = []
+    _insert_expenses(db, batch)
+    counts["expenses"] += len(batch)
+
+    income_docs = []
+    totals = {}
+    for u in names:
+        salary = round(rng.uniform(1500, 6000), 2)
+        for k in range(income):
+            amount = salary if k % 4 else round(rng.uniform(50, 800), 2)
+            income_docs.append({
+                "amount": amount,
+                "source": INCOME_SOURCES[0] if k % 4 else rng.choice(INCOME_SOURCES[1:]),
+                "note": None,
+                "date": dates.parse_date(start + timedelta(days=rng.randrange(HISTORY_DAYS))),
+                "user": u,
+            })
+            total, count = totals.get(u, (0.0, 0))
+            totals[u] = (total + amount, count + 1)
+    if income_docs:
+        db["income"].insert_many(income_docs, ordered=False)
+        db["income_totals"].insert_many(
+            [{"_id": u, "total": t, "count": n} for u, (t, n) in totals.items()], ordered=False)
+        counts["income"] = len(income_docs)
+
+    for g in range(groups if names else 0):
+        group_members = rng.sample(names, min(members, len(names)))
+        res = db["groups"].insert_one({
+            "name": f"Bench group {g}",
+            "budget": float(rng.choice([500, 1000, 2500])),
+            "created_by": group_members[0],
+            "members": group_members,
+            "created_at": now.isoformat(),
+        })
+        group_id = str(res.inserted_id)
+        docs = []
+        for _ in range(group_expenses):
+            doc = _random_expense(rng, rng.choice(group_members), start)
+            doc["group_id"] = group_id
+            docs.append(doc)
+        _insert_expenses(db, docs)
+        counts["expenses"] += len(docs)
+        counts["groups"] += 1
+    return counts
+
+
+def clear(db, prefix: str = USER_PREFIX) -> Dict[str, int]:
+    """Delete everything seed() created for users whose name starts with `prefix`."""
+    owned = {"$regex": f"^{prefix}"}
+    group_ids = [str(g["_id"]) for g in db["groups"].find({"created_by": owned}, {"_id": 1})]
+    counts = {
+        "users": db["users"].delete_many({"username": owned}).deleted_count,
+        "expenses": db["expenses"].delete_many(
+            {"$or": [{"user": owned}, {"group_id": {"$in": group_ids}}]}).deleted_count,
+        "groups": db["groups"].delete_many({"created_by": owned}).deleted_count,
+        "income": db["income"].delete_many({"user": owned}).deleted_count,
+    }
+    db[rollups.ROLLUPS_COLLECTION].delete_many({"user": owned})
+    db[rollups.MERCHANTS_COLLECTION].delete_many({"user": owned})
+    db[rollups.GROUPS_COLLECTION].delete_many({"group_id": {"$in": group_ids}})
+    for name in USER_KEYED:
+        db[name].delete_many({"_id": owned})
+    scopes = [versions.user_key(prefix), versions.income_key(prefix), versions.groups_key(prefix)]
+    db[versions.VERSIONS_COLLECTION].delete_many(
+        {"$or": [{"_id": {"$regex": f"^{s}"}} for s in scopes]
+                + [{"_id": {"$in": [versions.group_key(g) for g in group_ids]}}]})
+    return counts
+
+
+def use_mongomock() -> None:
+    """Swap pymongo for the in-memory mongomock stand-in (before app modules connect)."""
+    try:
+        import mongomock
+    except ImportError:
+        raise SystemExit("✗ --mongomock needs `pip install mongomock`")
+    import pymongo
+    import db_utils
+    pymongo.MongoClient = mongomock.MongoClient
+    db_utils.MongoClient = mongomock.MongoClient
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--expenses", type=int, default=200, help="expenses per user")
+    parser.add_argument("--groups", type=int, default=10)
+    parser.add_argument("--members", type=int, default=5, help="members per group")
+    parser.add_argument("--group-expenses", type=int, default=100, help="expenses per group")
+    parser.add_argument("--income", type=int, default=12, help="income entries per user")
+    parser.add_argument("--seed", type=int, default=42)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed synthetic SpendWise data")
+    add_arguments(parser)
+    parser.add_argument("--clear", action="store_true", help="only remove previously seeded data")
+    args = parser.parse_args()
+
+    import db_utils
+    import init_db
+
+    try:
+        if not args.clear and not init_db.init_database():
+            sys.exit(1)
+        db = db_utils.get_db()
+        removed = clear(db)
+        print(f"✓ Removed previous bench data: {removed}")
+        if not args.clear:
+            started = time.perf_counter()
+            counts = seed(db, args.users, args.expenses, args.groups, args.members,
+                          args.group_expenses, args.income, args.seed)
+            print(f"✓ Seeded {counts} in {time.perf_counter() - started:.1f}s")
+        db_utils.close_db()
+    except Exception as e:
+        print(f"✗ Seeding failed: {e}")
+        sys.exit(1)
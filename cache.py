@@ -0,0 +1,251 @@
+"""
+Caches for SpendWise
+Small thread-safe LRU cache with per-entry TTL and hit/miss counters, shared by
+the auth layer and other hot-path lookups, plus a result cache for computed
+analytics with a pluggable in-process or Redis backend.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after `ttl` seconds.
+
+    `on_evict(key)` is called (under the cache's lock) when an entry leaves
+    through LRU eviction or expiry, but not for pop() or clear().
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0,
+                 on_evict: Optional[Callable[[Hashable], None]] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value (refreshing its LRU position) or `default`."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+                if self.on_evict:
+                    self.on_evict(key)
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store `value`, evicting the least recently used entry when full."""
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                evicted, _ = self._data.popitem(last=False)
+                self.evictions += 1
+                if self.on_evict:
+                    self.on_evict(evicted)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove and return an entry (expired or not)."""
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return size and hit/miss counters."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# ---------------- RESULT CACHE ---------------- #
+
+class LocalBackend:
+    """In-process LRU backend (the default). Each worker holds its own copy.
+
+    The tag index only holds keys still in the cache: entries leaving through
+    eviction or expiry are removed from their tags, and empty tags dropped.
+    """
+
+    def __init__(self, maxsize: int = 2048, ttl: float = 600.0):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl, on_evict=self._forget)
+        self._tags = {}
+        self._key_tags = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        return self._entries.get(key)
+
+    def set(self, key: str, value: Any, ttl: float, tags=()) -> None:
+        if ttl <= 0:
+            return
+        # tags first: if the entry is evicted right away, _forget() clears them
+        with self._lock:
+            self._untag(key)
+            self._key_tags[key] = tuple(tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+        self._entries.set(key, value, ttl)
+
+    def invalidate(self, tag: str) -> None:
+        with self._lock:
+            keys = self._tags.pop(tag, ())
+            for key in keys:
+                self._untag(key)
+        for key in keys:
+            self._entries.pop(key)
+
+    def _forget(self, key: str) -> None:
+        with self._lock:
+            self._untag(key)
+
+    def _untag(self, key: str) -> None:
+        for tag in self._key_tags.pop(key, ()):
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def stats(self) -> Dict[str, Any]:
+        s = self._entries.stats()
+        with self._lock:
+            tags = len(self._tags)
+        return {"size": s["size"], "maxsize": s["maxsize"], "evictions": s["evictions"], "tags": tags}
+
+
+class RedisBackend:
+    """Shared backend for multi-worker deployments.
+
+    `client` is a redis-py compatible object (get, set with ex=, delete, sadd,
+    smembers, expire), so a local fake can stand in for tests. Values are
+    stored as JSON.
+    """
+
+    def __init__(self, client, prefix: str = "spendwise:rc:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str) -> Any:
+        raw = self.client.get(self.prefix + key)
+        return None if raw is None else json.loads(raw)
+
+    def set(self, key: str, value: Any, ttl: float, tags=()) -> None:
+        self.client.set(self.prefix + key, json.dumps(value), ex=int(ttl))
+        for tag in tags:
+            tag_key = self.prefix + "tag:" + tag
+            self.client.sadd(tag_key, key)
+            self.client.expire(tag_key, int(ttl))
+
+    def invalidate(self, tag: str) -> None:
+        tag_key = self.prefix + "tag:" + tag
+        keys = [self.prefix + (k.decode("utf-8") if isinstance(k, bytes) else k)
+                for k in self.client.smembers(tag_key)]
+        self.client.delete(tag_key, *keys)
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class ResultCache:
+    """Caches computed endpoint results keyed by a data-version ETag.
+
+    The key already encodes user, endpoint, query params and data version, so
+    any worker's write makes stale entries unreachable. Entries are also
+    tagged with their version scopes so write routes can drop them at once.
+    Backend failures fall through to computing the result.
+    """
+
+    def __init__(self, backend=None, ttl: float = 600.0):
+        self.backend = backend or LocalBackend(ttl=ttl)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def get_or_compute(self, key: str, tags, compute):
+        value = self.lookup(key)
+        if value is not None:
+            return value
+        value = compute()
+        self.store(key, value, tags)
+        return value
+
+    def lookup(self, key: str) -> Any:
+        """The cached value for `key`, or None (counted as a miss)."""
+        try:
+            value = self.backend.get(key)
+        except Exception:
+            self.errors += 1
+            value = None
+        if value is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return value
+
+    def store(self, key: str, value: Any, tags) -> None:
+        try:
+            self.backend.set(key, value, self.ttl, tags)
+        except Exception:
+            self.errors += 1
+
+    def invalidate(self, *tags: str) -> None:
+        for tag in tags:
+            if not tag:
+                continue
+            try:
+                self.backend.invalidate(tag)
+            except Exception:
+                self.errors += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        out = {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+        out.update(self.backend.stats())
+        return out
+
+
+def build_result_cache(url: Optional[str] = None, maxsize: int = 2048, ttl: float = 600.0) -> ResultCache:
+    """Build a ResultCache: Redis when `url` is set (redis:// or rediss://), else in-process."""
+    if url:
+        import redis  # optional dependency, only needed for the shared backend
+        return ResultCache(RedisBackend(redis.Redis.from_url(url)), ttl=ttl)
+    return ResultCache(LocalBackend(maxsize=maxsize, ttl=ttl), ttl=ttl)
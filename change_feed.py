@@ -0,0 +1,301 @@
+"""
+Change Feed for SpendWise
+Turns MongoDB change streams on expenses, budgets, groups and data_versions
+into invalidations of the version scopes they touch (see versions.py), so
+every worker hears about every write, whichever worker or script made it.
+
+Each worker process runs one consumer thread (CHANGE_FEED=on). Changes are
+coalesced for up to FLUSH_MS and published to the worker's Broker:
+
+  - listeners, which drop cached results (app.py)
+  - subscriptions, which back the Server-Sent Events on /api/events
+
+Change streams need a replica set; a single-node one is enough, including a
+local mongod for offline testing (see MONGODB_SETUP.md). Against a standalone
+server the consumer logs a warning and stops; writes are then only published
+inside the worker that made them. After an error the stream is resumed from
+the last published change; if that is no longer in the oplog, RESET is
+published and everything cached is dropped.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+import rollups
+import versions
+
+logger = logging.getLogger(__name__)
+
+# Collections whose changes are published
+WATCHED = ["expenses", "budgets", "groups", versions.VERSIONS_COLLECTION]
+# Matches every scope; published when changes may have been missed
+RESET = "*"
+# How long changes are coalesced before publishing
+FLUSH_MS = 250
+# Events held for a subscriber that is not reading; later ones are dropped
+MAX_PENDING = 100
+MAX_BACKOFF = 30.0
+
+# "$changeStream is only supported on replica sets", and the resume point
+# having rolled off the oplog
+NOT_REPLICA_SET = 40573
+HISTORY_LOST = 286
+
+PIPELINE = [{"$match": {
+    "ns.coll": {"$in": WATCHED},
+    "operationType": {"$in": ["insert", "update", "replace", "delete"]},
+}}]
+
+
+def scopes_for(change: Dict[str, Any]) -> List[str]:
+    """The version scopes a change event touches.
+
+    Updates and deletes carry the document before the change when the
+    collection records pre-images, and the document after it for updates
+    (fullDocument="updateLookup"), so a moved expense invalidates both owners.
+    """
+    coll = change.get("ns", {}).get("coll")
+    if coll == versions.VERSIONS_COLLECTION:
+        return [str(change["documentKey"]["_id"])]
+    keys = []
+    for doc in (change.get("fullDocument"), change.get("fullDocumentBeforeChange")):
+        if not doc:
+            continue
+        if coll == "expenses":
+            owner = rollups.expense_owner(doc)
+            if owner:
+                keys.append(versions.user_key(owner))
+            if doc.get("group_id"):
+                keys.append(versions.group_key(str(doc["group_id"])))
+        elif coll == "budgets" and doc.get("user"):
+            keys.append(versions.user_key(doc["user"]))
+        elif coll == "groups":
+            keys.append(versions.group_key(str(doc["_id"])))
+            keys += [versions.groups_key(m) for m in doc.get("members", [])]
+    return list(dict.fromkeys(keys))
+
+
+def sse_frame(scope: str) -> str:
+    """One Server-Sent Event telling the client which of its scopes changed.
+
+    The username is left out: a subscriber only receives its own scopes.
+    """
+    kind, _, ident = scope.partition(":")
+    data = {"scope": kind}
+    if kind == "group":
+        data["id"] = ident
+    return f"event: invalidate\ndata: {json.dumps(data)}\n\n"
+
+
+KEEPALIVE_FRAME = ": keep-alive\n\n"
+# how long browsers wait before reconnecting, in milliseconds
+RETRY_FRAME = "retry: 5000\n\n"
+
+
+# ---------------- BROKER ---------------- #
+
+class Subscription:
+    """The scopes one client follows, and the events queued for it."""
+
+    def __init__(self, keys: Iterable[str], deliver: Optional[Callable[[str], None]] = None):
+        self.keys = frozenset(keys)
+        self._queue: "queue.Queue[str]" = queue.Queue(maxsize=MAX_PENDING)
+        # asyncio servers pass a callback that hands the scope to their loop
+        self.deliver = deliver or self._offer
+
+    def _offer(self, scope: str) -> None:
+        try:
+            self._queue.put_nowait(scope)
+        except queue.Full:
+            pass  # invalidations repeat; the client refetches anyway
+
+    def get(self, timeout: float) -> Optional[str]:
+        """The next changed scope, or None after `timeout` seconds."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class Broker:
+    """Fans published scopes out to in-process listeners and subscriptions."""
+
+    def __init__(self):
+        self._subscriptions: Set[Subscription] = set()
+        self._listeners: List[Callable[[List[str], Set[str]], None]] = []
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def add_listener(self, fn: Callable[[List[str], Set[str]], None]) -> None:
+        """Call fn(keys, unversioned) for every publish (see ChangeFeed)."""
+        self._listeners.append(fn)
+
+    def subscribe(self, keys: Iterable[str],
+                  deliver: Optional[Callable[[str], None]] = None) -> Subscription:
+        sub = Subscription(keys, deliver)
+        with self._lock:
+            self._subscriptions.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            self._subscriptions.discard(sub)
+
+    def publish(self, keys: Iterable[str], unversioned: Iterable[str] = ()) -> None:
+        keys = [k for k in dict.fromkeys(keys) if k]
+        if not keys:
+            return
+        self.published += len(keys)
+        unversioned = set(unversioned)
+        for fn in self._listeners:
+            try:
+                fn(keys, unversioned)
+            except Exception:
+                logger.exception("Change listener failed")
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for sub in subscriptions:
+            for key in keys:
+                if key == RESET or key in sub.keys:
+                    sub.deliver(key)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            subscribers = len(self._subscriptions)
+        return {"subscribers": subscribers, "published": self.published}
+
+
+# ---------------- CONSUMER ---------------- #
+
+class ChangeFeed:
+    """Background thread publishing this worker's view of the change stream."""
+
+    def __init__(self, get_db: Callable[[], Any], broker: Broker):
+        self.get_db = get_db
+        self.broker = broker
+        self.resume_token = None
+        self.running = False       # the stream is open
+        self.unsupported = False   # the server cannot stream changes
+        self._pid = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Start the consumer once per process (threads do not survive a fork)."""
+        pid = os.getpid()
+        if self.unsupported or (self._pid == pid and self._thread is not None):
+            return
+        with self._lock:
+            if self._pid == pid and self._thread is not None:
+                return
+            self._pid = pid
+            self.running = False
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="change-feed", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        backoff = 1.0
+        while not self._stop.is_set():
+            try:
+                self._consume()
+                backoff = 1.0
+            except OperationFailure as e:
+                self.running = False
+                if e.code == NOT_REPLICA_SET:
+                    self.unsupported = True
+                    logger.warning("Change feed disabled: MongoDB is not a replica set (%s)", e)
+                    return
+                if e.code == HISTORY_LOST:
+                    logger.warning("Change feed lost its resume point; dropping cached results")
+                    self.resume_token = None
+                    self.broker.publish([RESET])
+                    continue
+                logger.warning("Change feed interrupted: %s; retrying in %.0fs", e, backoff)
+            except PyMongoError as e:
+                self.running = False
+                logger.warning("Change feed interrupted: %s; retrying in %.0fs", e, backoff)
+            except Exception:
+                self.running = False
+                logger.exception("Change feed stopped")
+                return
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, MAX_BACKOFF)
+
+    def _consume(self) -> None:
+        db = self.get_db()
+        options = {}
+        # pre-images (MongoDB 6.0+) name the owner of deleted expenses; see MONGODB_SETUP.md
+        if tuple(db.client.server_info().get("versionArray", [0])[:1]) >= (6,):
+            options["full_document_before_change"] = "whenAvailable"
+        with db.watch(PIPELINE, full_document="updateLookup", resume_after=self.resume_token,
+                      max_await_time_ms=FLUSH_MS, **options) as stream:
+            self.running = True
+            logger.info("Change feed watching %s", ", ".join(WATCHED))
+            bumped: Dict[str, None] = {}
+            touched: Dict[str, None] = {}
+            flush_at = None
+            while stream.alive and not self._stop.is_set():
+                change = stream.try_next()
+                if change is not None:
+                    target = bumped if change["ns"]["coll"] == versions.VERSIONS_COLLECTION else touched
+                    target.update(dict.fromkeys(scopes_for(change)))
+                    if flush_at is None:
+                        flush_at = time.monotonic() + FLUSH_MS / 1000
+                    # under a steady stream of writes, still publish every FLUSH_MS
+                    if time.monotonic() < flush_at:
+                        continue
+                if bumped or touched:
+                    # scopes only seen in the data collections changed without a
+                    # version bump (scripts, the mongo shell)
+                    self.broker.publish([*bumped, *touched],
+                                        unversioned=set(touched) - set(bumped))
+                    bumped.clear()
+                    touched.clear()
+                flush_at = None
+                self.resume_token = stream.resume_token
+        self.running = False
+
+
+if __name__ == "__main__":
+    # Print the scopes every change touches, e.g. while testing a local replica set
+    import sys
+
+    import db_utils
+
+    def show(keys, unversioned):
+        for key in keys:
+            print(f"  {key}{'  (no version bump)' if key in unversioned else ''}", flush=True)
+
+    try:
+        db = db_utils.get_db()
+        db.client.admin.command('ping')
+        print(f"✓ Connected to {db.name}")
+        broker = Broker()
+        broker.add_listener(show)
+        feed = ChangeFeed(db_utils.get_db, broker)
+        feed.start()
+        while not feed.running and not feed.unsupported:
+            time.sleep(0.05)
+        if feed.unsupported:
+            print("✗ Change streams need a replica set (see MONGODB_SETUP.md)")
+            sys.exit(1)
+        print(f"✓ Watching {', '.join(WATCHED)}; Ctrl+C to stop")
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        db_utils.close_db()
+    except Exception as e:
+        print(f"✗ Change feed failed: {e}")
+        sys.exit(1)
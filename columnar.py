@@ -0,0 +1,341 @@
+"""
+Columnar Expense Cache for SpendWise
+Opt-in in-process cache holding each hot user's expenses as numpy columns
+instead of lists of BSON dicts, so analytics, summaries and forecasts are
+vectorized reductions over a few arrays:
+
+    ids       12-byte ObjectIds (S12)
+    amount    float64
+    day       int32 days since 1970-01-01 (NO_DAY when missing or unparseable)
+    category  int32 code into a process-wide string table (0 is None)
+    note      int32 code into the same table
+    legacy    bool, owned through the legacy `user_id` field only
+
+About 33 bytes per expense, against some 600 bytes for the equivalent dicts,
+plus the string table, which counts toward the same budget.
+Entries are tagged with the user's data version (see versions.py) and only
+served while it is current. Write routes in this process patch the columns in
+place when their bump moves the version by exactly one; writes handled by
+other workers make the entry stale and it is reloaded on next use. The least
+recently used users are evicted to stay within the memory budget
+(COLUMNAR_CACHE_MB; 0, the default, turns the cache off). The table only
+grows, so once it takes more than TABLE_SHARE of the budget the whole cache
+is rebuilt.
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+import dates
+import rollups
+import summary
+
+# Fields loaded for each expense
+FIELDS = {"_id": 1, "user": 1, "amount": 1, "category": 1, "note": 1, "date": 1}
+
+NO_DAY = np.iinfo(np.int32).min
+EPOCH = datetime(1970, 1, 1)
+# fixed per-entry cost on top of the arrays (objects, dict slot, LRU links)
+ENTRY_OVERHEAD = 1024
+# share of the budget the string table may take before the whole cache is
+# rebuilt (free-text notes grow it)
+TABLE_SHARE = 0.5
+# per-string cost on top of the str object (dict entry, list slot, code int)
+STRING_OVERHEAD = 100
+
+
+class StringTable:
+    """Interns category and note strings as int32 codes shared by every user."""
+
+    def __init__(self):
+        self._codes: Dict[str, int] = {}
+        self._strings: List[Optional[str]] = [None]
+        self.nbytes = sys.getsizeof(self._codes) + sys.getsizeof(self._strings)
+
+    def code(self, value: Any) -> int:
+        if value is None:
+            return 0
+        value = str(value)
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self._strings)
+            self._strings.append(value)
+            self.nbytes += sys.getsizeof(value) + STRING_OVERHEAD
+        return code
+
+    def string(self, code: int) -> Optional[str]:
+        return self._strings[code]
+
+    def __len__(self) -> int:
+        return len(self._strings)
+
+
+def _day(value: Any) -> int:
+    if value is None:
+        return NO_DAY
+    try:
+        return (dates.parse_date(value) - EPOCH).days
+    except ValueError:
+        return NO_DAY
+
+
+class UserColumns:
+    """One user's expenses as parallel arrays, tagged with their data version."""
+
+    __slots__ = ("version", "table", "ids", "amount", "day", "category", "note", "legacy")
+
+    def __init__(self, version: int, table: StringTable, ids, amount, day, category, note, legacy):
+        self.version = version
+        self.table = table
+        self.ids = ids
+        self.amount = amount
+        self.day = day
+        self.category = category
+        self.note = note
+        self.legacy = legacy
+
+    @classmethod
+    def from_docs(cls, version: int, docs: Iterable[Dict[str, Any]], table: StringTable) -> "UserColumns":
+        ids, amount, day, category, note, legacy = [], [], [], [], [], []
+        for d in docs:
+            ids.append(d["_id"].binary)
+            amount.append(float(d.get("amount") or 0))
+            day.append(_day(d.get("date")))
+            category.append(table.code(d.get("category")))
+            note.append(table.code(d.get("note")))
+            legacy.append(not d.get("user"))
+        return cls(version, table, np.array(ids, dtype="S12"), np.array(amount, dtype=np.float64),
+                   np.array(day, dtype=np.int32), np.array(category, dtype=np.int32),
+                   np.array(note, dtype=np.int32), np.array(legacy, dtype=bool))
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.ids, self.amount, self.day, self.category,
+                                      self.note, self.legacy)) + ENTRY_OVERHEAD
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def upsert(self, docs: List[Dict[str, Any]]) -> None:
+        """Insert or replace expenses by _id."""
+        new = UserColumns.from_docs(self.version, docs, self.table)
+        keep = ~np.isin(self.ids, new.ids)
+        for name in ("ids", "amount", "day", "category", "note", "legacy"):
+            setattr(self, name, np.concatenate([getattr(self, name)[keep], getattr(new, name)]))
+
+    def remove(self, ids: List[bytes]) -> None:
+        keep = ~np.isin(self.ids, np.array(ids, dtype="S12"))
+        for name in ("ids", "amount", "day", "category", "note", "legacy"):
+            setattr(self, name, getattr(self, name)[keep])
+
+
+# ---------------- REDUCTIONS ---------------- #
+
+def _group_sum(keys: np.ndarray, amount: np.ndarray):
+    """(unique keys ascending, their amount totals, their row counts)."""
+    unique, inverse = np.unique(keys, return_inverse=True)
+    return (unique, np.bincount(inverse, weights=amount, minlength=len(unique)),
+            np.bincount(inverse, minlength=len(unique)))
+
+
+def _months(day: np.ndarray) -> np.ndarray:
+    """Month index (months since 1970-01) of each day; -1 where undated."""
+    months = day.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    return np.where(day == NO_DAY, -1, months)
+
+
+def _month_label(index: int) -> Optional[str]:
+    if index < 0:
+        return None
+    return f"{1970 + index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def summarize(cols: UserColumns, sections: Iterable[str] = summary.SECTIONS) -> Dict[str, Any]:
+    """summary.run_summary() computed from the columns; the same response shape."""
+    table = cols.table
+    own = ~cols.legacy  # the summary matches on `user` only
+    amount = cols.amount[own]
+    out: Dict[str, Any] = {}
+    for s in sections:
+        if s == "total":
+            out["total"] = float(amount.sum())
+        elif s == "by_category":
+            codes, totals, _ = _group_sum(cols.category[own], amount)
+            order = np.argsort(-totals, kind="stable")
+            out["by_category"] = [{"category": table.string(int(codes[i])), "total": float(totals[i])}
+                                  for i in order]
+        elif s == "monthly":
+            months, totals, _ = _group_sum(_months(cols.day[own]), amount)
+            out["monthly"] = [{"month": _month_label(int(m)), "total": float(t)}
+                              for m, t in zip(months, totals)]
+        elif s == "top_merchants":
+            notes = cols.note[own]
+            named = notes != 0
+            codes, totals, _ = _group_sum(notes[named], amount[named])
+            order = np.argsort(-totals, kind="stable")[:summary.TOP_MERCHANTS_LIMIT]
+            out["top_merchants"] = [{"merchant": table.string(int(codes[i])), "total": float(totals[i])}
+                                    for i in order]
+    return out
+
+
+def rollup_docs(cols: UserColumns) -> Dict[str, List[Dict[str, Any]]]:
+    """The user's expense_rollups and merchant_rollups documents, computed from the
+    columns with the same bucketing as rollups.py (for build_analytics and forecasting)."""
+    table = cols.table
+    current = (dates.today() - EPOCH).days
+    day = np.where(cols.day == NO_DAY, current, cols.day)
+    months = _months(day)
+    # one combined key per (month, category) bucket
+    width = max(len(table), 1)
+    keys, totals, counts = _group_sum(months * width + cols.category, cols.amount)
+    other = rollups.DEFAULT_CATEGORY
+    month_docs = [{
+        "month": _month_label(int(k // width)),
+        "category": table.string(int(k % width)) if k % width else other,
+        "total": float(t),
+        "count": int(n),
+    } for k, t, n in zip(keys, totals, counts)]
+
+    codes, totals, counts = _group_sum(cols.note, cols.amount)
+    merchant_docs = [{
+        "merchant": table.string(int(c)) if c else rollups.DEFAULT_MERCHANT,
+        "total": float(t),
+        "count": int(n),
+    } for c, t, n in zip(codes, totals, counts)]
+    return {"months": month_docs, "merchants": merchant_docs}
+
+
+# ---------------- CACHE ---------------- #
+
+class ColumnCache:
+    """Per-user UserColumns, LRU-evicted to keep them and the string table
+    within `budget_bytes`."""
+
+    def __init__(self, budget_bytes: int = 0):
+        self.budget_bytes = budget_bytes
+        self.table = StringTable()
+        self._entries: "OrderedDict[str, UserColumns]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.patches = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.budget_bytes > 0
+
+    def get(self, username: str, version: int,
+            load: Callable[[], Iterable[Dict[str, Any]]]) -> Optional[UserColumns]:
+        """The user's columns at `version`, loading them with `load()` when missing or stale."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            cols = self._entries.get(username)
+            if cols is not None and cols.version == version:
+                self._entries.move_to_end(username)
+                self.hits += 1
+                return cols
+            self.misses += 1
+        docs = list(load())
+        with self._lock:
+            if self._table_full():
+                self._reset()
+            cols = UserColumns.from_docs(version, docs, self.table)
+            current = self._entries.get(username)
+            # a concurrent write may have patched a newer entry in meanwhile
+            if current is None or current.version <= version:
+                self._put(username, cols)
+        return cols
+
+    def apply(self, username: str, version: int, upserted: List[Dict[str, Any]] = (),
+              removed: List[Dict[str, Any]] = ()) -> None:
+        """Patch the user's columns for a write that moved their version to `version`.
+
+        Only an entry exactly one version behind is patched; anything else is
+        dropped and reloaded on next use. Patches are idempotent by _id, so an
+        entry loaded after the write but before its version bump stays right.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            cols = self._entries.get(username)
+            if cols is None:
+                return
+            if cols.version != version - 1:
+                self._drop(username)
+                return
+            self._bytes -= cols.nbytes
+            if removed:
+                cols.remove([d["_id"].binary for d in removed])
+            if upserted:
+                cols.upsert(list(upserted))
+            cols.version = version
+            self._bytes += cols.nbytes
+            self.patches += 1
+            self._evict()
+
+    def invalidate(self, username: str) -> None:
+        with self._lock:
+            self._drop(username)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._reset()
+
+    def _put(self, username: str, cols: UserColumns) -> None:
+        self._drop(username)
+        self._entries[username] = cols
+        self._bytes += cols.nbytes
+        self._evict()
+
+    def _drop(self, username: str) -> None:
+        cols = self._entries.pop(username, None)
+        if cols is not None:
+            self._bytes -= cols.nbytes
+
+    def _table_full(self) -> bool:
+        return self.table.nbytes > self.budget_bytes * TABLE_SHARE
+
+    def _evict(self) -> None:
+        # evicting users does not shrink the table; only starting over does
+        if self._table_full():
+            self.evictions += len(self._entries)
+            self._reset()
+            return
+        while self._bytes + self.table.nbytes > self.budget_bytes and self._entries:
+            _, cols = self._entries.popitem(last=False)
+            self._bytes -= cols.nbytes
+            self.evictions += 1
+
+    def _reset(self) -> None:
+        # codes are only meaningful with their table, so both go together
+        self._entries.clear()
+        self._bytes = 0
+        self.table = StringTable()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        with self._lock:
+            users = len(self._entries)
+            rows = sum(len(c) for c in self._entries.values())
+        return {
+            "enabled": self.enabled,
+            "users": users,
+            "expenses": rows,
+            "bytes": self._bytes + self.table.nbytes,
+            "budget_bytes": self.budget_bytes,
+            "strings": len(self.table),
+            "table_bytes": self.table.nbytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "patches": self.patches,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
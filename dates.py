@@ -0,0 +1,122 @@
+"""
+Expense Dates for SpendWise
+Expenses used to store `date` as a 'YYYY-MM-DD' string, so every monthly
+pipeline grouped on {'$substr': ['$date', 0, 7]} and date filters compared
+strings. New writes store `date` as a BSON datetime (midnight UTC) plus a
+precomputed `ym` ('YYYY-MM') bucket indexed as (user, ym).
+
+Until migrate_dates.py has converted the old documents, reads accept both
+shapes (dual-read). Once it reports nothing left to migrate, set
+EXPENSE_DATES=native to drop the string fallbacks from every query.
+
+Expense lists sorted on `date` (/get-expenses, group ledgers, exports)
+follow MongoDB's type order: in dual mode every legacy string-dated row comes
+after every native one, newest first within each shape, whatever the calendar
+dates. The cursors below page across that boundary; running the migration
+restores one calendar order.
+"""
+
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+DATE_FORMAT = "%Y-%m-%d"
+MONTH_FORMAT = "%Y-%m"
+
+# 'dual' while legacy string dates may still exist, 'native' after migration
+NATIVE_ONLY = os.getenv("EXPENSE_DATES", "dual").lower() == "native"
+
+
+def parse_date(value: Any) -> datetime:
+    """Return a naive UTC midnight datetime for a 'YYYY-MM-DD' string or datetime."""
+    if isinstance(value, datetime):
+        return datetime(value.year, value.month, value.day)
+    try:
+        return datetime.strptime(str(value), DATE_FORMAT)
+    except ValueError:
+        raise ValueError("dates must be YYYY-MM-DD")
+
+
+def today() -> datetime:
+    return parse_date(datetime.utcnow())
+
+
+def date_fields(value: Any) -> Dict[str, Any]:
+    """The stored date fields for an expense: {'date': datetime, 'ym': 'YYYY-MM'}."""
+    date = parse_date(value) if value else today()
+    return {"date": date, "ym": date.strftime(MONTH_FORMAT)}
+
+
+def format_date(value: Any) -> Optional[str]:
+    """Render a stored date (datetime or legacy string) as 'YYYY-MM-DD'."""
+    if isinstance(value, datetime):
+        return value.strftime(DATE_FORMAT)
+    return value
+
+
+def month_of(doc: Dict[str, Any]) -> Optional[str]:
+    """The 'YYYY-MM' bucket of an expense document, old or new shape."""
+    if doc.get("ym"):
+        return doc["ym"]
+    date = doc.get("date")
+    if isinstance(date, datetime):
+        return date.strftime(MONTH_FORMAT)
+    if isinstance(date, str):
+        return date[:7]
+    return None
+
+
+# Aggregation expression for an expense's month bucket
+MONTH_EXPR = "$ym" if NATIVE_ONLY else {"$ifNull": ["$ym", {"$substr": ["$date", 0, 7]}]}
+# Fields MONTH_EXPR reads
+MONTH_FIELDS = ("ym",) if NATIVE_ONLY else ("ym", "date")
+
+
+def range_filter(date_from: Optional[str] = None, date_to: Optional[str] = None) -> Dict[str, Any]:
+    """Filter on `date` for inclusive YYYY-MM-DD bounds (either may be omitted).
+
+    Native dates are matched with a datetime range scan; in dual mode legacy
+    string dates are matched with the equivalent string range.
+    """
+    native = {}
+    legacy = {}
+    if date_from:
+        native["$gte"] = parse_date(date_from)
+        legacy["$gte"] = date_from
+    if date_to:
+        native["$lt"] = parse_date(date_to) + timedelta(days=1)
+        legacy["$lte"] = date_to
+    if not native:
+        return {}
+    if NATIVE_ONLY:
+        return {"date": native}
+    return {"$or": [{"date": native}, {"date": legacy}]}
+
+
+def encode_value(value: Any) -> Any:
+    """JSON-safe form of a stored date, for continuation cursors."""
+    if isinstance(value, datetime):
+        return {"$d": value.strftime(DATE_FORMAT)}
+    return value
+
+
+def decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "$d" in value:
+        return parse_date(value["$d"])
+    return value
+
+
+def keyset_after(field: str, value: Any, oid) -> Dict[str, Any]:
+    """Documents strictly after (value, oid) when sorted by field desc, _id desc.
+
+    MongoDB orders dates above strings above null/missing, so while legacy
+    string dates remain a cursor on a datetime must also admit every lower
+    type bracket.
+    """
+    clauses = [{field: value, "_id": {"$lt": oid}}]
+    if value is not None:
+        clauses.append({field: {"$lt": value}})
+        clauses.append({field: None})
+    if isinstance(value, datetime) and not NATIVE_ONLY:
+        clauses.append({field: {"$type": "string"}})
+    return {"$or": clauses}
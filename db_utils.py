@@ -1,193 +1,365 @@
 """
 MongoDB Utilities for SpendWise
-This module provides helper functions for database operations and connection management.
+This module owns the process's MongoDB client and the repository helpers
+shared by app.py and the command line tools (init_db.py, rollups.py, ...).
+
+One pooled client per process: it is created on first use (no ping), and a
+process forked from one that already had a client (e.g. a gunicorn worker
+after --preload) transparently builds its own. Repository calls return typed
+records and record per-operation timings (see operation_timings).
 """
 
+import logging
 import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from functools import wraps
+from typing import Dict, Any, Optional, List
+
+from bson import ObjectId
 from pymongo import MongoClient
-from pymongo.errors import PyMongoError, ConnectionFailure, ServerSelectionTimeoutError
+from pymongo.errors import PyMongoError, DuplicateKeyError
 from dotenv import load_dotenv
-from typing import Dict, Any, Optional, List
+
+import dates
+import metrics
+import rollups
+import summary
+import versions
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 
 class MongoDBConnection:
-    """Singleton class for MongoDB connection management."""
-    
+    """Per-process singleton owning the MongoClient and its connection pool."""
+
     _instance = None
-    _client = None
-    _db = None
-    
+    _lock = threading.Lock()
+
     def __new__(cls):
         if cls._instance is None:
-            cls._instance = super(MongoDBConnection, cls).__new__(cls)
-            cls._instance._initialize()
+            with cls._lock:
+                if cls._instance is None:
+                    instance = super(MongoDBConnection, cls).__new__(cls)
+                    instance._client = None
+                    instance._db = None
+                    instance._pid = None
+                    instance.max_pool_size = None
+                    cls._instance = instance
         return cls._instance
-    
-    def _initialize(self):
-        """Initialize MongoDB connection."""
-        try:
+
+    def _ensure(self):
+        """Create the client on first use, and again in a forked child."""
+        pid = os.getpid()
+        if self._client is not None and self._pid == pid:
+            return
+        with self._lock:
+            if self._client is not None and self._pid == pid:
+                return
+            # A client inherited across fork() must not be used or closed by
+            # the child; the parent still owns its sockets.
+            started = time.perf_counter()
             mongo_uri = os.getenv("MONGODB_URI", "mongodb://localhost:27017/")
             db_name = os.getenv("MONGODB_DB_NAME", "SpendWiseDB")
-            
+            self.max_pool_size = int(os.getenv("MONGODB_MAX_POOL_SIZE", 50))
             self._client = MongoClient(
                 mongo_uri,
                 serverSelectionTimeoutMS=5000,
                 connectTimeoutMS=10000,
                 retryWrites=True,
-                maxPoolSize=50,
-                minPoolSize=10
+                maxPoolSize=self.max_pool_size,
+                minPoolSize=int(os.getenv("MONGODB_MIN_POOL_SIZE", 0)),
+                event_listeners=[metrics.command_listener]
             )
-            
-            # Test connection
-            self._client.admin.command('ping')
             self._db = self._client[db_name]
-            print("✓ MongoDB connection established")
-            
-        except (ConnectionFailure, ServerSelectionTimeoutError) as e:
-            print(f"✗ Failed to connect to MongoDB: {e}")
-            raise
-    
+            self._pid = pid
+            logger.info("MongoDB client for %s created in %.1f ms (pid %s)",
+                        db_name, (time.perf_counter() - started) * 1000, pid)
+
     def get_db(self):
         """Get database instance."""
+        self._ensure()
         return self._db
-    
+
     def get_client(self):
         """Get MongoDB client."""
+        self._ensure()
         return self._client
-    
+
+    @property
+    def connected(self) -> bool:
+        """Whether this process has created its client yet."""
+        return self._client is not None and self._pid == os.getpid()
+
     def close(self):
-        """Close MongoDB connection."""
-        if self._client:
-            self._client.close()
-            print("✓ MongoDB connection closed")
+        """Close MongoDB connection (only the one this process created)."""
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+                logger.info("MongoDB connection closed")
+            self._client = None
+            self._db = None
+            self._pid = None
+
+
+class LazyDatabase:
+    """Stands in for the pymongo Database until it is first used."""
+
+    def __getitem__(self, name):
+        return get_db()[name]
+
+    def __getattr__(self, name):
+        return getattr(get_db(), name)
+
+
+class LazyCollection:
+    """Stands in for a pymongo Collection until it is first used."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(get_db()[self.name], attr)
+
+
+# ---------------- OPERATION TIMINGS ---------------- #
+
+class OperationTimings:
+    """Thread-safe count / total / max milliseconds per repository operation."""
+
+    def __init__(self):
+        self._ops = {}
+        self._lock = threading.Lock()
+
+    def record(self, op: str, elapsed_ms: float) -> None:
+        with self._lock:
+            count, total, worst = self._ops.get(op, (0, 0.0, 0.0))
+            self._ops[op] = (count + 1, total + elapsed_ms, max(worst, elapsed_ms))
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            ops = dict(self._ops)
+        return {
+            op: {"count": count, "avg_ms": round(total / count, 3), "max_ms": round(worst, 3)}
+            for op, (count, total, worst) in sorted(ops.items())
+        }
+
+
+operation_timings = OperationTimings()
+
+
+def timed(op: str):
+    """Decorator recording the wall time of a repository operation."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                operation_timings.record(op, (time.perf_counter() - started) * 1000)
+        return wrapper
+    return decorator
+
+
+# ---------------- RECORDS ---------------- #
+
+# Fields read for each record type; nothing else leaves the server
+USER_FIELDS = {"username": 1, "email": 1, "name": 1, "password": 1, "created_at": 1}
+EXPENSE_FIELDS = {"user": 1, "amount": 1, "category": 1, "note": 1, "date": 1, "group_id": 1}
+
+
+@dataclass(frozen=True)
+class UserRecord:
+    username: str
+    email: Optional[str] = None
+    name: Optional[str] = None
+    password_hash: Optional[str] = field(default=None, repr=False)
+    created_at: Optional[datetime] = None
+
+    @classmethod
+    def from_doc(cls, doc: Dict[str, Any]) -> "UserRecord":
+        return cls(
+            username=doc["username"],
+            email=doc.get("email"),
+            name=doc.get("name"),
+            password_hash=doc.get("password"),
+            created_at=doc.get("created_at"),
+        )
+
+
+@dataclass(frozen=True)
+class ExpenseRecord:
+    id: str
+    user: Optional[str]
+    amount: float
+    category: Optional[str] = None
+    note: Optional[str] = None
+    date: Optional[str] = None
+    group_id: Optional[str] = None
+
+    @classmethod
+    def from_doc(cls, doc: Dict[str, Any]) -> "ExpenseRecord":
+        return cls(
+            id=str(doc["_id"]),
+            user=doc.get("user"),
+            amount=float(doc.get("amount") or 0),
+            category=doc.get("category"),
+            note=doc.get("note"),
+            date=dates.format_date(doc.get("date")),
+            group_id=doc.get("group_id"),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
 
 
 class DatabaseHelper:
-    """Helper class for common database operations."""
-    
+    """Helper class for common database operations.
+
+    app.py reads user accounts through it; the other routes query their
+    collections directly (see DEVELOPERS_GUIDE.md, "Share One Client Per Process").
+    """
+
     @staticmethod
     def connect():
         """Get database connection."""
         return MongoDBConnection().get_db()
-    
+
     @staticmethod
+    @timed("user_exists")
     def user_exists(db, username: str) -> bool:
         """Check if user exists."""
-        users_col = db["users"]
-        return users_col.find_one({"username": username}) is not None
-    
+        return db["users"].find_one({"username": username}, {"_id": 1}) is not None
+
     @staticmethod
-    def get_user(db, username: str) -> Optional[Dict]:
-        """Get user document."""
-        users_col = db["users"]
-        return users_col.find_one({"username": username})
-    
+    @timed("get_user")
+    def get_user(db, username: str) -> Optional[UserRecord]:
+        """Get a user by username."""
+        doc = db["users"].find_one({"username": username}, USER_FIELDS)
+        return UserRecord.from_doc(doc) if doc else None
+
+    @staticmethod
+    @timed("find_login_user")
+    def find_login_user(db, identifier: str) -> Optional[UserRecord]:
+        """Get a user by username or email (both are unique)."""
+        doc = db["users"].find_one(
+            {"$or": [{"username": identifier}, {"email": identifier}]}, USER_FIELDS
+        )
+        return UserRecord.from_doc(doc) if doc else None
+
+    @staticmethod
+    @timed("user_or_email_taken")
+    def user_or_email_taken(db, username: str, email: str) -> bool:
+        """True if the username or the email is already registered."""
+        return db["users"].find_one(
+            {"$or": [{"username": username}, {"email": email}]}, {"_id": 1}
+        ) is not None
+
     @staticmethod
+    @timed("create_user")
     def create_user(db, username: str, email: str, password_hash: str) -> bool:
-        """Create new user."""
+        """Create new user. Returns False if the username or email is taken."""
         try:
             users_col = db["users"]
             result = users_col.insert_one({
                 "username": username,
                 "email": email,
                 "password": password_hash,
-                "created_at": db.client.admin.command("ping")  # Get server time
+                "created_at": datetime.utcnow()
             })
             return result.inserted_id is not None
+        except DuplicateKeyError:
+            return False
         except PyMongoError as e:
-            print(f"Error creating user: {e}")
+            logger.error("Error creating user: %s", e)
             return False
-    
+
     @staticmethod
-    def add_expense(db, username: str, amount: float, category: str, 
+    @timed("add_expense")
+    def add_expense(db, username: str, amount: float, category: str,
                    note: str = "", date: str = None, group_id: str = None) -> Optional[str]:
         """Add new expense."""
         try:
-            from datetime import datetime
             expenses_col = db["expenses"]
             expense = {
                 "user": username,
                 "amount": amount,
                 "category": category,
                 "note": note,
-                "date": date or datetime.utcnow().strftime('%Y-%m-%d'),
+                **dates.date_fields(date),
                 "created_at": datetime.utcnow()
             }
             if group_id:
                 expense["group_id"] = group_id
-            
+
             result = expenses_col.insert_one(expense)
+            rollups.apply_expense(db, expense)
+            versions.bump(db, versions.user_key(username),
+                          versions.group_key(group_id) if group_id else None)
             return str(result.inserted_id)
         except PyMongoError as e:
-            print(f"Error adding expense: {e}")
+            logger.error("Error adding expense: %s", e)
             return None
-    
+
     @staticmethod
-    def get_expenses(db, username: str, limit: int = 100) -> List[Dict]:
-        """Get all expenses for a user."""
+    @timed("get_expenses")
+    def get_expenses(db, username: str, limit: int = 100) -> List[ExpenseRecord]:
+        """Get a user's most recent expenses."""
         try:
-            expenses_col = db["expenses"]
-            expenses = list(expenses_col.find({"user": username}).sort("date", -1).limit(limit))
-            
-            # Convert ObjectId to string
-            for exp in expenses:
-                exp['id'] = str(exp.pop('_id'))
-            
-            return expenses
+            docs = (db["expenses"].find({"user": username}, EXPENSE_FIELDS)
+                    .sort([("date", -1), ("_id", -1)]).limit(limit))
+            return [ExpenseRecord.from_doc(doc) for doc in docs]
         except PyMongoError as e:
-            print(f"Error getting expenses: {e}")
+            logger.error("Error getting expenses: %s", e)
             return []
-    
+
     @staticmethod
+    @timed("get_expenses_by_category")
     def get_expenses_by_category(db, username: str) -> Dict[str, float]:
         """Get total expenses grouped by category."""
         try:
-            expenses_col = db["expenses"]
-            pipeline = [
-                {"$match": {"user": username}},
-                {"$group": {"_id": "$category", "total": {"$sum": "$amount"}}},
-                {"$sort": {"total": -1}}
-            ]
-            result = expenses_col.aggregate(pipeline)
-            return {doc["_id"]: doc["total"] for doc in result}
+            by_category = summary.run_summary(db["expenses"], {"user": username}, ("by_category",))
+            return {row["category"]: row["total"] for row in by_category["by_category"]}
         except PyMongoError as e:
-            print(f"Error getting expenses by category: {e}")
+            logger.error("Error getting expenses by category: %s", e)
             return {}
-    
+
     @staticmethod
+    @timed("get_monthly_expenses")
     def get_monthly_expenses(db, username: str) -> Dict[str, float]:
         """Get total expenses by month."""
         try:
-            expenses_col = db["expenses"]
-            pipeline = [
-                {"$match": {"user": username}},
-                {"$project": {"amount": "$amount", "month": {"$substr": ["$date", 0, 7]}}},
-                {"$group": {"_id": "$month", "total": {"$sum": "$amount"}}},
-                {"$sort": {"_id": 1}}
-            ]
-            result = expenses_col.aggregate(pipeline)
-            return {doc["_id"]: doc["total"] for doc in result}
+            monthly = summary.monthly_totals(db["expenses"], {"user": username})
+            return {m["month"]: m["total"] for m in monthly}
         except PyMongoError as e:
-            print(f"Error getting monthly expenses: {e}")
+            logger.error("Error getting monthly expenses: %s", e)
             return {}
-    
+
     @staticmethod
+    @timed("delete_expense")
     def delete_expense(db, expense_id: str, username: str) -> bool:
         """Delete an expense."""
         try:
-            from bson import ObjectId
             expenses_col = db["expenses"]
-            result = expenses_col.delete_one({
+            deleted = expenses_col.find_one_and_delete({
                 "_id": ObjectId(expense_id),
                 "user": username
             })
-            return result.deleted_count > 0
+            if not deleted:
+                return False
+            rollups.apply_expense(db, deleted, -1)
+            versions.bump(db, versions.user_key(username),
+                          versions.group_key(deleted["group_id"]) if deleted.get("group_id") else None)
+            return True
         except PyMongoError as e:
-            print(f"Error deleting expense: {e}")
+            logger.error("Error deleting expense: %s", e)
             return False
-    
+
     @staticmethod
     def create_backup():
         """Create a backup reference/snapshot."""
@@ -202,6 +374,55 @@ def get_db():
     return MongoDBConnection().get_db()
 
 
+def get_client():
+    """Get the process's MongoClient."""
+    return MongoDBConnection().get_client()
+
+
 def close_db():
     """Close database connection."""
     MongoDBConnection().close()
+
+
+# Motor client for the ASGI entry point (asgi_app.py); motor is only imported
+# there, so the WSGI app does not need it installed
+_async_client = None
+_async_pid = None
+
+
+def get_async_db():
+    """The process's Motor database, created on first use from the running event loop."""
+    global _async_client, _async_pid
+    if _async_client is None or _async_pid != os.getpid():
+        from motor.motor_asyncio import AsyncIOMotorClient
+        _async_client = AsyncIOMotorClient(
+            os.getenv("MONGODB_URI", "mongodb://localhost:27017/"),
+            serverSelectionTimeoutMS=5000,
+            connectTimeoutMS=10000,
+            retryWrites=True,
+            maxPoolSize=int(os.getenv("MONGODB_MAX_POOL_SIZE", 50)),
+            minPoolSize=int(os.getenv("MONGODB_MIN_POOL_SIZE", 0)),
+            event_listeners=[metrics.command_listener]
+        )
+        _async_pid = os.getpid()
+    return _async_client[os.getenv("MONGODB_DB_NAME", "SpendWiseDB")]
+
+
+def close_async_db():
+    """Close the Motor client (only the one this process created)."""
+    global _async_client, _async_pid
+    if _async_client is not None and _async_pid == os.getpid():
+        _async_client.close()
+    _async_client = None
+    _async_pid = None
+
+
+def db_stats() -> Dict[str, Any]:
+    """Pool settings and per-operation timings for this process."""
+    conn = MongoDBConnection()
+    return {
+        "pid": os.getpid(),
+        "connected": conn.connected,
+        "max_pool_size": conn.max_pool_size,
+        "operations": operation_timings.snapshot(),
+    }
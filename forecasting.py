@@ -0,0 +1,269 @@
+"""
+Forecasting Engine for SpendWise
+Next-month spending forecasts shared by /api/predict, /api/analytics and the
+dashboard, so every page shows the same number.
+
+Models (NumPy, vectorized across series):
+    linear_regression  - OLS trend over monthly totals (the headline prediction)
+    exp_smoothing      - simple exponential smoothing level
+    seasonal_naive     - the same month one year earlier
+
+Series come from the expense_rollups collection (see rollups.py), padded with
+zero months so gaps count as no spending. Each series is a row of a
+(series x months) matrix, so one pass forecasts every category of a user, or
+every user of a batch.
+
+Forecasts are cached per user in the `forecasts` collection, stamped with the
+user's data version (see versions.py); a request is a lookup unless the user
+has written since. Forecasts are only stored over an older stamp (the bulk
+refresh also over an equal one), so neither concurrent misses nor a slow batch
+can move one backwards. Refresh every user in bulk, e.g. from a nightly job:
+
+    python forecasting.py
+"""
+
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from pymongo.errors import DuplicateKeyError
+from dotenv import load_dotenv
+
+import rollups
+import versions
+
+load_dotenv()
+
+FORECASTS_COLLECTION = "forecasts"
+
+SMOOTHING_ALPHA = 0.5
+SEASON_LENGTH = 12
+# users scored per matrix in refresh_all()
+BATCH_USERS = 2000
+
+
+# ---------------- MONTH AXIS ---------------- #
+
+def month_index(month: str) -> int:
+    """'YYYY-MM' -> months since year 0."""
+    year, mon = month[:7].split("-")
+    return int(year) * 12 + int(mon) - 1
+
+
+def month_label(index: int) -> str:
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+# ---------------- MODELS ---------------- #
+# Y is a (series x months) float matrix, right-aligned so the last column is
+# every series' latest month; mask marks the months inside each series' span.
+
+def linear_regression(Y: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """OLS fit per row, evaluated one month past the last column."""
+    w = mask.astype(float)
+    x = np.arange(Y.shape[1], dtype=float)
+    n = w.sum(axis=1)
+    safe_n = np.maximum(n, 1)
+    x_mean = (w * x).sum(axis=1) / safe_n
+    y_mean = (w * Y).sum(axis=1) / safe_n
+    dx = (x - x_mean[:, None]) * w
+    sxx = (dx * dx).sum(axis=1)
+    sxy = (dx * (Y - y_mean[:, None])).sum(axis=1)
+    slope = np.divide(sxy, sxx, out=np.zeros_like(sxy), where=sxx > 0)
+    return y_mean + slope * (Y.shape[1] - x_mean)
+
+
+def exp_smoothing(Y: np.ndarray, mask: np.ndarray, alpha: float = SMOOTHING_ALPHA) -> np.ndarray:
+    """Simple exponential smoothing level per row (the one-step-ahead forecast)."""
+    level = np.full(Y.shape[0], np.nan)
+    for t in range(Y.shape[1]):
+        y = Y[:, t]
+        smoothed = np.where(np.isnan(level), y, alpha * y + (1 - alpha) * level)
+        level = np.where(mask[:, t], smoothed, level)
+    return level
+
+
+def seasonal_naive(Y: np.ndarray, mask: np.ndarray, season: int = SEASON_LENGTH) -> np.ndarray:
+    """The value one season before the forecast month, NaN when the span is shorter."""
+    col = Y.shape[1] - season
+    if col < 0:
+        return np.full(Y.shape[0], np.nan)
+    return np.where(mask[:, col], Y[:, col], np.nan)
+
+
+# ---------------- SCORING ---------------- #
+
+def _user_rows(month_docs: List[Dict[str, Any]]) -> Tuple[Optional[int], int, Dict[Optional[str], np.ndarray]]:
+    """Turn one user's rollup docs into dense monthly rows.
+
+    Returns (last month index, span length, {None: totals, category: values}).
+    Categories share the user's span so months without them count as zero.
+    """
+    if not month_docs:
+        return None, 0, {}
+    indexes = [month_index(d["month"]) for d in month_docs]
+    first, last = min(indexes), max(indexes)
+    span = last - first + 1
+    rows = {None: np.zeros(span)}
+    for doc, idx in zip(month_docs, indexes):
+        row = rows.setdefault(doc["category"], np.zeros(span))
+        row[idx - first] += doc["total"]
+        rows[None][idx - first] += doc["total"]
+    return last, span, rows
+
+
+def score_users(users: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+    """Forecast many users at once from {username: [expense_rollups docs]}."""
+    shaped = {u: _user_rows(docs) for u, docs in users.items()}
+    width = max([span for _, span, _ in shaped.values()] or [0])
+
+    keys = []
+    matrix_rows = []
+    mask_rows = []
+    for username, (_, span, rows) in shaped.items():
+        for category, row in rows.items():
+            keys.append((username, category))
+            padded = np.zeros(width)
+            padded[width - span:] = row
+            valid = np.zeros(width, dtype=bool)
+            valid[width - span:] = True
+            matrix_rows.append(padded)
+            mask_rows.append(valid)
+
+    if keys:
+        Y = np.vstack(matrix_rows)
+        mask = np.vstack(mask_rows)
+        ols = np.maximum(linear_regression(Y, mask), 0)
+        ses = np.maximum(exp_smoothing(Y, mask), 0)
+        seasonal = seasonal_naive(Y, mask)
+    position = {key: i for i, key in enumerate(keys)}
+
+    results = {}
+    for username, (last, span, rows) in shaped.items():
+        results[username] = _shape(
+            last, span, rows,
+            {c: (ols[position[(username, c)]], ses[position[(username, c)]],
+                 seasonal[position[(username, c)]]) for c in rows}
+        )
+    return results
+
+
+def _shape(last, span, rows, scores) -> Dict[str, Any]:
+    if not rows:
+        return {"prediction": 0.0, "method": "fallback", "n_points": 0, "month": None,
+                "models": {}, "by_category": []}
+    ols, ses, seasonal = scores[None]
+    by_category = sorted(
+        ({"category": c, "prediction": round(float(scores[c][0]), 2)} for c in rows if c is not None),
+        key=lambda r: r["prediction"], reverse=True
+    )
+    return {
+        # a single month has no trend; OLS then returns that month unchanged
+        "prediction": round(float(ols), 2),
+        "method": "linear_regression" if span >= 2 else "fallback",
+        "n_points": span,
+        "month": month_label(last + 1),
+        "models": {
+            "linear_regression": round(float(ols), 2),
+            "exp_smoothing": round(float(ses), 2),
+            "seasonal_naive": None if np.isnan(seasonal) else round(float(seasonal), 2),
+        },
+        "by_category": by_category,
+    }
+
+
+def forecast_user(month_docs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Forecast one user from their expense_rollups documents."""
+    return score_users({"": month_docs})[""]
+
+
+# ---------------- CACHE ---------------- #
+
+def _user_month_docs(db, username: str) -> List[Dict[str, Any]]:
+    return list(db[rollups.ROLLUPS_COLLECTION].find(
+        {"user": username}, {"_id": 0, "month": 1, "category": 1, "total": 1}
+    ))
+
+
+def forecast_upsert(username: str, version: int, result: Dict[str, Any]):
+    """(filter, update) for update_one(..., upsert=True) storing a forecast
+    unless one as new is already stored; that case raises DuplicateKeyError."""
+    return versions.stamped_upsert(username, version, {"result": result, "computed_at": datetime.utcnow()})
+
+
+def get_forecast(db, username: str,
+                 load_months: Optional[Callable[[], List[Dict[str, Any]]]] = None) -> Dict[str, Any]:
+    """Return the user's forecast, recomputing only if their data changed since it was stored.
+
+    `load_months` supplies the user's expense_rollups docs on a miss (defaults
+    to reading them).
+    """
+    key = versions.user_key(username)
+    version = versions.get_versions(db, key)[key]
+    doc = db[FORECASTS_COLLECTION].find_one({"_id": username, "version": version}, {"result": 1})
+    if doc:
+        return doc["result"]
+    month_docs = load_months() if load_months else _user_month_docs(db, username)
+    result = forecast_user(month_docs)
+    try:
+        db[FORECASTS_COLLECTION].update_one(*forecast_upsert(username, version, result), upsert=True)
+    except DuplicateKeyError:
+        pass  # a concurrent request stored this version (or a newer one) first
+    return result
+
+
+def _iter_user_batches(db, batch_users: int) -> Iterable[Dict[str, List[Dict[str, Any]]]]:
+    """Stream expense_rollups in user order, yielding {user: docs} batches."""
+    cursor = db[rollups.ROLLUPS_COLLECTION].find(
+        {}, {"_id": 0, "user": 1, "month": 1, "category": 1, "total": 1}
+    ).sort("user", 1).batch_size(10000)
+    batch = {}
+    for doc in cursor:
+        username = doc["user"]
+        if username not in batch and len(batch) >= batch_users:
+            yield batch
+            batch = {}
+        batch.setdefault(username, []).append(doc)
+    if batch:
+        yield batch
+
+
+def refresh_all(db, batch_users: int = BATCH_USERS) -> Dict[str, int]:
+    """Recompute and store every user's forecast in vectorized batches."""
+    counts = {"users": 0, "batches": 0}
+    for batch in _iter_user_batches(db, batch_users):
+        # versions are read before scoring: a write racing the refresh leaves
+        # an older stamp behind, which the next request simply recomputes, and
+        # a forecast a request already stored for the newer version is kept
+        keys = [versions.user_key(u) for u in batch]
+        current = versions.get_versions(db, *keys)
+        results = score_users(batch)
+        now = datetime.utcnow()
+        versions.store_stamped(db[FORECASTS_COLLECTION], [
+            (u, current[versions.user_key(u)], {"result": r, "computed_at": now})
+            for u, r in results.items()
+        ])
+        counts["users"] += len(results)
+        counts["batches"] += 1
+    return counts
+
+
+if __name__ == "__main__":
+    import db_utils
+
+    try:
+        db = db_utils.get_db()
+        db.client.admin.command('ping')
+        print(f"✓ Connected to {db.name}")
+        started = time.perf_counter()
+        counts = refresh_all(db)
+        elapsed = time.perf_counter() - started
+        rate = counts["users"] / elapsed if elapsed else 0.0
+        print(f"✓ Refreshed forecasts for {counts['users']} users in {counts['batches']} batches "
+              f"({elapsed:.1f}s, {rate:.0f} users/s)")
+        db_utils.close_db()
+    except Exception as e:
+        print(f"✗ Error refreshing forecasts: {e}")
+        sys.exit(1)
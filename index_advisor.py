@@ -0,0 +1,550 @@
+"""
+Index Advisor for SpendWise
+Explains every query shape the app issues (QUERY_SHAPES), flags collection
+scans and in-memory sorts, reports how many keys and documents each query
+examined per document returned, and derives the indexes that would serve
+them:
+
+    python index_advisor.py                    # report, write index_plan.json
+    python index_advisor.py --apply            # ... create the plan, explain again (before/after)
+    python index_advisor.py --profile 50       # record operations slower than 50 ms
+    python index_advisor.py --slow             # slowest recorded query shapes
+
+Recommended keys follow the equality, sort, range rule; an $or whose branches
+filter on different fields gets one index per branch. Nothing already served
+by the prefix of an existing index is recommended. init_db.py applies
+index_plan.json idempotently, so the plan is the one place new indexes are
+declared. Explain against a copy of production data (or a seeded database,
+see benchmarks/seed.py); the plan is derived from the query shapes and the
+existing indexes, so --no-explain still produces it on an empty database.
+Each shape names the code issuing it; unresolved_issuers() (run by the tests
+and before every report) flags names that no longer exist.
+"""
+
+import argparse
+import importlib
+import json
+import os
+import re
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+import dates
+import rollups
+import summary
+import versions
+
+PLAN_FILE = os.getenv("INDEX_PLAN", os.path.join(os.path.dirname(os.path.abspath(__file__)), "index_plan.json"))
+
+# fields only legacy documents carry; their indexes skip documents without them
+SPARSE_FIELDS = {"user_id"}
+
+# plan stages that mean MongoDB did the work an index could have done
+COLLSCAN_STAGES = {"COLLSCAN"}
+SORT_STAGES = {"SORT", "SORT_KEY_GENERATOR"}
+# indexes with these options do more than speed up reads; never call them redundant
+SPECIAL_OPTIONS = ("unique", "sparse", "partialFilterExpression", "expireAfterSeconds")
+
+Keys = Tuple[Tuple[str, int], ...]
+
+
+@dataclass(frozen=True)
+class Samples:
+    """Concrete values substituted into the query shapes."""
+    user: str
+    group_id: str
+    category: str
+    month: str
+    date_from: str
+    date_to: str
+    cursor_date: Any
+    cursor_id: ObjectId
+
+
+@dataclass(frozen=True)
+class QueryShape:
+    name: str
+    collection: str
+    issued_by: str
+    filter: Callable[[Samples], Dict[str, Any]]
+    sort: Keys = ()
+    limit: int = 0
+    # aggregations: the whole pipeline; `filter` is its leading $match
+    pipeline: Optional[Callable[[Samples], List[Dict[str, Any]]]] = None
+
+
+PAGE_SORT: Keys = (("date", -1), ("_id", -1))
+PAGE_LIMIT = 51
+
+
+def _and(*filters: Dict[str, Any]) -> Dict[str, Any]:
+    """The app's combine_filters()."""
+    filters = [f for f in filters if f]
+    return filters[0] if len(filters) == 1 else {"$and": filters}
+
+
+def _page(s: Samples, base: Dict[str, Any]) -> Dict[str, Any]:
+    """A second page of a date-range listing, as /get-expenses issues it."""
+    return _and(base, dates.range_filter(s.date_from, s.date_to),
+                dates.keyset_after("date", s.cursor_date, s.cursor_id))
+
+
+def _income_total_pipeline(s: Samples) -> List[Dict[str, Any]]:
+    return [{"$match": {"user": s.user}},
+            {"$group": {"_id": None, "total": {"$sum": "$amount"}, "count": {"$sum": 1}}}]
+
+
+# Every query the request paths and batch jobs issue, by the code issuing it
+QUERY_SHAPES = [
+    QueryShape("expenses_first_page", "expenses", "app.expenses_page",
+               lambda s: {"user": s.user}, PAGE_SORT, PAGE_LIMIT),
+    QueryShape("expenses_next_page", "expenses", "app.expenses_page",
+               lambda s: _page(s, {"user": s.user}), PAGE_SORT, PAGE_LIMIT),
+    QueryShape("expenses_category_page", "expenses", "app.expenses_page (?category=)",
+               lambda s: {"user": s.user, "category": s.category}, PAGE_SORT, PAGE_LIMIT),
+    QueryShape("expenses_export", "expenses", "app.api_reports",
+               lambda s: _and({"user": s.user}, dates.range_filter(s.date_from, s.date_to)), PAGE_SORT),
+    QueryShape("expenses_by_owner", "expenses", "app.user_columns, rollups.rebuild_rollups",
+               lambda s: rollups.owner_filter(s.user)),
+    QueryShape("expense_by_id", "expenses", "app.update_expense",
+               lambda s: {"_id": s.cursor_id, "user": s.user}, limit=1),
+    QueryShape("expenses_summary", "expenses", "summary.run_summary",
+               lambda s: {"user": s.user},
+               pipeline=lambda s: summary.build_pipeline({"user": s.user})),
+    QueryShape("group_ledger_page", "expenses", "app.api_group_expenses",
+               lambda s: _page(s, {"group_id": s.group_id}), PAGE_SORT, PAGE_LIMIT),
+    QueryShape("group_expenses", "expenses", "rollups.rebuild_group_rollups",
+               lambda s: {"group_id": s.group_id}),
+    QueryShape("expenses_by_user", "expenses", "batch_reports.iter_user_chunks",
+               lambda s: {"user": {"$type": "string"}}, (("user", 1),)),
+    QueryShape("legacy_expenses_by_user_id", "expenses", "batch_reports.iter_user_chunks (dual owners)",
+               lambda s: {"user_id": {"$type": "string"}}, (("user_id", 1),)),
+    QueryShape("income_page", "income", "app.get_income",
+               lambda s: _page(s, {"user": s.user}), PAGE_SORT, PAGE_LIMIT),
+    QueryShape("income_total", "income", "app.income_total",
+               lambda s: {"user": s.user}, pipeline=_income_total_pipeline),
+    QueryShape("budget", "budgets", "app.budget_for",
+               lambda s: {"user": s.user, "month": s.month}, limit=1),
+    QueryShape("user_groups", "groups", "app.api_list_groups",
+               lambda s: {"members": s.user}),
+    QueryShape("group_membership", "groups", "app.authorize_group",
+               lambda s: {"_id": ObjectId(s.group_id), "members": s.user}, limit=1),
+    QueryShape("login", "users", "db_utils.DatabaseHelper.find_login_user",
+               lambda s: {"$or": [{"username": s.user}, {"email": s.user}]}, limit=1),
+    QueryShape("month_rollups", rollups.ROLLUPS_COLLECTION, "rollups.get_user_rollups",
+               lambda s: {"user": s.user}),
+    QueryShape("merchant_rollups", rollups.MERCHANTS_COLLECTION, "rollups.get_user_rollups",
+               lambda s: {"user": s.user}),
+    QueryShape("group_rollups", rollups.GROUPS_COLLECTION, "rollups.get_group_rollups",
+               lambda s: {"group_id": s.group_id}),
+    QueryShape("forecast_batches", rollups.ROLLUPS_COLLECTION, "forecasting.refresh_all",
+               lambda s: {}, (("user", 1),)),
+    QueryShape("data_versions", versions.VERSIONS_COLLECTION, "versions.get_versions",
+               lambda s: {"_id": {"$in": [versions.user_key(s.user), versions.group_key(s.group_id)]}}),
+]
+
+
+def unresolved_issuers(shapes: List[QueryShape] = QUERY_SHAPES) -> List[Tuple[str, str]]:
+    """(shape name, reference) for every `issued_by` entry that names no real
+    attribute, so the catalog cannot drift from the code it documents.
+
+    `issued_by` lists module.attribute references separated by commas; a
+    trailing parenthesized note such as "(?category=)" is ignored.
+    """
+    missing = []
+    for shape in shapes:
+        for ref in shape.issued_by.split(","):
+            ref = ref.split("(")[0].strip()
+            module_name, _, path = ref.partition(".")
+            try:
+                target = importlib.import_module(module_name)
+                for attr in path.split("."):
+                    target = getattr(target, attr)
+            except (ImportError, AttributeError):
+                missing.append((shape.name, ref))
+    return missing
+
+
+def find_samples(db, username: Optional[str] = None, group_id: Optional[str] = None) -> Samples:
+    """Pick realistic values: the newest expense's owner (or `username`) and one of their groups."""
+    query = {"user": username} if username else {"user": {"$type": "string"}}
+    expense = db["expenses"].find_one(query, sort=[("_id", -1)]) or {}
+    user = username or expense.get("user") or "sample-user"
+    if not group_id:
+        group = (db["groups"].find_one({"members": user}, {"_id": 1})
+                 or db["groups"].find_one({}, {"_id": 1}) or {"_id": ObjectId()})
+        group_id = str(group["_id"])
+    today = dates.today()
+    return Samples(
+        user=user,
+        group_id=group_id,
+        category=expense.get("category") or "Food",
+        month=today.strftime(dates.MONTH_FORMAT),
+        date_from=(today - timedelta(days=365)).strftime(dates.DATE_FORMAT),
+        date_to=today.strftime(dates.DATE_FORMAT),
+        cursor_date=expense.get("date") or today,
+        cursor_id=expense.get("_id") or ObjectId(),
+    )
+
+
+# ---------------- EXPLAIN ---------------- #
+
+def _stages(node: Any) -> Iterable[Dict[str, Any]]:
+    """Every stage of a (classic or slot-based) winning plan."""
+    if not isinstance(node, dict):
+        return
+    if "stage" in node:
+        yield node
+    for key in ("inputStage", "outerStage", "innerStage", "thenStage", "elseStage", "queryPlan"):
+        yield from _stages(node.get(key))
+    for child in node.get("inputStages", []):
+        yield from _stages(child)
+
+
+def summarize_explain(explain: Dict[str, Any]) -> Dict[str, Any]:
+    """Plan, flags and examined-to-returned figures from explain output."""
+    # aggregations MongoDB could not push down wholesale keep the query under $cursor
+    stages = explain.get("stages")
+    if stages and "$cursor" in stages[0]:
+        explain = stages[0]["$cursor"]
+    plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+    stats = explain.get("executionStats", {})
+    names = [st["stage"] for st in _stages(plan)]
+    indexes = [st["indexName"] for st in _stages(plan) if st.get("indexName")]
+    returned = stats.get("nReturned", 0)
+    keys, docs = stats.get("totalKeysExamined", 0), stats.get("totalDocsExamined", 0)
+    return {
+        "plan": " > ".join(names),
+        "indexes": sorted(set(indexes)),
+        "collscan": any(n in COLLSCAN_STAGES for n in names),
+        "in_memory_sort": any(n in SORT_STAGES for n in names),
+        "returned": returned,
+        "keys_examined": keys,
+        "docs_examined": docs,
+        "ratio": round(max(keys, docs) / max(returned, 1), 2),
+        "millis": stats.get("executionTimeMillis"),
+    }
+
+
+def explain_shape(db, shape: QueryShape, samples: Samples) -> Dict[str, Any]:
+    if shape.pipeline:
+        explain = db.command("explain", {"aggregate": shape.collection,
+                                         "pipeline": shape.pipeline(samples), "cursor": {}},
+                             verbosity="executionStats")
+    else:
+        cursor = db[shape.collection].find(shape.filter(samples))
+        if shape.sort:
+            cursor = cursor.sort(list(shape.sort))
+        if shape.limit:
+            cursor = cursor.limit(shape.limit)
+        explain = cursor.explain()
+    return summarize_explain(explain)
+
+
+def explain_all(db, samples: Samples, shapes: List[QueryShape] = QUERY_SHAPES) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    for shape in shapes:
+        try:
+            results[shape.name] = explain_shape(db, shape, samples)
+        except (OperationFailure, NotImplementedError) as e:
+            results[shape.name] = {"error": str(e)}
+    return results
+
+
+# ---------------- RECOMMENDATION ---------------- #
+
+def _fields(query: Dict[str, Any], equality: List[str], ranges: List[str],
+            ors: List[List[Dict[str, Any]]]) -> None:
+    """Split a filter into equality fields, range fields and $or clause lists."""
+    for key, value in query.items():
+        if key == "$and":
+            for clause in value:
+                _fields(clause, equality, ranges, ors)
+        elif key == "$or":
+            ors.append(value)
+        elif key.startswith("$"):
+            continue
+        elif isinstance(value, dict) and any(op.startswith("$") for op in value):
+            (equality if set(value) <= {"$eq", "$in"} else ranges).append(key)
+        else:
+            equality.append(key)
+
+
+def _clause_fields(clause: Dict[str, Any]) -> set:
+    equality, ranges, ors = [], [], []
+    _fields(clause, equality, ranges, ors)
+    return set(equality) | set(ranges) | {f for o in ors for c in o for f in _clause_fields(c)}
+
+
+def candidate_indexes(query: Dict[str, Any], sort: Keys = ()) -> List[Tuple[Keys, int]]:
+    """Index keys serving `query` sorted by `sort`, as (keys, equality prefix length).
+
+    Equality fields first, then the sort, then range fields. An $or over
+    fields the index already holds (date ranges, keyset cursors) is a range;
+    any other $or needs an index per branch.
+    """
+    equality, ranges, ors = [], [], []
+    _fields(query, equality, ranges, ors)
+    covered = set(equality) | set(ranges) | {f for f, _ in sort}
+    branches: List[List[Dict[str, Any]]] = [[]]
+    for clauses in ors:
+        fields = [_clause_fields(c) for c in clauses]
+        union = set().union(*fields)
+        if union <= covered or len(union) == 1:
+            ranges += sorted(union - covered)
+            covered |= union
+        else:
+            branches = [b + [c] for b in branches for c in clauses]
+
+    candidates = []
+    for extra in branches:
+        eq, rng = list(equality), list(ranges)
+        for clause in extra:
+            _fields(clause, eq, rng, [])
+        keys: List[Tuple[str, int]] = []
+        for name, direction in [(f, 1) for f in eq] + list(sort) + [(f, 1) for f in rng]:
+            if name not in {k for k, _ in keys}:
+                keys.append((name, direction))
+        n_eq = len({f for f in eq})
+        if keys and keys[0][0] != "_id":  # the _id index serves those
+            candidates.append((tuple(keys), n_eq))
+    return candidates
+
+
+def index_name(keys: Keys) -> str:
+    return "_".join(f"{f}_{d}" for f, d in keys)
+
+
+def existing_indexes(db, collection: str) -> Dict[str, Dict[str, Any]]:
+    """name -> index info, with `key` as a tuple of (field, direction)."""
+    info = db[collection].index_information()
+    return {name: dict(spec, key=tuple((f, int(d)) for f, d in spec["key"])) for name, spec in info.items()}
+
+
+def is_served(keys: Keys, n_eq: int, indexes: Iterable[Keys]) -> bool:
+    """True if an index starts with `keys` (equality fields in any order, sort either way)."""
+    flipped = tuple((f, -d) for f, d in keys[n_eq:])
+    for index in indexes:
+        if len(index) < len(keys):
+            continue
+        if {f for f, _ in index[:n_eq]} != {f for f, _ in keys[:n_eq]}:
+            continue
+        rest = index[n_eq:len(keys)]
+        if rest == keys[n_eq:] or rest == flipped:
+            return True
+    return False
+
+
+def recommend(db, samples: Samples, shapes: List[QueryShape] = QUERY_SHAPES) -> Dict[str, Any]:
+    """The index plan: indexes to create and existing indexes another index makes redundant."""
+    wanted: Dict[Tuple[str, Keys], Dict[str, Any]] = {}
+    usable: Dict[str, List[Keys]] = {}
+    for shape in shapes:
+        if shape.collection not in usable:
+            # partial indexes only serve queries that repeat their filter
+            usable[shape.collection] = [spec["key"] for spec in existing_indexes(db, shape.collection).values()
+                                        if "partialFilterExpression" not in spec]
+        for keys, n_eq in candidate_indexes(shape.filter(samples), shape.sort):
+            if is_served(keys, n_eq, usable[shape.collection]):
+                continue
+            planned = [entry for (c, k), entry in wanted.items()
+                       if c == shape.collection and is_served(keys, n_eq, [k])]
+            if planned:
+                planned[0]["reason"].append(shape.name)
+                continue
+            options = {"sparse": True} if keys[0][0] in SPARSE_FIELDS else {}
+            wanted[(shape.collection, keys)] = {
+                "collection": shape.collection,
+                "keys": [list(k) for k in keys],
+                "name": index_name(keys),
+                "options": options,
+                "reason": [shape.name],
+            }
+
+    redundant = []
+    for collection in sorted(usable):
+        indexes = existing_indexes(db, collection)
+        for name, spec in sorted(indexes.items()):
+            if name == "_id_" or any(option in spec for option in SPECIAL_OPTIONS):
+                continue
+            wider = [n for n, other in indexes.items()
+                     if n != name and other["key"][:len(spec["key"])] == spec["key"]
+                     and len(other["key"]) > len(spec["key"]) and "partialFilterExpression" not in other]
+            if wider:
+                redundant.append({"collection": collection, "name": name, "covered_by": sorted(wider)[0]})
+
+    return {
+        "generated_at": datetime.utcnow().isoformat() + "Z",
+        "indexes": list(wanted.values()),
+        "redundant": redundant,
+    }
+
+
+# ---------------- PLAN ---------------- #
+
+def load_plan(path: str = PLAN_FILE) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_plan(plan: Dict[str, Any], path: str = PLAN_FILE) -> None:
+    text = json.dumps(plan, indent=2)
+    # one ["field", direction] pair per line
+    text = re.sub(r'\[\s+("[^"]+"),\s+(-?1)\s+\]', r"[\1, \2]", text)
+    with open(path, "w") as f:
+        f.write(text + "\n")
+
+
+def apply_plan(db, plan: Dict[str, Any]) -> List[Tuple[str, str, str]]:
+    """Create the plan's indexes; safe to run repeatedly.
+
+    Returns (collection, name, outcome) with outcome 'created', 'exists'
+    (same keys already indexed, under any name) or the server's error.
+    Redundant indexes are reported by the advisor, never dropped here.
+    """
+    results = []
+    for entry in plan.get("indexes", []):
+        collection = entry["collection"]
+        keys = [(f, int(d)) for f, d in entry["keys"]]
+        name = entry.get("name") or index_name(tuple(keys))
+        current = existing_indexes(db, collection)
+        if any(spec["key"] == tuple(keys) for spec in current.values()):
+            results.append((collection, name, "exists"))
+            continue
+        try:
+            db[collection].create_index(keys, name=name, **entry.get("options", {}))
+            results.append((collection, name, "created"))
+        except OperationFailure as e:
+            results.append((collection, name, f"failed: {e}"))
+    return results
+
+
+# ---------------- PROFILER ---------------- #
+
+def set_profiling(db, slowms: Optional[int]) -> Dict[str, Any]:
+    """Record operations slower than `slowms` in system.profile (None turns it off)."""
+    if slowms is None:
+        return db.command("profile", 0)
+    return db.command("profile", 1, slowms=slowms)
+
+
+def slow_queries(db, limit: int = 20) -> List[Dict[str, Any]]:
+    """The slowest recorded query shapes, grouped by namespace, plan and query hash."""
+    return list(db["system.profile"].aggregate([
+        {"$match": {"op": {"$in": ["query", "getmore", "command"]}, "planSummary": {"$exists": True}}},
+        {"$group": {
+            "_id": {"ns": "$ns", "plan": "$planSummary", "query_hash": "$queryHash"},
+            "count": {"$sum": 1},
+            "avg_ms": {"$avg": "$millis"},
+            "max_ms": {"$max": "$millis"},
+            "keys_examined": {"$sum": "$keysExamined"},
+            "docs_examined": {"$sum": "$docsExamined"},
+            "returned": {"$sum": "$nreturned"},
+            "in_memory_sort": {"$max": "$hasSortStage"},
+            "example": {"$last": "$command"},
+        }},
+        {"$sort": {"avg_ms": -1}},
+        {"$limit": limit},
+    ]))
+
+
+# ---------------- REPORT ---------------- #
+
+def _flags(result: Dict[str, Any]) -> str:
+    flags = [f for f, on in (("COLLSCAN", result.get("collscan")),
+                             ("SORT", result.get("in_memory_sort"))) if on]
+    return ",".join(flags) or "ok"
+
+
+def print_report(before: Dict[str, Dict[str, Any]], after: Optional[Dict[str, Dict[str, Any]]] = None) -> None:
+    print(f"{'shape':<24} {'flags':<14} {'examined/returned':>18}  plan")
+    for shape in QUERY_SHAPES:
+        b = before.get(shape.name, {})
+        if "error" in b:
+            print(f"{shape.name:<24} {'-':<14} {'-':>18}  explain failed: {b['error']}")
+            continue
+        ratio = f"{b['ratio']}"
+        plan = b["plan"]
+        if after and "ratio" in after.get(shape.name, {}):
+            a = after[shape.name]
+            ratio = f"{b['ratio']} -> {a['ratio']}"
+            plan = a["plan"] if a["plan"] == b["plan"] else f"{b['plan']}  =>  {a['plan']}"
+        print(f"{shape.name:<24} {_flags(b):<14} {ratio:>18}  {plan}")
+
+
+def print_plan(plan: Dict[str, Any]) -> None:
+    if not plan["indexes"]:
+        print("✓ Every query shape is served by an existing index")
+    for entry in plan["indexes"]:
+        options = f" {entry['options']}" if entry["options"] else ""
+        print(f"  + {entry['collection']}.{entry['name']}{options}  for {', '.join(entry['reason'])}")
+    for entry in plan["redundant"]:
+        print(f"  - {entry['collection']}.{entry['name']} is a prefix of {entry['covered_by']} "
+              f"(drop it by hand once no other tool relies on it)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Explain SpendWise queries and recommend indexes")
+    parser.add_argument("--user", help="explain with this user's data (default: newest expense's owner)")
+    parser.add_argument("--group", help="explain with this group id")
+    parser.add_argument("--plan", default=PLAN_FILE, help="index plan file to write")
+    parser.add_argument("--apply", action="store_true", help="create the plan's indexes, then explain again")
+    parser.add_argument("--no-explain", action="store_true", help="only derive the plan")
+    parser.add_argument("--json", help="write the explain report to this file")
+    parser.add_argument("--profile", metavar="SLOWMS", help="profile operations slower than SLOWMS ms ('off' to stop)")
+    parser.add_argument("--slow", action="store_true", help="list the slowest profiled query shapes")
+    args = parser.parse_args()
+
+    import db_utils
+
+    try:
+        db = db_utils.get_db()
+        db.client.admin.command('ping')
+        print(f"✓ Connected to {db.name}")
+
+        if args.profile:
+            set_profiling(db, None if args.profile == "off" else int(args.profile))
+            print(f"✓ Profiling {'off' if args.profile == 'off' else f'operations over {args.profile} ms'}")
+        elif args.slow:
+            for row in slow_queries(db):
+                key = row["_id"]
+                ratio = max(row["keys_examined"], row["docs_examined"]) / max(row["returned"], 1)
+                print(f"{key['ns']:<40} x{row['count']:<6} avg {row['avg_ms']:>8.1f} ms  "
+                      f"examined/returned {ratio:>8.1f}  {key['plan']}"
+                      f"{'  in-memory sort' if row['in_memory_sort'] else ''}")
+        else:
+            for name, ref in unresolved_issuers():
+                print(f"⚠ Query shape {name} names {ref}, which does not exist; update QUERY_SHAPES")
+            samples = find_samples(db, args.user, args.group)
+            before = {} if args.no_explain else explain_all(db, samples)
+            if before:
+                print_report(before)
+            plan = recommend(db, samples)
+            save_plan(plan, args.plan)
+            print(f"\n✓ Index plan written to {args.plan}")
+            print_plan(plan)
+
+            after = None
+            if args.apply:
+                for collection, name, outcome in apply_plan(db, plan):
+                    print(f"  {collection}.{name}: {outcome}")
+                if before:
+                    after = explain_all(db, samples)
+                    print()
+                    print_report(before, after)
+            if args.json:
+                with open(args.json, "w") as f:
+                    json.dump({"samples": {"user": samples.user, "group_id": samples.group_id},
+                               "before": before, "after": after, "plan": plan}, f, indent=2, default=str)
+                print(f"✓ Report written to {args.json}")
+        db_utils.close_db()
+    except Exception as e:
+        print(f"✗ Index advisor failed: {e}")
+        sys.exit(1)
@@ -4,10 +4,14 @@ This script sets up the MongoDB database, creates collections, and establishes i
 """
 
 import os
-from pymongo import MongoClient, ASCENDING, DESCENDING
+from pymongo import ASCENDING, DESCENDING
 from dotenv import load_dotenv
 from datetime import datetime
 
+import db_utils
+import index_advisor
+import rollups
+
 # Load environment variables
 load_dotenv()
 
@@ -22,25 +26,21 @@ def init_database():
     
     try:
         # Connect to MongoDB
-        client = MongoClient(
-            mongo_uri,
-            serverSelectionTimeoutMS=5000,
-            connectTimeoutMS=10000,
-            retryWrites=True,
-            maxPoolSize=50,
-            minPoolSize=10
-        )
+        # Same client settings as the app (see db_utils.py)
+        client = db_utils.get_client()
         
         # Test connection
         client.admin.command('ping')
         print("✓ MongoDB connection successful!")
         
         # Get database
-        db = client[db_name]
+        db = db_utils.get_db()
         print(f"✓ Using database: {db_name}")
         
         # Create collections
-        collections = ["expenses", "users", "income", "budgets", "groups"]
+        collections = ["expenses", "users", "income", "budgets", "groups",
+                       "expense_rollups", "merchant_rollups", "data_versions", "income_totals",
+                       "group_rollups", "forecasts", "precomputed_reports", "ai_jobs"]
         existing_collections = db.list_collection_names()
         
         for collection_name in collections:
@@ -54,11 +54,20 @@ def init_database():
         print("\nCreating indexes...")
         
         # Expenses collection indexes
-        db["expenses"].create_index([("user", ASCENDING)])
+        # (user and group_id lookups use the prefixes of the compound indexes below)
         db["expenses"].create_index([("date", DESCENDING)])
         db["expenses"].create_index([("category", ASCENDING)])
-        db["expenses"].create_index([("group_id", ASCENDING)])
-        db["expenses"].create_index([("user", ASCENDING), ("date", DESCENDING)])
+        # (user, date, _id) backs the keyset pagination of /get-expenses
+        db["expenses"].create_index([("user", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)])
+        # (user, ym, amount) groups monthly totals straight from the index (see dates.py)
+        db["expenses"].create_index([("user", ASCENDING), ("ym", ASCENDING), ("amount", ASCENDING)])
+        # (group_id, date, _id) backs the group ledger /api/group/<id>/expenses
+        db["expenses"].create_index([("group_id", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)])
+        # row keys supplied to /api/expenses/import make retried imports idempotent
+        db["expenses"].create_index(
+            [("user", ASCENDING), ("import_key", ASCENDING)],
+            unique=True, partialFilterExpression={"import_key": {"$exists": True}}
+        )
         print("✓ Indexes created for 'expenses' collection")
         
         # Users collection indexes
@@ -69,6 +78,8 @@ def init_database():
         # Income collection indexes
         db["income"].create_index([("date", DESCENDING)])
         db["income"].create_index([("source", ASCENDING)])
+        # (user, date, _id) backs the keyset pagination of /api/get-income
+        db["income"].create_index([("user", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)])
         print("✓ Indexes created for 'income' collection")
         
         # Budgets collection indexes
@@ -80,6 +91,31 @@ def init_database():
         db["groups"].create_index([("members", ASCENDING)])
         print("✓ Indexes created for 'groups' collection")
         
+        # Rollup collections indexes (maintained by the write routes, see rollups.py)
+        db["expense_rollups"].create_index(
+            [("user", ASCENDING), ("month", ASCENDING), ("category", ASCENDING)], unique=True
+        )
+        db["merchant_rollups"].create_index([("user", ASCENDING), ("merchant", ASCENDING)], unique=True)
+        db["group_rollups"].create_index([("group_id", ASCENDING), ("category", ASCENDING)], unique=True)
+        print("✓ Indexes created for rollup collections")
+        
+        # Queued AI jobs (see ai_service.py) are removed once expires_at passes
+        db["ai_jobs"].create_index("expires_at", expireAfterSeconds=0)
+        print("✓ TTL index created for ai_jobs")
+        
+        # Indexes recommended by the query profiler (see index_advisor.py)
+        plan = index_advisor.load_plan()
+        if plan:
+            for collection, name, outcome in index_advisor.apply_plan(db, plan):
+                print(f"  {collection}.{name}: {outcome}")
+            print(f"✓ Index plan applied: {index_advisor.PLAN_FILE}")
+        
+        # Rollups of expenses written before the rollups existed (once per database)
+        counts = rollups.backfill(db)
+        if counts is not None:
+            print(f"✓ Rollups backfilled: {counts['months']} month/category buckets, "
+                  f"{counts['merchants']} merchants, {counts['groups']} group/category buckets")
+        
         # Display database statistics
         print("\n" + "="*50)
         print("Database Initialization Complete!")
@@ -92,10 +128,16 @@ def init_database():
             count = db[collection_name].count_documents({})
             print(f"  {collection_name}: {count} documents")
         
+        print("\n  To rebuild spending rollups and reconcile drift, run: python rollups.py")
+        print("  To precompute spending forecasts (e.g. nightly), run: python forecasting.py")
+        print("  To precompute every user's reports (e.g. nightly), run: python batch_reports.py")
+        print("  To convert string expense dates to native dates, run: python migrate_dates.py")
+        print("  To move legacy user_id expense owners to user, run: python migrate_user_id.py")
+        print("  To check every query shape against the indexes, run: python index_advisor.py")
         print("\n✓ You can now start the SpendWise app!")
         print("  Run: python app.py")
         
-        client.close()
+        db_utils.close_db()
         return True
         
     except Exception as e:
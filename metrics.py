@@ -0,0 +1,227 @@
+"""
+Metrics for SpendWise
+In-process counters and latency histograms for the hot paths, rendered in the
+Prometheus text format on GET /metrics:
+
+    spendwise_http_request_duration_seconds    per endpoint and method
+    spendwise_http_requests_total              per endpoint, method and status
+    spendwise_http_request_mongo_seconds       MongoDB time spent inside each request
+    spendwise_mongo_command_duration_seconds   per command and collection
+    spendwise_mongo_documents_returned_total   documents returned (reads) or written
+    spendwise_mongo_command_failures_total     per command
+    spendwise_gemini_request_duration_seconds  per outcome (ok, error)
+
+MongoDB commands are observed with a pymongo CommandListener registered on
+the process's client (see db_utils.py). Every worker process keeps its own
+numbers; let Prometheus scrape each worker, or sum over the instance label.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import monitoring
+
+# seconds; tuned for web requests and single queries
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+GEMINI_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+
+
+def _label_text(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """Thread-safe counter with labels."""
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_label_text(self.labels, k)} {_number(v)}" for k, v in values]
+        return lines
+
+
+class Histogram:
+    """Thread-safe cumulative-bucket histogram with labels."""
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (+Inf last), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = sorted((k, (list(v[0]), v[1])) for k, v in self._series.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {_number(round(total, 6))}")
+            lines.append(f"{self.name}_count{_label_text(self.labels, key)} {cumulative}")
+        return lines
+
+
+# ---------------- REGISTRY ---------------- #
+
+http_request_duration = Histogram(
+    "spendwise_http_request_duration_seconds", "Time to build the response, by endpoint.",
+    ("endpoint", "method"))
+http_requests = Counter(
+    "spendwise_http_requests_total", "Requests served, by endpoint and status.",
+    ("endpoint", "method", "status"))
+http_request_mongo = Histogram(
+    "spendwise_http_request_mongo_seconds", "MongoDB command time spent inside one request.",
+    ("endpoint",))
+mongo_command_duration = Histogram(
+    "spendwise_mongo_command_duration_seconds", "MongoDB command round trips.",
+    ("command", "collection"))
+mongo_documents = Counter(
+    "spendwise_mongo_documents_returned_total",
+    "Documents returned by reads, or affected by writes.", ("command", "collection"))
+mongo_failures = Counter(
+    "spendwise_mongo_command_failures_total", "MongoDB commands that failed.", ("command",))
+gemini_duration = Histogram(
+    "spendwise_gemini_request_duration_seconds", "Gemini generate_content calls.",
+    ("outcome",), buckets=GEMINI_BUCKETS)
+
+REGISTRY = [http_request_duration, http_requests, http_request_mongo, mongo_command_duration,
+            mongo_documents, mongo_failures, gemini_duration]
+
+
+def render() -> str:
+    """The whole registry in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+# ---------------- REQUEST SCOPE ---------------- #
+# pymongo reports commands on the thread that issued them, so a thread-local
+# attributes MongoDB time to the request being served on that thread.
+
+_request = threading.local()
+
+
+def start_request() -> None:
+    _request.started = time.perf_counter()
+    _request.mongo_seconds = 0.0
+
+
+def finish_request(endpoint: Optional[str], method: str, status: int) -> None:
+    started = getattr(_request, "started", None)
+    if started is None:
+        return
+    endpoint = endpoint or "unmatched"
+    http_request_duration.observe(time.perf_counter() - started, endpoint, method)
+    http_requests.inc(endpoint, method, str(status))
+    http_request_mongo.observe(_request.mongo_seconds, endpoint)
+    _request.started = None
+
+
+# ---------------- MONGODB COMMAND MONITORING ---------------- #
+
+# commands whose first argument is the collection name
+_COLLECTION_COMMANDS = {"find", "aggregate", "insert", "update", "delete", "findAndModify",
+                        "count", "distinct", "getMore", "createIndexes"}
+# reply fields holding the documents a command returned
+_BATCHES = ("firstBatch", "nextBatch")
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Times every MongoDB command and counts the documents it returned or wrote."""
+
+    def __init__(self):
+        self._pending: Dict[Tuple[int, int], str] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        name = event.command_name
+        if name in _COLLECTION_COMMANDS:
+            value = event.command.get(name)
+            # getMore names the collection separately
+            collection = event.command.get("collection") if name == "getMore" else value
+            with self._lock:
+                self._pending[(event.request_id, event.operation_id)] = str(collection)
+
+    def _collection(self, event) -> str:
+        with self._lock:
+            return self._pending.pop((event.request_id, event.operation_id), "")
+
+    def succeeded(self, event):
+        seconds = event.duration_micros / 1e6
+        name = event.command_name
+        collection = self._collection(event)
+        mongo_command_duration.observe(seconds, name, collection)
+        if hasattr(_request, "mongo_seconds"):
+            _request.mongo_seconds += seconds
+        reply = event.reply or {}
+        cursor = reply.get("cursor") or {}
+        docs = next((len(cursor[k]) for k in _BATCHES if k in cursor), None)
+        if docs is None and "n" in reply:
+            docs = reply["n"]
+        if docs:
+            mongo_documents.inc(name, collection, amount=docs)
+
+    def failed(self, event):
+        seconds = event.duration_micros / 1e6
+        mongo_command_duration.observe(seconds, event.command_name, self._collection(event))
+        mongo_failures.inc(event.command_name)
+        if hasattr(_request, "mongo_seconds"):
+            _request.mongo_seconds += seconds
+
+
+command_listener = MongoCommandMetrics()
+
+
+def time_gemini(call):
+    """Run a Gemini call, recording its duration and outcome."""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        result = call()
+        outcome = "ok"
+        return result
+    finally:
+        gemini_duration.observe(time.perf_counter() - started, outcome)
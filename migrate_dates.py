@@ -0,0 +1,94 @@
+"""
+Date Migration for SpendWise
+Converts legacy expenses whose `date` is a 'YYYY-MM-DD' string into a BSON
+datetime and fills in the `ym` month bucket (see dates.py). Safe to run while
+the app is serving traffic and safe to re-run: each update is conditional on
+the value it read, so an expense edited mid-migration is left for the next
+pass instead of being overwritten.
+
+    python migrate_dates.py              # migrate everything
+    python migrate_dates.py --dry-run    # only count what would change
+
+Once it reports nothing left to migrate, set EXPENSE_DATES=native.
+"""
+
+import sys
+from datetime import datetime
+from typing import Any, Dict
+
+from pymongo import UpdateOne
+from dotenv import load_dotenv
+
+import dates
+
+load_dotenv()
+
+BATCH_SIZE = 1000
+
+# Expenses still in the old shape: string dates, or native dates without `ym`
+PENDING = {"$or": [
+    {"date": {"$type": "string"}},
+    {"date": {"$type": "date"}, "ym": {"$exists": False}},
+]}
+
+
+def _update_for(doc: Dict[str, Any]):
+    value = doc.get("date")
+    try:
+        fields = dates.date_fields(value)
+    except ValueError:
+        return None
+    # only apply if the document still holds the value we converted
+    return UpdateOne({"_id": doc["_id"], "date": value}, {"$set": fields})
+
+
+def migrate(db, batch_size: int = BATCH_SIZE, dry_run: bool = False) -> Dict[str, int]:
+    """Convert pending expenses in _id order, one bulk_write per batch."""
+    expenses = db["expenses"]
+    counts = {"scanned": 0, "migrated": 0, "invalid": 0}
+    last_id = None
+    while True:
+        query = PENDING if last_id is None else {"$and": [PENDING, {"_id": {"$gt": last_id}}]}
+        batch = list(expenses.find(query, {"date": 1}).sort("_id", 1).limit(batch_size))
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+        counts["scanned"] += len(batch)
+
+        ops = []
+        for doc in batch:
+            op = _update_for(doc)
+            if op is None:
+                counts["invalid"] += 1
+            else:
+                ops.append(op)
+        if ops and not dry_run:
+            counts["migrated"] += expenses.bulk_write(ops, ordered=False).modified_count
+        elif dry_run:
+            counts["migrated"] += len(ops)
+    return counts
+
+
+if __name__ == "__main__":
+    import db_utils
+
+    dry_run = "--dry-run" in sys.argv[1:]
+
+    try:
+        db = db_utils.get_db()
+        db.client.admin.command('ping')
+        print(f"✓ Connected to {db.name}")
+        started = datetime.utcnow()
+        counts = migrate(db, dry_run=dry_run)
+        elapsed = (datetime.utcnow() - started).total_seconds()
+        verb = "Would migrate" if dry_run else "Migrated"
+        print(f"✓ {verb} {counts['migrated']} of {counts['scanned']} expenses in {elapsed:.1f}s")
+        if counts["invalid"]:
+            print(f"✗ {counts['invalid']} expenses have unparseable dates and were left unchanged")
+        remaining = db["expenses"].count_documents(PENDING)
+        if remaining - counts["invalid"] <= 0 and not dry_run:
+            print("  Nothing left to migrate; EXPENSE_DATES=native can now be set.")
+        db_utils.close_db()
+    except Exception as e:
+        print(f"✗ Date migration failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,152 @@
+"""
+Owner Migration for SpendWise
+Moves the owner of legacy expenses from `user_id` to `user`, so every read
+can match owners with a single-key query on the (user, ...) indexes instead
+of the {'$or': [{'user': ...}, {'user_id': ...}]} fallback (see
+rollups.owner_filter).
+
+Built to run against the live collection:
+  - batched: one bulk_write of conditional updates per --batch-size expenses
+  - throttled: at most --max-rate expenses per second (0 for no limit)
+  - resumable: the last _id done is checkpointed in the `migrations`
+    collection after every batch, so a stopped run picks up where it left off
+  - safe to race the app: each update applies only while the document still
+    holds the user_id it read, so concurrent edits are left for the next pass
+
+    python migrate_user_id.py                      # migrate (resumes a stopped run)
+    python migrate_user_id.py --dry-run            # only count what would change
+    python migrate_user_id.py --restart            # ignore the checkpoint
+
+An expense carrying both fields with different values is a conflict; it is
+reported and left alone. Once it reports nothing left to migrate, set
+EXPENSE_OWNERS=user.
+"""
+
+import argparse
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from pymongo import UpdateOne
+from dotenv import load_dotenv
+
+import versions
+
+load_dotenv()
+
+BATCH_SIZE = 500
+MAX_RATE = 2000  # expenses per second
+MIGRATIONS_COLLECTION = "migrations"
+CHECKPOINT_ID = "expenses.user_id"
+
+# Expenses still owned through the legacy field
+PENDING = {"user_id": {"$exists": True}}
+
+
+def _update_for(doc: Dict[str, Any]) -> Optional[UpdateOne]:
+    legacy = doc["user_id"]
+    owner = doc.get("user")
+    if owner is not None and owner != legacy:
+        return None
+    update = {"$unset": {"user_id": ""}}
+    if owner is None:
+        update["$set"] = {"user": legacy}
+    # only apply if the document still holds the owner fields we read
+    return UpdateOne({"_id": doc["_id"], "user_id": legacy, "user": owner}, update)
+
+
+def load_checkpoint(db) -> Optional[Dict[str, Any]]:
+    return db[MIGRATIONS_COLLECTION].find_one({"_id": CHECKPOINT_ID})
+
+
+def save_checkpoint(db, last_id, counts: Dict[str, int], done: bool = False) -> None:
+    db[MIGRATIONS_COLLECTION].update_one(
+        {"_id": CHECKPOINT_ID},
+        {"$set": {"last_id": last_id, "counts": counts, "done": done,
+                  "updated_at": datetime.utcnow()}},
+        upsert=True
+    )
+
+
+def migrate(db, batch_size: int = BATCH_SIZE, max_rate: float = MAX_RATE,
+            dry_run: bool = False, restart: bool = False) -> Dict[str, int]:
+    """Move pending expenses to `user` in _id order, one bulk_write per batch."""
+    expenses = db["expenses"]
+    counts = {"scanned": 0, "migrated": 0, "conflicts": 0}
+    # resume an interrupted run; a finished one is rerun from the start
+    checkpoint = None if (restart or dry_run) else load_checkpoint(db)
+    last_id = None
+    if checkpoint and not checkpoint.get("done"):
+        last_id = checkpoint.get("last_id")
+        counts.update(checkpoint.get("counts", {}))
+
+    while True:
+        started = time.perf_counter()
+        query = PENDING if last_id is None else {"$and": [PENDING, {"_id": {"$gt": last_id}}]}
+        batch = list(expenses.find(query, {"user": 1, "user_id": 1}).sort("_id", 1).limit(batch_size))
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+        counts["scanned"] += len(batch)
+
+        ops, owners = [], set()
+        for doc in batch:
+            op = _update_for(doc)
+            if op is None:
+                counts["conflicts"] += 1
+            else:
+                ops.append(op)
+                owners.add(str(doc["user_id"]))
+        if dry_run:
+            counts["migrated"] += len(ops)
+            continue
+        if ops:
+            counts["migrated"] += expenses.bulk_write(ops, ordered=False).modified_count
+            # legacy expenses now show up in the user-keyed listings
+            versions.bump(db, *(versions.user_key(u) for u in owners))
+        save_checkpoint(db, last_id, counts)
+
+        if max_rate:
+            time.sleep(max(0.0, len(batch) / max_rate - (time.perf_counter() - started)))
+
+    if not dry_run:
+        save_checkpoint(db, last_id, counts, done=True)
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move legacy expense owners from user_id to user")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--max-rate", type=float, default=MAX_RATE,
+                        help="expenses per second (0 for no limit)")
+    parser.add_argument("--dry-run", action="store_true", help="only count what would change")
+    parser.add_argument("--restart", action="store_true", help="ignore the saved checkpoint")
+    args = parser.parse_args()
+
+    import db_utils
+
+    try:
+        db = db_utils.get_db()
+        db.client.admin.command('ping')
+        print(f"✓ Connected to {db.name}")
+        checkpoint = load_checkpoint(db)
+        if checkpoint and not checkpoint.get("done") and not (args.restart or args.dry_run):
+            print(f"  Resuming after _id {checkpoint['last_id']}")
+        started = datetime.utcnow()
+        counts = migrate(db, args.batch_size, args.max_rate, args.dry_run, args.restart)
+        elapsed = (datetime.utcnow() - started).total_seconds()
+        verb = "Would migrate" if args.dry_run else "Migrated"
+        print(f"✓ {verb} {counts['migrated']} of {counts['scanned']} expenses in {elapsed:.1f}s")
+        if counts["conflicts"]:
+            print(f"✗ {counts['conflicts']} expenses have different user and user_id values "
+                  "and were left unchanged")
+        remaining = db["expenses"].count_documents(PENDING)
+        if remaining == 0 and not args.dry_run:
+            print("  Nothing left to migrate; EXPENSE_OWNERS=user can now be set.")
+        elif not args.dry_run:
+            print(f"  {remaining} expenses still carry user_id")
+        db_utils.close_db()
+    except Exception as e:
+        print(f"✗ Owner migration failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,321 @@
+"""
+Spending Rollups for SpendWise
+Incrementally maintained per-user and per-group aggregates so analytics and
+group summaries read a handful of small documents instead of rescanning every
+expense.
+
+Collections:
+    expense_rollups   - one document per (user, month, category) with total/count
+    merchant_rollups  - one document per (user, merchant) with total/count
+    group_rollups     - one document per (group_id, category) with total/count
+
+Write routes call apply_expense() / apply_expenses() with atomic $inc deltas.
+init_db.py backfills expenses that predate the rollups once (backfill()). Run
+this module directly to rebuild the rollups from the expenses collection and
+reconcile any drift, also while the app is running:
+
+    python rollups.py            # all users and groups
+    python rollups.py john_doe   # a single user
+"""
+
+import os
+import sys
+from datetime import datetime
+from typing import Dict, Any, Iterable, Optional, List
+
+from pymongo import UpdateOne
+from dotenv import load_dotenv
+
+import dates
+
+load_dotenv()
+
+ROLLUPS_COLLECTION = "expense_rollups"
+MERCHANTS_COLLECTION = "merchant_rollups"
+GROUPS_COLLECTION = "group_rollups"
+
+# one-off backfill marker (see backfill())
+MIGRATIONS_COLLECTION = "migrations"
+BACKFILL_ID = "rollups.backfill"
+
+DEFAULT_CATEGORY = "Other"
+DEFAULT_MERCHANT = "Unknown"
+# group summaries have always labelled missing categories this way
+DEFAULT_GROUP_CATEGORY = "Uncategorized"
+
+# 'dual' while legacy expenses may still carry `user_id`; switch to 'user' once
+# `python migrate_user_id.py` reports nothing left to migrate
+LEGACY_OWNERS = os.getenv("EXPENSE_OWNERS", "dual").lower() != "user"
+
+
+def expense_owner(expense: Dict[str, Any]) -> Optional[str]:
+    """Return the owning username, supporting legacy 'user_id' documents."""
+    return expense.get("user") or expense.get("user_id")
+
+
+def expense_month(expense: Dict[str, Any]) -> str:
+    """Return the YYYY-MM bucket for an expense."""
+    return dates.month_of(expense) or datetime.utcnow().strftime("%Y-%m")
+
+
+def _category(expense: Dict[str, Any]) -> str:
+    category = expense.get("category")
+    return DEFAULT_CATEGORY if category is None else category
+
+
+def _merchant(expense: Dict[str, Any]) -> str:
+    note = expense.get("note")
+    return DEFAULT_MERCHANT if note is None else note
+
+
+def apply_expense(db, expense: Dict[str, Any], sign: int = 1) -> None:
+    """Add (sign=1) or remove (sign=-1) one expense from the user's rollups."""
+    apply_expenses(db, [expense], sign)
+
+
+def _bucket_deltas(expenses: Iterable[Dict[str, Any]], sign: int = 1):
+    """Sum expenses into {(user, month, category): (total, count)} and
+    {(user, merchant): (total, count)} dictionaries."""
+    months = {}
+    merchants = {}
+    for expense in expenses:
+        username = expense_owner(expense)
+        if not username:
+            continue
+        amount = float(expense.get("amount") or 0) * sign
+        for buckets, key in (
+            (months, (username, expense_month(expense), _category(expense))),
+            (merchants, (username, _merchant(expense))),
+        ):
+            total, count = buckets.get(key, (0.0, 0))
+            buckets[key] = (total + amount, count + sign)
+    return months, merchants
+
+
+def _group_deltas(expenses: Iterable[Dict[str, Any]], sign: int = 1):
+    """Sum group expenses into {(group_id, category): (total, count)}."""
+    groups = {}
+    for expense in expenses:
+        group_id = expense.get("group_id")
+        if not group_id:
+            continue
+        key = (group_id, expense.get("category") or DEFAULT_GROUP_CATEGORY)
+        total, count = groups.get(key, (0.0, 0))
+        groups[key] = (total + float(expense.get("amount") or 0) * sign, count + sign)
+    return groups
+
+
+def apply_expenses(db, expenses: Iterable[Dict[str, Any]], sign: int = 1) -> None:
+    """Apply many expenses at once, merging deltas that hit the same bucket.
+
+    Writes at most one unordered bulk_write per rollup collection.
+    """
+    expenses = list(expenses)
+    months, merchants = _bucket_deltas(expenses, sign)
+    groups = _group_deltas(expenses, sign)
+    if months:
+        db[ROLLUPS_COLLECTION].bulk_write([
+            UpdateOne({"user": u, "month": m, "category": c},
+                      {"$inc": {"total": t, "count": n}}, upsert=True)
+            for (u, m, c), (t, n) in months.items()
+        ], ordered=False)
+    if merchants:
+        db[MERCHANTS_COLLECTION].bulk_write([
+            UpdateOne({"user": u, "merchant": m},
+                      {"$inc": {"total": t, "count": n}}, upsert=True)
+            for (u, m), (t, n) in merchants.items()
+        ], ordered=False)
+    if groups:
+        db[GROUPS_COLLECTION].bulk_write([
+            UpdateOne({"group_id": g, "category": c},
+                      {"$inc": {"total": t, "count": n}}, upsert=True)
+            for (g, c), (t, n) in groups.items()
+        ], ordered=False)
+
+    if sign < 0:
+        # Drop buckets that no longer hold any expense
+        for username in {u for u, _, _ in months}:
+            db[ROLLUPS_COLLECTION].delete_many({"user": username, "count": {"$lte": 0}})
+            db[MERCHANTS_COLLECTION].delete_many({"user": username, "count": {"$lte": 0}})
+        for group_id in {g for g, _ in groups}:
+            db[GROUPS_COLLECTION].delete_many({"group_id": group_id, "count": {"$lte": 0}})
+
+
+def replace_expense(db, old: Dict[str, Any], new: Dict[str, Any]) -> None:
+    """Move an edited expense from its old buckets to its new ones."""
+    apply_expense(db, old, -1)
+    apply_expense(db, new, 1)
+
+
+def get_user_rollups(db, username: str) -> Dict[str, List[Dict]]:
+    """Return the month/category and merchant rollup documents for a user."""
+    projection = {"_id": 0, "user": 0}
+    return {
+        "months": list(db[ROLLUPS_COLLECTION].find({"user": username}, projection)),
+        "merchants": list(db[MERCHANTS_COLLECTION].find({"user": username}, projection)),
+    }
+
+
+def owner_filter(username: Optional[str]) -> Dict[str, Any]:
+    """Match a user's expenses; in dual mode also legacy `user_id` documents.
+
+    After the migration this is a single-key match on the (user, ...) indexes
+    instead of a two-branch $or.
+    """
+    if username is None:
+        return {}
+    if not LEGACY_OWNERS:
+        return {"user": username}
+    return {"$or": [{"user": username}, {"user_id": username}]}
+
+
+def _sync_buckets(collection, key_fields: List[str], docs: List[Dict[str, Any]],
+                  existing: List[Dict[str, Any]]) -> None:
+    """Make a rollup collection hold `docs`, safely next to live apply_expense() writers.
+
+    Every bucket is set with an upsert, so there is no moment at which it is
+    missing and no duplicate-key race with the $inc upserts. `existing` are the
+    buckets read before the expenses were scanned; those no longer produced
+    are deleted by _id, so a bucket a concurrent write created is kept. A write
+    landing mid-rebuild can still be off until the next rebuild.
+    """
+    if docs:
+        collection.bulk_write([
+            UpdateOne({f: d[f] for f in key_fields},
+                      {"$set": {"total": d["total"], "count": d["count"]}}, upsert=True)
+            for d in docs
+        ], ordered=False)
+    keep = {tuple(d[f] for f in key_fields) for d in docs}
+    gone = [b["_id"] for b in existing if tuple(b.get(f) for f in key_fields) not in keep]
+    if gone:
+        collection.delete_many({"_id": {"$in": gone}})
+
+
+def rebuild_rollups(db, username: Optional[str] = None) -> Dict[str, int]:
+    """Recompute rollups from the expenses collection for one user (or everyone).
+
+    Expenses are streamed with a narrow projection and bucketed with the same
+    helpers apply_expense() uses, so a rebuild and the incremental path agree.
+    Buckets are updated in place (see _sync_buckets), never deleted and
+    reinserted, so the app can keep writing while it runs.
+    """
+    scope = {} if username is None else {"user": username}
+    existing_months = list(db[ROLLUPS_COLLECTION].find(scope, {"user": 1, "month": 1, "category": 1}))
+    existing_merchants = list(db[MERCHANTS_COLLECTION].find(scope, {"user": 1, "merchant": 1}))
+
+    projection = {"_id": 0, "user": 1, "user_id": 1, "amount": 1,
+                  "category": 1, "note": 1, "date": 1, "ym": 1}
+    months, merchants = _bucket_deltas(
+        db["expenses"].find(owner_filter(username), projection, batch_size=1000)
+    )
+
+    month_docs = [
+        {"user": u, "month": m, "category": c, "total": t, "count": n}
+        for (u, m, c), (t, n) in months.items()
+    ]
+    merchant_docs = [
+        {"user": u, "merchant": m, "total": t, "count": n}
+        for (u, m), (t, n) in merchants.items()
+    ]
+    _sync_buckets(db[ROLLUPS_COLLECTION], ["user", "month", "category"], month_docs, existing_months)
+    _sync_buckets(db[MERCHANTS_COLLECTION], ["user", "merchant"], merchant_docs, existing_merchants)
+
+    return {"months": len(month_docs), "merchants": len(merchant_docs)}
+
+
+def backfill(db) -> Optional[Dict[str, int]]:
+    """Build the rollups of expenses written before they existed, once per database.
+
+    Run by init_db.py; a marker in the `migrations` collection records that it
+    is done, so later runs return None. From then on the write routes keep the
+    rollups current and reads never rebuild them.
+    """
+    if db[MIGRATIONS_COLLECTION].find_one({"_id": BACKFILL_ID, "done": True}):
+        return None
+    counts = rebuild_rollups(db)
+    counts["groups"] = rebuild_group_rollups(db)
+    db[MIGRATIONS_COLLECTION].update_one(
+        {"_id": BACKFILL_ID},
+        {"$set": {"done": True, "counts": counts, "updated_at": datetime.utcnow()}},
+        upsert=True
+    )
+    return counts
+
+
+def get_group_rollups(db, group_id: str) -> List[Dict]:
+    """Return the per-category rollup documents of a group."""
+    return list(db[GROUPS_COLLECTION].find({"group_id": group_id}, {"_id": 0, "group_id": 0}))
+
+
+def rebuild_group_rollups(db, group_id: Optional[str] = None) -> int:
+    """Recompute group rollups for one group (or every group); returns the bucket count.
+
+    Updated in place like rebuild_rollups(), so safe next to live writers.
+    """
+    scope = {"group_id": group_id} if group_id else {}
+    existing = list(db[GROUPS_COLLECTION].find(scope, {"group_id": 1, "category": 1}))
+    query = {"group_id": group_id} if group_id else {"group_id": {"$nin": [None, ""]}}
+    projection = {"_id": 0, "group_id": 1, "category": 1, "amount": 1}
+    groups = _group_deltas(db["expenses"].find(query, projection, batch_size=1000))
+    docs = [
+        {"group_id": g, "category": c, "total": t, "count": n}
+        for (g, c), (t, n) in groups.items()
+    ]
+    _sync_buckets(db[GROUPS_COLLECTION], ["group_id", "category"], docs, existing)
+    return len(docs)
+
+
+def build_group_summary(buckets: List[Dict]) -> Dict[str, Any]:
+    """Shape group rollup documents into total_spent / by_category / expense_count."""
+    return {
+        "total_spent": sum(b["total"] for b in buckets),
+        "expense_count": sum(b["count"] for b in buckets),
+        "by_category": [{"category": b["category"], "total": b["total"]} for b in buckets],
+    }
+
+
+def build_analytics(rollups: Dict[str, List[Dict]]) -> Dict[str, Any]:
+    """Shape rollup documents into the /api/analytics response."""
+    category_map = {}
+    monthly_map = {}
+    for r in rollups["months"]:
+        category_map[r["category"]] = category_map.get(r["category"], 0.0) + r["total"]
+        monthly_map[r["month"]] = monthly_map.get(r["month"], 0.0) + r["total"]
+
+    total_spent = sum(monthly_map.values())
+    merchants = rollups["merchants"]
+    top_merchant = max(merchants, key=lambda m: m["total"])["merchant"] if merchants else "N/A"
+    prediction = total_spent / max(len(monthly_map), 1)
+
+    return {
+        "total_spent": total_spent,
+        "prediction_next_month": round(prediction, 2),
+        "top_merchant": top_merchant,
+        "spending_by_category": [
+            {"category": k, "total_spent": v} for k, v in category_map.items()
+        ],
+        "monthly_trend": [
+            {"month": k, "total_spent": v} for k, v in sorted(monthly_map.items())
+        ]
+    }
+
+
+if __name__ == "__main__":
+    import db_utils
+
+    target = sys.argv[1] if len(sys.argv) > 1 else None
+
+    try:
+        db = db_utils.get_db()
+        db.client.admin.command('ping')
+        print(f"✓ Connected to {db.name}")
+        counts = rebuild_rollups(db, target)
+        print(f"✓ Rebuilt rollups for {target or 'all users'}: "
+              f"{counts['months']} month/category buckets, {counts['merchants']} merchants")
+        if target is None:
+            buckets = rebuild_group_rollups(db)
+            print(f"✓ Rebuilt group rollups: {buckets} group/category buckets")
+        db_utils.close_db()
+    except Exception as e:
+        print(f"✗ Error rebuilding rollups: {e}")
+        exit(1)
@@ -1,117 +1,147 @@
-// Fetch expenses and populate table (existing behavior)
+// /get-expenses is paginated: the first page is shown right away and older
+// history is fetched one page per "Load more" click (X-Next-Cursor)
+let expenseRows = [];
+let expenseCursor = null;
+
+function fetchExpensePage(url){
+	return fetch(url, buildAuthOptions())
+	.then(res => {
+		const next = res.headers.get('X-Next-Cursor');
+		return res.json().then(page => ({expenses: page || [], next_cursor: next}));
+	});
+}
+
+function showExpensePage(page, append){
+	expenseRows = append ? expenseRows.concat(page.expenses) : page.expenses.slice();
+	expenseCursor = page.next_cursor || null;
+	renderExpenses(expenseRows);
+	const more = document.getElementById('loadMoreExpenses');
+	if(more) more.style.display = expenseCursor ? 'inline-block' : 'none';
+}
+
+// Fetch the newest expenses and populate the table
 function loadExpenses(){
-	fetch('/get-expenses', buildAuthOptions())
-	.then(res => res.json())
-	.then(data => {
-		const body = document.getElementById('expenseBody');
-		if(!body) return;
-		body.innerHTML = '';
-		if(!data || data.length === 0){
-			body.innerHTML = '<tr><td colspan="5" class="empty">No expenses yet.</td></tr>';
-			return;
-		}
+	fetchExpensePage('/get-expenses')
+	.then(page => showExpensePage(page, false))
+	.catch(err => console.error(err));
+}
 
-		// Normalize and sort by date descending
-		data.sort((a,b)=> {
-			const da = a.date || '';
-			const db = b.date || '';
-			return db.localeCompare(da);
-		});
+function loadMoreExpenses(){
+	if(!expenseCursor) return;
+	fetchExpensePage('/get-expenses?cursor=' + encodeURIComponent(expenseCursor))
+	.then(page => showExpensePage(page, true))
+	.catch(err => console.error(err));
+}
 
-		// Group by YYYY-MM
-		const groups = {};
-		for(const exp of data){
-			let month = 'Unknown';
-			if(exp.date && typeof exp.date === 'string' && exp.date.length >= 7) month = exp.date.slice(0,7);
-			if(!groups[month]) groups[month] = [];
-			groups[month].push(exp);
-		}
+function renderExpenses(data){
+	const body = document.getElementById('expenseBody');
+	if(!body) return;
+	body.innerHTML = '';
+	if(!data || data.length === 0){
+		body.innerHTML = '<tr><td colspan="5" class="empty">No expenses yet.</td></tr>';
+		return;
+	}
 
-		function formatMonth(yyyymm){
-			if(!yyyymm || yyyymm === 'Unknown') return 'Unknown';
-			const [y, m] = yyyymm.split('-');
-			try{
-				const d = new Date(parseInt(y,10), parseInt(m,10)-1, 1);
-				return d.toLocaleString('en-US', { month: 'long', year: 'numeric' });
-			}catch(e){ return yyyymm; }
-		}
+	// Normalize and sort by date descending
+	data.sort((a,b)=> {
+		const da = a.date || '';
+		const db = b.date || '';
+		return db.localeCompare(da);
+	});
 
-		// Render months (descending)
-		const months = Object.keys(groups).sort((a,b)=> b.localeCompare(a));
-		months.forEach((m, idx) => {
-			// header row (clickable)
-			const hdr = document.createElement('tr');
-			hdr.className = 'month-row month-header-row';
-			hdr.style.cursor = 'pointer';
-			hdr.innerHTML = `<td colspan="5" class="month-header">${formatMonth(m)}</td>`;
-			body.appendChild(hdr);
-
-			// content wrapper row
-			const contentTr = document.createElement('tr');
-			contentTr.className = 'month-content-row';
-			const contentTd = document.createElement('td');
-			contentTd.colSpan = 5;
-
-			const wrapper = document.createElement('div');
-			wrapper.className = 'month-contents';
-			// start closed; slide by animating max-height
-			wrapper.style.overflow = 'hidden';
-			wrapper.style.maxHeight = '0px';
-			wrapper.style.transition = 'max-height 240ms ease';
-
-			// create inner table so visual columns/rows match original exactly
-			const innerTable = document.createElement('table');
-			innerTable.style.width = '100%';
-			innerTable.style.borderCollapse = 'collapse';
-			const innerTbody = document.createElement('tbody');
-
-			// sort entries in this month by date desc
-			groups[m].sort((a,b)=> (b.date || '').localeCompare(a.date || ''));
-
-			for(const exp of groups[m]){
-				const row = document.createElement('tr');
-				// keep fields exactly as original: amount, category, note, date (then actions td)
-				row.innerHTML = `<td>${exp.amount}</td><td>${exp.category}</td><td>${exp.note || ''}</td><td>${exp.date}</td>`;
-				const actions = document.createElement('td');
-				actions.style.whiteSpace = 'nowrap';
-				const editBtn = document.createElement('button');
-				editBtn.className = 'btn ghost action-btn';
-				editBtn.textContent = 'Edit';
-				editBtn.onclick = ()=> editExpense(exp.id);
-				const delBtn = document.createElement('button');
-				delBtn.className = 'btn secondary action-btn';
-				delBtn.textContent = 'Delete';
-				delBtn.onclick = ()=> deleteExpense(exp.id);
-				actions.appendChild(editBtn);
-				actions.appendChild(delBtn);
-				row.appendChild(actions);
-				innerTbody.appendChild(row);
-			}
+	// Group by YYYY-MM
+	const groups = {};
+	for(const exp of data){
+		let month = 'Unknown';
+		if(exp.date && typeof exp.date === 'string' && exp.date.length >= 7) month = exp.date.slice(0,7);
+		if(!groups[month]) groups[month] = [];
+		groups[month].push(exp);
+	}
 
-			innerTable.appendChild(innerTbody);
-			wrapper.appendChild(innerTable);
-			contentTd.appendChild(wrapper);
-			contentTr.appendChild(contentTd);
-			body.appendChild(contentTr);
-
-			// toggle behavior: click header to expand/collapse
-			hdr.addEventListener('click', ()=>{
-				const isClosed = wrapper.style.maxHeight === '0px' || wrapper.style.maxHeight === '';
-				if(isClosed){
-					wrapper.style.maxHeight = wrapper.scrollHeight + 'px';
-					hdr.classList.add('open');
-				} else {
-					wrapper.style.maxHeight = '0px';
-					hdr.classList.remove('open');
-				}
-			});
+	function formatMonth(yyyymm){
+		if(!yyyymm || yyyymm === 'Unknown') return 'Unknown';
+		const [y, m] = yyyymm.split('-');
+		try{
+			const d = new Date(parseInt(y,10), parseInt(m,10)-1, 1);
+			return d.toLocaleString('en-US', { month: 'long', year: 'numeric' });
+		}catch(e){ return yyyymm; }
+	}
 
-			// default: open most recent month (first in list)
-			if(idx === 0){
-				requestAnimationFrame(()=>{ wrapper.style.maxHeight = wrapper.scrollHeight + 'px'; hdr.classList.add('open'); });
+	// Render months (descending)
+	const months = Object.keys(groups).sort((a,b)=> b.localeCompare(a));
+	months.forEach((m, idx) => {
+		// header row (clickable)
+		const hdr = document.createElement('tr');
+		hdr.className = 'month-row month-header-row';
+		hdr.style.cursor = 'pointer';
+		hdr.innerHTML = `<td colspan="5" class="month-header">${formatMonth(m)}</td>`;
+		body.appendChild(hdr);
+
+		// content wrapper row
+		const contentTr = document.createElement('tr');
+		contentTr.className = 'month-content-row';
+		const contentTd = document.createElement('td');
+		contentTd.colSpan = 5;
+
+		const wrapper = document.createElement('div');
+		wrapper.className = 'month-contents';
+		// start closed; slide by animating max-height
+		wrapper.style.overflow = 'hidden';
+		wrapper.style.maxHeight = '0px';
+		wrapper.style.transition = 'max-height 240ms ease';
+
+		// create inner table so visual columns/rows match original exactly
+		const innerTable = document.createElement('table');
+		innerTable.style.width = '100%';
+		innerTable.style.borderCollapse = 'collapse';
+		const innerTbody = document.createElement('tbody');
+
+		// sort entries in this month by date desc
+		groups[m].sort((a,b)=> (b.date || '').localeCompare(a.date || ''));
+
+		for(const exp of groups[m]){
+			const row = document.createElement('tr');
+			// keep fields exactly as original: amount, category, note, date (then actions td)
+			row.innerHTML = `<td>${exp.amount}</td><td>${exp.category}</td><td>${exp.note || ''}</td><td>${exp.date}</td>`;
+			const actions = document.createElement('td');
+			actions.style.whiteSpace = 'nowrap';
+			const editBtn = document.createElement('button');
+			editBtn.className = 'btn ghost action-btn';
+			editBtn.textContent = 'Edit';
+			editBtn.onclick = ()=> editExpense(exp.id);
+			const delBtn = document.createElement('button');
+			delBtn.className = 'btn secondary action-btn';
+			delBtn.textContent = 'Delete';
+			delBtn.onclick = ()=> deleteExpense(exp.id);
+			actions.appendChild(editBtn);
+			actions.appendChild(delBtn);
+			row.appendChild(actions);
+			innerTbody.appendChild(row);
+		}
+
+		innerTable.appendChild(innerTbody);
+		wrapper.appendChild(innerTable);
+		contentTd.appendChild(wrapper);
+		contentTr.appendChild(contentTd);
+		body.appendChild(contentTr);
+
+		// toggle behavior: click header to expand/collapse
+		hdr.addEventListener('click', ()=>{
+			const isClosed = wrapper.style.maxHeight === '0px' || wrapper.style.maxHeight === '';
+			if(isClosed){
+				wrapper.style.maxHeight = wrapper.scrollHeight + 'px';
+				hdr.classList.add('open');
+			} else {
+				wrapper.style.maxHeight = '0px';
+				hdr.classList.remove('open');
 			}
 		});
-	}).catch(err => console.error(err));
+
+		// default: open most recent month (first in list)
+		if(idx === 0){
+			requestAnimationFrame(()=>{ wrapper.style.maxHeight = wrapper.scrollHeight + 'px'; hdr.classList.add('open'); });
+		}
+	});
 }
 
 // Helper to build fetch options that include Authorization header when token exists,
@@ -156,21 +186,24 @@ function loadBudget(){
 		if(r.status === 401) throw new Error('not-auth');
 		return r.json();
 	})
-	.then(j=>{
-		const el = document.getElementById('budgetAmount');
-		if(el) el.value = (j.amount || '') ;
-		const msg = document.getElementById('budgetMsg');
-		if(msg) msg.textContent = `Month: ${j.month}`;
-		// store current budget for comparison
-		window._currentBudget = parseFloat(j.amount) || 0;
-		window._currentBudgetMonth = j.month;
-		return j;
-	}).catch(e=>{
+	.then(renderBudget)
+	.catch(e=>{
 		if(e.message === 'not-auth') window.location = '/login';
 		else console.error(e);
 	});
 }
 
+function renderBudget(j){
+	const el = document.getElementById('budgetAmount');
+	if(el) el.value = (j.amount || '') ;
+	const msg = document.getElementById('budgetMsg');
+	if(msg) msg.textContent = `Month: ${j.month}`;
+	// store current budget for comparison
+	window._currentBudget = parseFloat(j.amount) || 0;
+	window._currentBudgetMonth = j.month;
+	return j;
+}
+
 function setBudget(){
 	const v = parseFloat(document.getElementById('budgetAmount').value || 0);
 	fetch('/api/budget', buildAuthOptions('POST', {amount: v}))
@@ -197,98 +230,123 @@ function setBudget(){
 
 // Fetch summary and render charts using Chart.js
 function loadSummary(){
-	fetch('/api/summary', buildAuthOptions())
+	// top merchants are only shown on the analytics page
+	fetch('/api/summary?sections=total,by_category,monthly', buildAuthOptions())
 	.then(res => {
 		if(res.status === 401) throw new Error('not-auth');
 		return res.json();
 	})
-	.then(data => {
-		document.getElementById('totalAmount').textContent = data.total.toFixed(2);
+	.then(renderSummary)
+	.catch(err => {
+		if(err.message === 'not-auth'){
+			// redirect to login
+			window.location = '/login';
+		} else console.error(err);
+	});
+}
 
-		// category chart (page-specific or dashboard)
-		const catLabels = data.by_category.map(c => c.category);
-		const catData = data.by_category.map(c => c.total);
-		if(document.getElementById('categoryChart')){
-			const catCtx = document.getElementById('categoryChart').getContext('2d');
-			if(window._catChart) window._catChart.destroy();
-			window._catChart = new Chart(catCtx, {
-				type: 'doughnut',
-				data: { labels: catLabels, datasets: [{ data: catData, backgroundColor: generateColors(catData.length) }] },
-				options: { plugins: { legend: { position: 'bottom' } } }
-			});
-		}
+function renderSummary(data){
+	document.getElementById('totalAmount').textContent = data.total.toFixed(2);
+
+	// category chart (page-specific or dashboard)
+	const catLabels = data.by_category.map(c => c.category);
+	const catData = data.by_category.map(c => c.total);
+	if(document.getElementById('categoryChart')){
+		const catCtx = document.getElementById('categoryChart').getContext('2d');
+		if(window._catChart) window._catChart.destroy();
+		window._catChart = new Chart(catCtx, {
+			type: 'doughnut',
+			data: { labels: catLabels, datasets: [{ data: catData, backgroundColor: generateColors(catData.length) }] },
+			options: { plugins: { legend: { position: 'bottom' } } }
+		});
+	}
 
-		if(document.getElementById('dashCategoryChart')){
-			const catCtx2 = document.getElementById('dashCategoryChart').getContext('2d');
-			if(window._dashCatChart) window._dashCatChart.destroy();
-			window._dashCatChart = new Chart(catCtx2, {
-				type: 'doughnut',
-				data: { labels: catLabels, datasets: [{ data: catData, backgroundColor: generateColors(catData.length) }] },
-				options: { plugins: { legend: { position: 'bottom' } } }
-			});
-		}
+	if(document.getElementById('dashCategoryChart')){
+		const catCtx2 = document.getElementById('dashCategoryChart').getContext('2d');
+		if(window._dashCatChart) window._dashCatChart.destroy();
+		window._dashCatChart = new Chart(catCtx2, {
+			type: 'doughnut',
+			data: { labels: catLabels, datasets: [{ data: catData, backgroundColor: generateColors(catData.length) }] },
+			options: { plugins: { legend: { position: 'bottom' } } }
+		});
+	}
 
-		// monthly chart
-		const monthLabels = data.monthly.map(m => m.month);
-		const monthData = data.monthly.map(m => m.total);
-		if(document.getElementById('monthlyChart')){
-			const monthCtx = document.getElementById('monthlyChart').getContext('2d');
-			if(window._monthChart) window._monthChart.destroy();
-			window._monthChart = new Chart(monthCtx, {
-				type: 'bar',
-				data: { labels: monthLabels, datasets: [{ label: 'Spent', data: monthData, backgroundColor: 'rgba(79,70,229,0.8)' }] },
-				options: { scales: { y: { beginAtZero:true } }, plugins: { legend: { display:false } } }
-			});
-		}
+	// monthly chart
+	const monthLabels = data.monthly.map(m => m.month);
+	const monthData = data.monthly.map(m => m.total);
+	if(document.getElementById('monthlyChart')){
+		const monthCtx = document.getElementById('monthlyChart').getContext('2d');
+		if(window._monthChart) window._monthChart.destroy();
+		window._monthChart = new Chart(monthCtx, {
+			type: 'bar',
+			data: { labels: monthLabels, datasets: [{ label: 'Spent', data: monthData, backgroundColor: 'rgba(79,70,229,0.8)' }] },
+			options: { scales: { y: { beginAtZero:true } }, plugins: { legend: { display:false } } }
+		});
+	}
 
-		if(document.getElementById('dashMonthlyChart')){
-			const monthCtx2 = document.getElementById('dashMonthlyChart').getContext('2d');
-			if(window._dashMonthChart) window._dashMonthChart.destroy();
-			window._dashMonthChart = new Chart(monthCtx2, {
-				type: 'bar',
-				data: { labels: monthLabels, datasets: [{ label: 'Spent', data: monthData, backgroundColor: 'rgba(79,70,229,0.8)' }] },
-				options: { scales: { y: { beginAtZero:true } }, plugins: { legend: { display:false } } }
-			});
-		}
+	if(document.getElementById('dashMonthlyChart')){
+		const monthCtx2 = document.getElementById('dashMonthlyChart').getContext('2d');
+		if(window._dashMonthChart) window._dashMonthChart.destroy();
+		window._dashMonthChart = new Chart(monthCtx2, {
+			type: 'bar',
+			data: { labels: monthLabels, datasets: [{ label: 'Spent', data: monthData, backgroundColor: 'rgba(79,70,229,0.8)' }] },
+			options: { scales: { y: { beginAtZero:true } }, plugins: { legend: { display:false } } }
+		});
+	}
 
-		// check budget exceed and update progress/alert
-		try{
-			const budget = parseFloat(window._currentBudget || 0);
-			const total = parseFloat(data.total || 0);
-			const alertEl = document.getElementById('budgetAlert');
-			const progInner = document.getElementById('budgetProgressInner');
-			if(progInner){
-				if(budget > 0){
-					let pct = Math.round((total / budget) * 100);
-					if(pct < 0) pct = 0;
-					if(pct > 100) pct = 100;
-					progInner.style.width = pct + '%';
-				} else {
-					progInner.style.width = '0%';
-				}
+	// check budget exceed and update progress/alert
+	try{
+		const budget = parseFloat(window._currentBudget || 0);
+		const total = parseFloat(data.total || 0);
+		const alertEl = document.getElementById('budgetAlert');
+		const progInner = document.getElementById('budgetProgressInner');
+		if(progInner){
+			if(budget > 0){
+				let pct = Math.round((total / budget) * 100);
+				if(pct < 0) pct = 0;
+				if(pct > 100) pct = 100;
+				progInner.style.width = pct + '%';
+			} else {
+				progInner.style.width = '0%';
 			}
+		}
 
-			if(alertEl){
-				if(budget > 0 && total > budget){
-					alertEl.style.display = 'block';
-					alertEl.className = 'budget-alert warn';
-					const over = (total - budget).toFixed(2);
-					alertEl.textContent = `Budget exceeded by ${over} (${((total/budget)*100).toFixed(0)}%)`;
-				} else if(budget > 0){
-					alertEl.style.display = 'block';
-					alertEl.className = 'budget-alert ok';
-					const pct = ((total / budget) * 100).toFixed(0);
-					alertEl.textContent = `${pct}% of budget used`;
-				} else {
-					alertEl.style.display = 'none';
-				}
+		if(alertEl){
+			if(budget > 0 && total > budget){
+				alertEl.style.display = 'block';
+				alertEl.className = 'budget-alert warn';
+				const over = (total - budget).toFixed(2);
+				alertEl.textContent = `Budget exceeded by ${over} (${((total/budget)*100).toFixed(0)}%)`;
+			} else if(budget > 0){
+				alertEl.style.display = 'block';
+				alertEl.className = 'budget-alert ok';
+				const pct = ((total / budget) * 100).toFixed(0);
+				alertEl.textContent = `${pct}% of budget used`;
+			} else {
+				alertEl.style.display = 'none';
 			}
-		}catch(e){ console.error(e) }
-	}).catch(err => {
-		if(err.message === 'not-auth'){
-			// redirect to login
-			window.location = '/login';
-		} else console.error(err);
+		}
+	}catch(e){ console.error(e) }
+}
+
+// Load budget, summary and the first expense page in a single request.
+// The browser revalidates with If-None-Match, so an unchanged dashboard is a 304.
+function loadDashboard(){
+	fetch('/api/dashboard', buildAuthOptions())
+	.then(res => {
+		if(res.status === 401) throw new Error('not-auth');
+		return res.json();
+	})
+	.then(d => {
+		renderBudget(d.budget);
+		if(document.getElementById('categoryChart')) renderSummary(d.summary);
+		if(!document.getElementById('expenseBody')) return;
+		// older history is fetched on "Load more"
+		showExpensePage({expenses: d.expenses || [], next_cursor: d.next_cursor}, false);
+	})
+	.catch(err => {
+		if(err.message === 'not-auth') window.location = '/login';
+		else console.error(err);
 	});
 }
 
@@ -365,23 +423,60 @@ function loadAnalytics(){
 	});
 }
 
+// Live updates: /api/events names the user's data scopes as they change (in
+// any tab, device or group member's session), so pages refetch instead of polling.
+// Bursts such as a bulk import are coalesced into one refresh.
+function watchChanges(onChange){
+	// only rendered when the server streams events (asgi_app.py with CHANGE_FEED=on)
+	if(!window.EventSource || !document.querySelector('meta[name="live-updates"]')) return null;
+	// the stream authenticates with the session cookie; without one it closes
+	const source = new EventSource('/api/events');
+	let timer = null;
+	let changed = new Set();
+	source.addEventListener('invalidate', e => {
+		const change = JSON.parse(e.data);
+		changed.add(change.scope === 'group' ? 'group:' + change.id : change.scope);
+		clearTimeout(timer);
+		timer = setTimeout(() => {
+			const scopes = changed;
+			changed = new Set();
+			onChange(scopes);
+		}, 300);
+	});
+	return source;
+}
+
 // Initialize charts and table on page load
 document.addEventListener('DOMContentLoaded', function(){
-	if(document.getElementById('expenseBody')) loadExpenses();
-	// If we have budget controls, load budget first then summary so we can compare totals
+	// If we have budget controls, one dashboard request brings budget, summary and expenses
 	if(document.getElementById('budgetAmount')){
-		loadBudget().then(()=>{
-			if(document.getElementById('categoryChart')) loadSummary();
-		});
+		loadDashboard();
 		const btn = document.getElementById('setBudgetBtn');
 		if(btn) btn.addEventListener('click', setBudget);
 	} else {
+		if(document.getElementById('expenseBody')) loadExpenses();
 		if(document.getElementById('categoryChart')) loadSummary();
 	}
+	const more = document.getElementById('loadMoreExpenses');
+	if(more) more.addEventListener('click', loadMoreExpenses);
+	if(document.getElementById('budgetAmount') || document.getElementById('expenseBody') || document.getElementById('categoryChart')){
+		watchChanges(scopes => {
+			// expenses and budgets share the user scope
+			if(!scopes.has('user')) return;
+			if(document.getElementById('budgetAmount')) loadDashboard();
+			else {
+				if(document.getElementById('expenseBody')) loadExpenses();
+				if(document.getElementById('categoryChart')) loadSummary();
+			}
+		});
+	}
 });
 
 // --- Tabs and Add-Expense form integration on index page ---
 function showTab(id){
+	// pages without the tabbed layout load their data in the handler above;
+	// loading again here would fetch budget and summary twice
+	if(!document.getElementById(id)) return;
 	const sections = ['dashboardSection','addSection','viewSection'];
 	sections.forEach(s => {
 		const el = document.getElementById(s);
@@ -0,0 +1,112 @@
+"""
+Summary Engine for SpendWise
+Builds every expense summary section from a single $facet aggregation so the
+user's expenses are matched and scanned once per request.
+
+Sections:
+    total          - overall amount spent
+    by_category    - totals per category, largest first
+    monthly        - totals per YYYY-MM, oldest first
+    top_merchants  - top 10 notes/merchants by amount
+"""
+
+from typing import Dict, Any, Iterable, List, Tuple
+
+import dates
+
+SECTIONS = ("total", "by_category", "monthly", "top_merchants")
+
+# Fields each section needs from an expense document
+_SECTION_FIELDS = {
+    "total": ("amount",),
+    "by_category": ("amount", "category"),
+    "monthly": ("amount",) + dates.MONTH_FIELDS,
+    "top_merchants": ("amount", "note"),
+}
+
+# '$ym' once every expense carries the bucket (see dates.py); with only
+# user/amount/ym projected, the monthly section is covered by the
+# (user, ym, amount) index.
+MONTH_EXPR = dates.MONTH_EXPR
+
+TOP_MERCHANTS_LIMIT = 10
+
+
+def parse_sections(raw: str = None) -> Tuple[str, ...]:
+    """Parse a comma separated `sections=` value. Raises ValueError on unknown names.
+
+    A missing or blank value (including `sections=,`) selects every section.
+    """
+    requested = [s.strip() for s in (raw or "").split(",") if s.strip()]
+    if not requested:
+        return SECTIONS
+    unknown = [s for s in requested if s not in SECTIONS]
+    if unknown:
+        raise ValueError(f"unknown sections: {', '.join(unknown)}")
+    # keep canonical order and drop duplicates
+    return tuple(s for s in SECTIONS if s in requested)
+
+
+def _facet(section: str) -> List[Dict[str, Any]]:
+    if section == "total":
+        return [{"$group": {"_id": None, "total": {"$sum": "$amount"}}}]
+    if section == "by_category":
+        return [
+            {"$group": {"_id": "$category", "total": {"$sum": "$amount"}}},
+            {"$sort": {"total": -1}}
+        ]
+    if section == "monthly":
+        return [
+            {"$group": {"_id": MONTH_EXPR, "total": {"$sum": "$amount"}}},
+            {"$sort": {"_id": 1}}
+        ]
+    if section == "top_merchants":
+        return [
+            {"$match": {"note": {"$ne": None}}},
+            {"$group": {"_id": "$note", "total": {"$sum": "$amount"}}},
+            {"$sort": {"total": -1}},
+            {"$limit": TOP_MERCHANTS_LIMIT}
+        ]
+    raise ValueError(f"unknown section: {section}")
+
+
+def build_pipeline(match: Dict[str, Any], sections: Iterable[str] = SECTIONS) -> List[Dict[str, Any]]:
+    """Return the aggregation pipeline computing `sections` for documents matching `match`."""
+    sections = tuple(sections)
+    fields = {f for s in sections for f in _SECTION_FIELDS[s]}
+    projection = {"_id": 0}
+    projection.update({f: 1 for f in sorted(fields)})
+    return [
+        {"$match": match},
+        {"$project": projection},
+        {"$facet": {s: _facet(s) for s in sections}}
+    ]
+
+
+def shape_result(doc: Dict[str, Any], sections: Iterable[str] = SECTIONS) -> Dict[str, Any]:
+    """Convert the single $facet output document into the API response shape."""
+    doc = doc or {}
+    out = {}
+    for s in sections:
+        rows = doc.get(s, [])
+        if s == "total":
+            out["total"] = rows[0]["total"] if rows else 0.0
+        elif s == "by_category":
+            out["by_category"] = [{"category": r["_id"], "total": r["total"]} for r in rows]
+        elif s == "monthly":
+            out["monthly"] = [{"month": r["_id"], "total": r["total"]} for r in rows]
+        elif s == "top_merchants":
+            out["top_merchants"] = [{"merchant": r["_id"], "total": r["total"]} for r in rows]
+    return out
+
+
+def run_summary(collection, match: Dict[str, Any], sections: Iterable[str] = SECTIONS) -> Dict[str, Any]:
+    """Compute the requested summary sections in one round trip."""
+    sections = tuple(sections)
+    result = list(collection.aggregate(build_pipeline(match, sections)))
+    return shape_result(result[0] if result else None, sections)
+
+
+def monthly_totals(collection, match: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Return [{'month': 'YYYY-MM', 'total': float}, ...] sorted by month."""
+    return run_summary(collection, match, ("monthly",))["monthly"]
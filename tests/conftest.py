@@ -0,0 +1,53 @@
+"""
+Shared fixtures for the SpendWise test suite.
+
+The app runs against mongomock (see requirements-dev.txt), so the tests need
+no MongoDB server; every test starts from an empty database and empty
+in-process caches.
+"""
+
+import os
+import sys
+
+import mongomock
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MONGODB_DB_NAME", "SpendWiseTest")
+
+import db_utils  # noqa: E402
+
+db_utils.MongoClient = mongomock.MongoClient
+
+import app as appmod  # noqa: E402
+import columnar  # noqa: E402
+from cache import build_result_cache  # noqa: E402
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """The app's database, emptied, with fresh result and column caches."""
+    database = db_utils.get_db()
+    for name in database.list_collection_names():
+        database.drop_collection(name)
+    for cache in (appmod.token_cache, appmod.user_cache, appmod.membership_cache):
+        cache.clear()
+    monkeypatch.setattr(appmod, "result_cache", build_result_cache())
+    monkeypatch.setattr(appmod, "column_cache", columnar.ColumnCache())
+    return database
+
+
+@pytest.fixture
+def client(db):
+    return appmod.create_app({"TESTING": True}).test_client()
+
+
+@pytest.fixture
+def login(client):
+    """login(username) signs the user up and returns headers carrying their token."""
+    def login(username="alice"):
+        client.post("/api/signup", json={"username": username, "email": f"{username}@example.com",
+                                         "password": "pw"})
+        resp = client.post("/api/login", json={"username": username, "password": "pw"})
+        return {"Authorization": "Bearer " + resp.get_json()["token"]}
+    return login
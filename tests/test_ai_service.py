@@ -0,0 +1,151 @@
+"""The background AI pipeline, against a stub of the genai client."""
+
+import threading
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+import app as appmod
+from ai_service import AIBusy, AIService, LocalJobStore, MongoJobStore
+
+
+class StubClient:
+    """Stands in for genai.Client: replies once `release` is set."""
+
+    def __init__(self, fail=False):
+        self.release = threading.Event()
+        self.calls = []
+        self.fail = fail
+        self.models = self
+
+    def generate_content(self, model, contents):
+        self.calls.append(contents)
+        self.release.wait(5)
+        if self.fail:
+            raise RuntimeError("model unavailable")
+        return SimpleNamespace(text=f"answer to {contents}")
+
+
+def wait_for(poll, timeout=5):
+    """Call poll() until it returns something truthy."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = poll()
+        if result:
+            return result
+        time.sleep(0.01)
+    raise AssertionError("timed out")
+
+
+class AtomicCollection:
+    """mongomock's replace_one is not atomic across threads (a concurrent
+    find_one can see a half-written document); MongoDB's is, so serialize them."""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.lock = threading.Lock()
+
+    def replace_one(self, *args, **kwargs):
+        with self.lock:
+            return self.collection.replace_one(*args, **kwargs)
+
+    def find_one(self, *args, **kwargs):
+        with self.lock:
+            return self.collection.find_one(*args, **kwargs)
+
+
+@pytest.fixture(params=["local", "mongo"])
+def jobs(request, db):
+    if request.param == "local":
+        return LocalJobStore()
+    return MongoJobStore(AtomicCollection(db.ai_jobs))
+
+
+@pytest.fixture
+def stub():
+    client = StubClient()
+    yield client
+    client.release.set()
+
+
+def make_service(stub, jobs, **options):
+    options.setdefault("per_user_limit", 1)
+    return AIService(client_factory=lambda: stub, jobs=jobs, max_workers=2, **options)
+
+
+def test_job_runs_in_background_and_is_polled(stub, jobs):
+    service = make_service(stub, jobs)
+    job = service.submit("alice", "Where did my money go?")
+    assert job["status"] in ("queued", "running")
+
+    stub.release.set()
+    done = wait_for(lambda: (service.get_job(job["id"], "alice") or {}).get("status") == "done"
+                    and service.get_job(job["id"], "alice"))
+    assert done["reply"] == "answer to Where did my money go?"
+    # other users cannot read the job
+    assert service.get_job(job["id"], "bob") is None
+
+
+def test_limits_and_reply_cache(stub, jobs):
+    service = make_service(stub, jobs, max_pending=2)
+    first = service.submit("alice", "How much on food?")
+    with pytest.raises(AIBusy):
+        service.submit("alice", "And on rent?")
+    service.submit("bob", "Hi")
+    with pytest.raises(AIBusy):
+        service.submit("carol", "Hi")
+
+    stub.release.set()
+    wait_for(lambda: service.get_job(first["id"], "alice")["status"] == "done")
+    wait_for(lambda: service.stats()["pending"] == 0)
+    # equivalent prompts share the cached reply
+    assert service.cached_reply("  how much ON food? ") == "answer to How much on food?"
+    assert len(stub.calls) == 2
+
+
+def test_failed_job_reports_the_error(jobs):
+    stub = StubClient(fail=True)
+    stub.release.set()
+    service = make_service(stub, jobs)
+    job = service.submit("alice", "Hi")
+    failed = wait_for(lambda: service.get_job(job["id"], "alice")["status"] == "error"
+                      and service.get_job(job["id"], "alice"))
+    assert failed["error"] == "model unavailable"
+    assert service.cached_reply("Hi") is None
+
+
+def test_mongo_jobs_expire_from_completion(stub, db):
+    service = make_service(stub, MongoJobStore(AtomicCollection(db.ai_jobs)), job_ttl=60)
+    job = service.submit("alice", "Hi")
+    stub.release.set()
+    wait_for(lambda: service.get_job(job["id"], "alice")["status"] == "done")
+    finished = datetime.utcnow()
+    expires_at = db.ai_jobs.find_one({"_id": job["id"]})["expires_at"]
+    assert 55 <= (expires_at - finished).total_seconds() <= 60
+
+
+def test_ai_routes(client, db, login, stub, monkeypatch):
+    monkeypatch.setattr(appmod, "ai_service", make_service(stub, MongoJobStore(AtomicCollection(db.ai_jobs))))
+    login("alice")
+
+    resp = client.post("/api/ai", json={"message": "Summarise my month"})
+    assert resp.status_code == 202
+    job = resp.get_json()
+    assert job["status_url"] == f"/api/ai/jobs/{job['job_id']}"
+
+    busy = client.post("/api/ai", json={"message": "Another question"})
+    assert busy.status_code == 429
+    assert busy.headers["Retry-After"] == "2"
+
+    stub.release.set()
+    done = wait_for(lambda: (lambda r: r["status"] == "done" and r)(client.get(job["status_url"]).get_json()))
+    assert done["reply"] == "answer to Summarise my month"
+
+    cached = client.post("/api/ai", json={"message": "summarise my  month"})
+    assert cached.status_code == 200
+    assert cached.get_json() == {"reply": "answer to Summarise my month", "cached": True}
+
+    assert client.get("/api/ai/jobs/unknown").status_code == 404
+    assert client.post("/api/ai", json={}).status_code == 400
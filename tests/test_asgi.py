@@ -0,0 +1,111 @@
+"""asgi_app's async routes: parity with Flask and result-cache hits."""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("starlette")
+pytest.importorskip("a2wsgi")
+from starlette.testclient import TestClient  # noqa: E402
+
+import app as appmod  # noqa: E402
+import asgi_app  # noqa: E402
+import columnar  # noqa: E402
+
+
+class Cursor:
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def sort(self, *args, **kwargs):
+        self.cursor = self.cursor.sort(*args, **kwargs)
+        return self
+
+    def limit(self, n):
+        self.cursor = self.cursor.limit(n)
+        return self
+
+    async def to_list(self, length):
+        await asyncio.sleep(0)
+        docs = list(self.cursor)
+        return docs if length is None else docs[:length]
+
+    def __aiter__(self):
+        self._it = iter(self.cursor)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._it)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class Collection:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def find(self, *args, **kwargs):
+        return Cursor(self.collection.find(*args, **kwargs))
+
+    def aggregate(self, pipeline):
+        return Cursor(self.collection.aggregate(pipeline))
+
+    async def find_one(self, *args, **kwargs):
+        return self.collection.find_one(*args, **kwargs)
+
+    async def update_one(self, *args, **kwargs):
+        return self.collection.update_one(*args, **kwargs)
+
+
+class AsyncDB:
+    """Motor's surface used by asgi_app, over the mongomock database;
+    records which collections each request touched."""
+
+    def __init__(self, db):
+        self.db = db
+        self.used = []
+
+    def __getitem__(self, name):
+        self.used.append(name)
+        return Collection(self.db[name])
+
+
+@pytest.fixture
+def async_db(db, monkeypatch):
+    fake = AsyncDB(db)
+    monkeypatch.setattr(asgi_app, "get_async_db", lambda: fake)
+    return fake
+
+
+@pytest.fixture
+def headers(client, login):
+    headers = login("alice")
+    for i, (category, date) in enumerate([("Food", "2026-07-03"), ("Rent", "2026-07-01"),
+                                           ("Food", "2026-08-15")]):
+        client.post("/add-expense", json={"amount": 10 + i, "category": category,
+                                          "note": f"shop{i % 2}", "date": date}, headers=headers)
+    return headers
+
+
+@pytest.mark.parametrize("path", ["/api/summary", "/api/summary?sections=total", "/api/analytics"])
+def test_matches_flask_and_serves_cache_hits_from_the_version_read(client, async_db, headers, path):
+    asgi = TestClient(asgi_app.app)
+    first = asgi.get(path, headers=headers)
+    assert first.json() == client.get(path, headers=headers).get_json()
+
+    async_db.used.clear()
+    again = asgi.get(path, headers=headers)
+    assert again.json() == first.json()
+    assert async_db.used == ["data_versions"]
+
+    assert asgi.get(path, headers={**headers, "If-None-Match": first.headers["etag"]}).status_code == 304
+
+
+@pytest.mark.parametrize("path", ["/api/summary", "/api/analytics"])
+def test_uses_the_column_cache(client, async_db, headers, monkeypatch, path):
+    monkeypatch.setattr(appmod, "column_cache", columnar.ColumnCache(2**20))
+    resp = TestClient(asgi_app.app).get(path, headers=headers)
+    assert appmod.column_cache.stats()["users"] == 1
+    appmod.result_cache.invalidate("user:alice")
+    assert resp.json() == client.get(path, headers=headers).get_json()
@@ -0,0 +1,48 @@
+"""Batch reports group both owner streams by user and match the live paths."""
+
+import batch_reports
+import forecasting
+import rollups
+import summary
+import versions
+
+EXPENSES = [
+    {"user": "bob", "amount": 5, "category": "Food", "note": "Cafe", "date": "2026-08-02"},
+    {"user_id": "alice", "amount": 7, "category": "Rent", "date": "2026-08-03"},
+    {"user": "alice", "amount": 3, "category": "Food", "date": "2026-09-03"},
+    {"user_id": "carol", "amount": 2, "category": "Food", "date": "2026-09-03"},
+    # legacy owner with a null `user`: only the user_id stream yields it
+    {"user": None, "user_id": "bob", "amount": 1, "category": "Fun", "date": "2026-09-04"},
+    # both fields set: counted once, through `user`
+    {"user": "bob", "user_id": "bob", "amount": 4, "category": "Fun", "date": "2026-09-05"},
+]
+
+
+def test_legacy_owners_are_grouped_with_their_user(db):
+    db.expenses.insert_many([dict(e) for e in EXPENSES])
+    chunks = list(batch_reports.iter_user_chunks(db, chunk_users=2))
+    assert [[u for u, _ in chunk] for chunk in chunks] == [["alice", "bob"], ["carol"]]
+    grouped = {u: sorted(d["amount"] for d in docs) for chunk in chunks for u, docs in chunk}
+    assert grouped == {"alice": [3, 7], "bob": [1, 4, 5], "carol": [2]}
+
+    reports = {u: r for chunk in chunks for u, r, _ in batch_reports.score_chunk(chunk)}
+    rollups.rebuild_rollups(db)
+    for username, report in reports.items():
+        assert report["summary"] == summary.run_summary(db.expenses, {"user": username},
+                                                        summary.SECTIONS)
+        assert report["forecast"] == forecasting.forecast_user(forecasting._user_month_docs(db, username))
+        assert report["owners"] == {"summary": ["user"], "forecast": ["user", "user_id"]}
+    assert reports["carol"]["summary"]["total"] == 0
+    assert reports["carol"]["forecast"]["prediction"] == 2
+
+
+def test_stored_reports_are_served_until_the_next_write(db):
+    db.expenses.insert_many([dict(e) for e in EXPENSES])
+    chunks = list(batch_reports.iter_user_chunks(db))
+    results = [r for chunk in chunks for r in batch_reports.score_chunk(chunk)]
+    batch_reports.write_results(db, results, batch_reports._user_versions(db))
+
+    report = batch_reports.load_report(db, "bob")
+    assert report["summary"]["total"] == 9 and report["owners"]["summary"] == ["user"]
+    versions.bump(db, versions.user_key("bob"))
+    assert batch_reports.load_report(db, "bob") is None
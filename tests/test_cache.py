@@ -0,0 +1,152 @@
+"""TTLCache, the result cache backends and their tag indexes."""
+
+import pytest
+
+import cache
+from cache import LocalBackend, RedisBackend, ResultCache, TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    return clock
+
+
+class FakeRedis:
+    """The slice of redis-py RedisBackend uses, with expiry on a fake clock."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.data = {}
+        self.expires = {}
+
+    def _live(self, key):
+        if key in self.expires and self.expires[key] <= self.clock():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return self.data.get(key)
+
+    def get(self, key):
+        value = self._live(key)
+        return None if value is None else value.encode("utf-8")
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+        self.expires.pop(key, None)
+        if ex is not None:
+            self.expires[key] = self.clock() + ex
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+
+    def sadd(self, key, *members):
+        self.data.setdefault(key, set()).update(m.encode("utf-8") for m in members)
+
+    def smembers(self, key):
+        return set(self._live(key) or ())
+
+    def expire(self, key, seconds):
+        if key in self.data:
+            self.expires[key] = self.clock() + seconds
+
+
+def test_ttl_cache_expires_and_evicts_least_recently_used(clock):
+    evicted = []
+    c = TTLCache(maxsize=2, ttl=10, on_evict=evicted.append)
+    c.set("a", 1)
+    c.set("b", 2)
+    assert c.get("a") == 1
+    c.set("c", 3)  # "b" is the least recently used
+    assert evicted == ["b"] and c.get("b") is None
+
+    clock.now += 10
+    assert c.get("a") is None
+    assert evicted == ["b", "a"]
+    c.set("d", 4, ttl=0)  # not stored
+    assert c.pop("c") == 3 and evicted == ["b", "a"]
+    assert c.stats() == {"size": 0, "maxsize": 2, "hits": 1, "misses": 2,
+                         "evictions": 1, "hit_ratio": 0.3333}
+
+
+def test_local_backend_prunes_tags_on_eviction(clock):
+    backend = LocalBackend(maxsize=2, ttl=60)
+    backend.set("k1", {"v": 1}, 60, tags=("user:alice",))
+    backend.set("k2", {"v": 2}, 60, tags=("user:alice", "group:g1"))
+    backend.set("k3", {"v": 3}, 60, tags=("user:bob",))  # evicts k1
+    assert backend.stats() == {"size": 2, "maxsize": 2, "evictions": 1, "tags": 3}
+    backend.set("k4", {"v": 4}, 60, tags=("user:carol",))  # evicts k2, its tags empty out
+    assert backend.stats()["tags"] == 2
+    assert backend._tags == {"user:bob": {"k3"}, "user:carol": {"k4"}}
+
+
+def test_local_backend_prunes_tags_on_expiry_and_invalidate(clock):
+    backend = LocalBackend(maxsize=10, ttl=60)
+    backend.set("old", 1, 5, tags=("user:alice",))
+    backend.set("new", 2, 60, tags=("user:alice", "user:bob"))
+    clock.now += 5
+    assert backend.get("old") is None
+    assert backend._tags == {"user:alice": {"new"}, "user:bob": {"new"}}
+
+    backend.invalidate("user:bob")
+    assert backend.get("new") is None
+    assert backend.stats()["tags"] == 0
+
+    # re-tagging a key drops it from its previous tags
+    backend.set("k", 1, 60, tags=("user:alice",))
+    backend.set("k", 2, 60, tags=("user:bob",))
+    assert backend._tags == {"user:bob": {"k"}}
+
+
+def test_redis_backend_round_trips_and_invalidates_by_tag(clock):
+    client = FakeRedis(clock)
+    backend = RedisBackend(client, prefix="t:")
+    backend.set("a", {"total": 1.5}, 30, tags=("user:alice",))
+    backend.set("b", [1, 2], 30, tags=("user:alice", "user:bob"))
+    backend.set("c", "x", 30, tags=("user:bob",))
+    assert backend.get("a") == {"total": 1.5}
+    assert client.expires["t:a"] == clock.now + 30
+    assert client.expires["t:tag:user:alice"] == clock.now + 30
+
+    backend.invalidate("user:alice")
+    assert backend.get("a") is None and backend.get("b") is None
+    assert backend.get("c") == "x"
+    assert "t:tag:user:alice" not in client.data
+
+    clock.now += 30
+    assert backend.get("c") is None
+
+
+def test_result_cache_falls_through_backend_errors(clock):
+    class Broken:
+        def get(self, *args):
+            raise ConnectionError("redis is down")
+
+        set = invalidate = get
+
+        def stats(self):
+            return {}
+
+    rc = ResultCache(Broken())
+    assert rc.get_or_compute("k", ("user:alice",), lambda: {"v": 1}) == {"v": 1}
+    rc.invalidate("user:alice")
+    assert rc.stats()["errors"] == 3 and rc.stats()["misses"] == 1
+
+    rc = ResultCache(RedisBackend(FakeRedis(clock)), ttl=60)
+    calls = []
+    compute = lambda: calls.append(1) or {"v": 2}  # noqa: E731
+    assert rc.get_or_compute("k", ("user:alice",), compute) == {"v": 2}
+    assert rc.get_or_compute("k", ("user:alice",), compute) == {"v": 2}
+    rc.invalidate("user:alice")
+    rc.get_or_compute("k", ("user:alice",), compute)
+    assert len(calls) == 2 and rc.stats()["hits"] == 1
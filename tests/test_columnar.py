@@ -0,0 +1,102 @@
+"""Column cache patches agree with a cold load, and its memory budget holds."""
+
+from datetime import datetime
+
+from bson import ObjectId
+
+import app as appmod
+import columnar
+import rollups
+import summary
+import versions
+
+
+def add(client, headers, expense):
+    resp = client.post("/add-expense", json=expense, headers=headers)
+    assert resp.status_code == 201
+    return resp.get_json()["id"]
+
+
+def cold(db, cache, username):
+    version = versions.get_versions(db, versions.user_key(username))[versions.user_key(username)]
+    docs = db.expenses.find(rollups.owner_filter(username), columnar.FIELDS)
+    return columnar.UserColumns.from_docs(version, docs, cache.table)
+
+
+def test_patched_columns_match_a_cold_load(client, db, login, monkeypatch):
+    cache = columnar.ColumnCache(2**20)
+    monkeypatch.setattr(appmod, "column_cache", cache)
+    headers = login("alice")
+    ids = [add(client, headers, {"amount": 10 + i, "category": c, "note": n, "date": d})
+           for i, (c, n, d) in enumerate([("Food", "Cafe", "2026-07-03"), ("Rent", "Landlord", "2026-07-01"),
+                                          ("Food", None, "2026-08-15"), (None, "Cafe", "2026-09-02")])]
+    db.expenses.insert_one({"user_id": "alice", "amount": 5.0, "category": "Food", "note": "Kiosk",
+                            "date": "2026-06-30"})
+    appmod.user_columns("alice")  # loaded once; the writes below patch it
+
+    add(client, headers, {"amount": 99, "category": "Travel", "note": "Airline", "date": "2026-09-10"})
+    edit = {"amount": 15, "category": "Groceries", "note": "Market", "date": "2026-10-01"}
+    assert client.put(f"/api/expense/{ids[0]}", json=edit, headers=headers).status_code == 200
+    assert client.delete(f"/api/expense/{ids[2]}", headers=headers).status_code == 200
+    assert cache.stats()["patches"] == 3 and cache.stats()["misses"] == 1
+
+    patched = appmod.user_columns("alice")
+    assert cache.stats()["misses"] == 1
+    rebuilt = cold(db, cache, "alice")
+    assert patched.version == rebuilt.version
+    assert sorted(patched.ids) == sorted(rebuilt.ids)
+    assert columnar.summarize(patched) == columnar.summarize(rebuilt)
+    assert columnar.rollup_docs(patched) == columnar.rollup_docs(rebuilt)
+    # and the summary still matches the $facet scan it replaces
+    assert columnar.summarize(patched) == summary.run_summary(db.expenses, {"user": "alice"},
+                                                              summary.SECTIONS)
+
+
+def test_a_patch_that_skips_a_version_drops_the_entry(db):
+    cache = columnar.ColumnCache(2**20)
+    doc = {"_id": ObjectId(), "user": "alice", "amount": 1.0, "date": datetime(2026, 7, 1)}
+    cache.get("alice", 1, lambda: [doc])
+    cache.apply("alice", 3, upserted=[dict(doc, amount=2.0)])
+    assert cache.stats()["users"] == 0 and cache.stats()["patches"] == 0
+
+
+def docs_for(user, rows, note=lambda i: None):
+    return [{"_id": ObjectId(), "user": user, "amount": float(i), "category": ("Food", "Rent")[i % 2],
+             "note": note(i), "date": datetime(2026, 1 + i % 12, 1)} for i in range(rows)]
+
+
+def test_budget_evicts_least_recently_used_users(db):
+    budget = 12_000
+    cache = columnar.ColumnCache(budget)
+    for user in ("a", "b", "c", "d"):
+        cache.get(user, 1, lambda user=user: docs_for(user, 100))
+        assert cache.stats()["bytes"] <= budget
+    stats = cache.stats()
+    assert stats["users"] == 2 and stats["evictions"] == 2
+    assert stats["bytes"] == sum(c.nbytes for c in cache._entries.values()) + stats["table_bytes"]
+    assert list(cache._entries) == ["c", "d"]
+
+    # a patch that grows an entry past the budget evicts the other users
+    cache.apply("d", 2, upserted=docs_for("d", 150))
+    assert cache.stats()["bytes"] <= budget
+    assert list(cache._entries) == ["d"]
+
+
+def test_string_table_counts_toward_the_budget(db):
+    budget = 40_000
+    cache = columnar.ColumnCache(budget)
+    cache.get("a", 1, lambda: docs_for("a", 50))
+    before = cache.stats()
+    assert before["table_bytes"] > 0 and before["bytes"] > cache._entries["a"].nbytes
+
+    # free-text notes grow the table past TABLE_SHARE: the whole cache starts over
+    cols = cache.get("b", 1, lambda: docs_for("b", 200, note=lambda i: f"merchant number {i:05d}"))
+    assert cols is not None and len(cols) == 200
+    stats = cache.stats()
+    assert stats["bytes"] <= budget
+    assert stats["users"] == 0 and stats["strings"] == 1
+    assert stats["evictions"] >= 1
+
+    # the next load starts from a fresh table and fits again
+    cache.get("a", 1, lambda: docs_for("a", 50))
+    assert cache.stats()["users"] == 1 and cache.stats()["bytes"] <= budget
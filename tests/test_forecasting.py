@@ -0,0 +1,56 @@
+"""Stored forecasts and reports never move back to an older data version."""
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+import batch_reports
+import forecasting
+import versions
+
+MONTHS = [{"month": "2026-07", "category": "Food", "total": 10.0},
+          {"month": "2026-08", "category": "Food", "total": 20.0}]
+
+
+def stored(db, collection, username="alice"):
+    return db[collection].find_one({"_id": username})
+
+
+def test_get_forecast_stores_its_version(db):
+    result = forecasting.get_forecast(db, "alice", lambda: MONTHS)
+    assert result["prediction"] == 30.0
+    assert stored(db, forecasting.FORECASTS_COLLECTION)["version"] == 0
+    # a lookup now, the loader is not called
+    assert forecasting.get_forecast(db, "alice", lambda: 1 / 0) == result
+
+
+def test_a_slow_read_keeps_the_newer_forecast(db):
+    versions.bump(db, versions.user_key("alice"))
+    forecasting.get_forecast(db, "alice", lambda: MONTHS)
+    # a request that read version 0 before the bump finishes last
+    collection = db[forecasting.FORECASTS_COLLECTION]
+    with pytest.raises(DuplicateKeyError):
+        collection.update_one(*forecasting.forecast_upsert("alice", 0, {"prediction": -1}), upsert=True)
+    assert stored(db, forecasting.FORECASTS_COLLECTION)["version"] == 1
+
+
+def test_refresh_all_keeps_newer_and_replaces_equal_stamps(db):
+    db.expense_rollups.insert_many([{"user": u, **m} for u in ("alice", "bob") for m in MONTHS])
+    collection = db[forecasting.FORECASTS_COLLECTION]
+    collection.insert_many([
+        {"_id": "alice", "version": 3, "result": {"prediction": 1.0}},   # stored by a newer read
+        {"_id": "bob", "version": 0, "result": {"prediction": 1.0}},     # stale, same version
+    ])
+
+    assert forecasting.refresh_all(db) == {"users": 2, "batches": 1}
+    assert stored(db, forecasting.FORECASTS_COLLECTION, "alice")["result"] == {"prediction": 1.0}
+    assert stored(db, forecasting.FORECASTS_COLLECTION, "bob")["result"]["prediction"] == 30.0
+
+
+def test_batch_reports_keep_newer_reports(db):
+    db[batch_reports.REPORTS_COLLECTION].insert_one({"_id": "alice", "version": 2, "report": "newer"})
+    report = batch_reports.build_report([{"user": "alice", "amount": 5.0, "date": "2026-07-01"}])
+
+    batch_reports.write_results(db, [("alice", report, 1), ("bob", report, 1)], {"alice": 1, "bob": 4})
+    assert stored(db, batch_reports.REPORTS_COLLECTION)["report"] == "newer"
+    assert stored(db, batch_reports.REPORTS_COLLECTION, "bob")["version"] == 4
+    assert stored(db, forecasting.FORECASTS_COLLECTION, "bob")["result"] == report["forecast"]
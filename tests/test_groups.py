@@ -0,0 +1,43 @@
+"""Joining groups and the optional member cap."""
+
+from bson import ObjectId
+
+import app as appmod
+
+
+def create_group(client, headers):
+    resp = client.post("/api/group", json={"name": "Flat", "budget": 500}, headers=headers)
+    assert resp.status_code == 201
+    return resp.get_json()
+
+
+def join(client, login, username, token):
+    client.get("/logout")
+    login(username)
+    return client.get(f"/join-group/{token}")
+
+
+def members(db, group_id):
+    return db.groups.find_one({"_id": ObjectId(group_id)})["members"]
+
+
+def test_joins_are_uncapped_when_the_cap_is_off(client, db, login, monkeypatch):
+    monkeypatch.setattr(appmod, "GROUP_MAX_MEMBERS", 0)
+    group = create_group(client, login("owner"))
+    db.groups.update_one({}, {"$push": {"members": {"$each": [f"m{i}" for i in range(60)]}}})
+
+    assert join(client, login, "newcomer", group["invite_token"]).status_code == 302
+    assert "newcomer" in members(db, group["group_id"])
+
+
+def test_member_cap(client, db, login, monkeypatch):
+    monkeypatch.setattr(appmod, "GROUP_MAX_MEMBERS", 2)
+    group = create_group(client, login("owner"))
+
+    assert join(client, login, "bob", group["invite_token"]).status_code == 302
+    full = join(client, login, "carol", group["invite_token"])
+    assert full.status_code == 409
+    assert full.get_json() == {"error": "group is full"}
+    # existing members can still follow the link
+    assert join(client, login, "bob", group["invite_token"]).status_code == 302
+    assert members(db, group["group_id"]) == ["owner", "bob"]
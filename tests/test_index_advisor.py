@@ -0,0 +1,13 @@
+"""The index advisor's query shape catalog."""
+
+import index_advisor
+
+
+def test_every_issuer_exists():
+    assert index_advisor.unresolved_issuers() == []
+
+
+def test_unresolved_issuers_reports_stale_references():
+    shape = index_advisor.QueryShape("stale", "expenses", "forecasting.refresh_forecasts, app.budget_for (?month=)",
+                                     lambda s: {})
+    assert index_advisor.unresolved_issuers([shape]) == [("stale", "forecasting.refresh_forecasts")]
@@ -0,0 +1,34 @@
+"""/metrics stays closed unless a scrape token is set or it is opened explicitly."""
+
+import pytest
+
+import app as appmod
+
+
+@pytest.fixture
+def scrape(client, monkeypatch):
+    def scrape(token=None, public=False, headers=None):
+        monkeypatch.setattr(appmod, "METRICS_TOKEN", token)
+        monkeypatch.setattr(appmod, "METRICS_PUBLIC", public)
+        return client.get("/metrics", headers=headers or {})
+    return scrape
+
+
+def test_metrics_are_not_found_by_default(scrape):
+    assert scrape().status_code == 404
+
+
+def test_metrics_token_is_required_when_set(scrape):
+    assert scrape(token="s3").status_code == 401
+    assert scrape(token="s3", headers={"Authorization": "Bearer nope"}).status_code == 401
+    # a token still applies when METRICS_PUBLIC is also set
+    assert scrape(token="s3", public=True).status_code == 401
+    resp = scrape(token="s3", headers={"Authorization": "Bearer s3"})
+    assert resp.status_code == 200
+    assert "spendwise_http_request_duration_seconds" in resp.get_data(as_text=True)
+
+
+def test_metrics_public_opens_the_endpoint(scrape):
+    resp = scrape(public=True)
+    assert resp.status_code == 200
+    assert resp.mimetype == "text/plain"
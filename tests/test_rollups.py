@@ -0,0 +1,120 @@
+"""Rollups kept by the write routes agree with a rebuild and with the old scan."""
+
+from collections import defaultdict
+
+import rollups
+
+EXPENSES = [
+    {"amount": 12.5, "category": "Food", "note": "Cafe", "date": "2026-07-03"},
+    {"amount": 40, "category": "Rent", "note": "Landlord", "date": "2026-07-01"},
+    {"amount": 7.25, "category": "Food", "note": "Cafe", "date": "2026-08-15"},
+    {"amount": 3, "category": None, "note": None, "date": "2026-08-20"},
+    {"amount": 60, "category": "Travel", "note": "Airline", "date": "2026-09-02"},
+]
+
+
+def old_analytics(expenses):
+    """/api/analytics as it was computed before the rollups, minus the prediction
+    (with missing categories and notes labelled the way the rollups label them)."""
+    category_map = defaultdict(float)
+    monthly_map = defaultdict(float)
+    merchant_map = defaultdict(float)
+    for e in expenses:
+        amount = float(e["amount"])
+        category_map[e.get("category") or "Other"] += amount
+        monthly_map[e["date"][:7]] += amount
+        merchant_map[e.get("note") or "Unknown"] += amount
+    return {
+        "total_spent": sum(category_map.values()),
+        "top_merchant": max(merchant_map, key=merchant_map.get),
+        "spending_by_category": dict(category_map),
+        "monthly_trend": sorted(monthly_map.items()),
+    }
+
+
+def buckets(db):
+    """Both rollup collections, without _ids, in a comparable order."""
+    def rows(name, fields):
+        return sorted((tuple(d[f] for f in fields), d["total"], d["count"])
+                      for d in db[name].find())
+    return (rows(rollups.ROLLUPS_COLLECTION, ["user", "month", "category"]),
+            rows(rollups.MERCHANTS_COLLECTION, ["user", "merchant"]))
+
+
+def add(client, headers, expense):
+    resp = client.post("/add-expense", json=expense, headers=headers)
+    assert resp.status_code == 201
+    return resp.get_json()["id"]
+
+
+def test_incremental_rollups_match_a_rebuild(client, db, login):
+    headers = login("alice")
+    ids = [add(client, headers, e) for e in EXPENSES]
+    add(client, login("bob"), {"amount": 9, "category": "Food", "note": "Cafe", "date": "2026-07-04"})
+
+    edit = {"amount": 15, "category": "Groceries", "date": "2026-09-30"}
+    assert client.put(f"/api/expense/{ids[0]}", json=edit, headers=headers).status_code == 200
+    assert client.delete(f"/api/expense/{ids[3]}", headers=headers).status_code == 200
+
+    incremental = buckets(db)
+    months, merchants = incremental
+    # the deleted expense was the only one in its buckets
+    assert not [b for b in months if b[0][2] == rollups.DEFAULT_CATEGORY]
+    assert not [b for b in merchants if b[0][1] == rollups.DEFAULT_MERCHANT]
+
+    rollups.rebuild_rollups(db)
+    assert buckets(db) == incremental
+
+
+def test_rebuild_updates_in_place_and_drops_only_stale_buckets(db):
+    db.expenses.insert_many([
+        {"user": "alice", "amount": 10.0, "category": "Food", "note": "Cafe", "date": "2026-07-03"},
+        {"user_id": "alice", "amount": 5.0, "category": "Food", "note": "Cafe", "date": "2026-07-09"},
+    ])
+    months = db[rollups.ROLLUPS_COLLECTION]
+    months.insert_many([
+        {"user": "alice", "month": "2026-07", "category": "Food", "total": 99.0, "count": 9},
+        {"user": "alice", "month": "1999-01", "category": "Stale", "total": 1.0, "count": 1},
+    ])
+    kept_id = months.find_one({"category": "Food"})["_id"]
+
+    assert rollups.rebuild_rollups(db, "alice") == {"months": 1, "merchants": 1}
+    food = months.find_one({"user": "alice", "month": "2026-07", "category": "Food"})
+    # the legacy user_id expense counts, and the bucket kept its _id
+    assert (food["_id"], food["total"], food["count"]) == (kept_id, 15.0, 2)
+    assert months.count_documents({"category": "Stale"}) == 0
+
+
+def test_sync_keeps_buckets_created_during_the_scan(db):
+    collection = db[rollups.ROLLUPS_COLLECTION]
+    # written by a live $inc after the rebuild read the existing buckets
+    collection.insert_one({"user": "alice", "month": "2026-10", "category": "New", "total": 4.0, "count": 1})
+    rollups._sync_buckets(collection, ["user", "month", "category"], [], existing=[])
+    assert collection.count_documents({"category": "New"}) == 1
+
+
+def test_backfill_runs_once(db):
+    db.expenses.insert_one({"user": "alice", "amount": 20.0, "category": "Food",
+                            "note": "Cafe", "date": "2026-07-03", "group_id": "g1"})
+
+    assert rollups.backfill(db) == {"months": 1, "merchants": 1, "groups": 1}
+    marker = db[rollups.MIGRATIONS_COLLECTION].find_one({"_id": rollups.BACKFILL_ID})
+    assert marker["done"] is True
+
+    db.expenses.insert_one({"user": "alice", "amount": 5.0, "category": "Rent", "date": "2026-07-04"})
+    assert rollups.backfill(db) is None
+    assert db[rollups.ROLLUPS_COLLECTION].count_documents({"user": "alice"}) == 1
+
+
+def test_analytics_matches_the_old_aggregation(client, db, login):
+    headers = login("alice")
+    for e in EXPENSES:
+        add(client, headers, e)
+
+    result = client.get("/api/analytics", headers=headers).get_json()
+    assert {
+        "total_spent": result["total_spent"],
+        "top_merchant": result["top_merchant"],
+        "spending_by_category": {r["category"]: r["total_spent"] for r in result["spending_by_category"]},
+        "monthly_trend": [(r["month"], r["total_spent"]) for r in result["monthly_trend"]],
+    } == old_analytics(EXPENSES)
@@ -0,0 +1,101 @@
+"""
+Data Versions for SpendWise
+Monotonic per-user and per-group counters bumped by every write route. Read
+endpoints derive strong ETags from them, so a conditional GET can be answered
+with 304 without touching the expenses collection.
+
+Scopes:
+    user:<username>    - the user's expenses and budgets
+    income:<username>  - the user's income entries
+    groups:<username>  - the list of groups the user belongs to
+    group:<group_id>   - a group's settings, members and expenses
+"""
+
+import hashlib
+from typing import Any, Dict, Iterable, Tuple
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+
+VERSIONS_COLLECTION = "data_versions"
+
+DUPLICATE_KEY = 11000
+
+
+def user_key(username: str) -> str:
+    return f"user:{username}"
+
+
+def income_key(username: str) -> str:
+    return f"income:{username}"
+
+
+def groups_key(username: str) -> str:
+    return f"groups:{username}"
+
+
+def group_key(group_id: str) -> str:
+    return f"group:{group_id}"
+
+
+def bump(db, *keys: str) -> None:
+    """Atomically increment the version of every scope in `keys`."""
+    keys = [k for k in dict.fromkeys(keys) if k]
+    if not keys:
+        return
+    db[VERSIONS_COLLECTION].bulk_write([
+        UpdateOne({"_id": k}, {"$inc": {"v": 1}}, upsert=True) for k in keys
+    ], ordered=False)
+
+
+def bump_and_get(db, key: str) -> int:
+    """Increment one scope's version and return its new value."""
+    doc = db[VERSIONS_COLLECTION].find_one_and_update(
+        {"_id": key}, {"$inc": {"v": 1}}, upsert=True, return_document=ReturnDocument.AFTER
+    )
+    return doc["v"]
+
+
+def get_versions(db, *keys: str) -> Dict[str, int]:
+    """Return {key: version} for `keys`; scopes never written are version 0."""
+    found = {
+        d["_id"]: d.get("v", 0)
+        for d in db[VERSIONS_COLLECTION].find({"_id": {"$in": list(keys)}})
+    }
+    return {k: found.get(k, 0) for k in keys}
+
+
+def stamped_upsert(doc_id: Any, version: int, fields: Dict[str, Any], replace_equal: bool = False):
+    """(filter, update) for update_one(..., upsert=True) storing `fields` stamped
+    with `version`, only over an older stamp (or an equal one with
+    `replace_equal`). A document stamped newer makes the upsert raise
+    DuplicateKeyError, so a slow writer never replaces a newer result.
+    """
+    return ({"_id": doc_id, "version": {"$lte" if replace_equal else "$lt": version}},
+            {"$set": {**fields, "version": version}})
+
+
+def store_stamped(collection, writes: Iterable[Tuple[Any, int, Dict[str, Any]]]) -> None:
+    """Bulk stamped_upsert() of (doc_id, version, fields), replacing equal stamps.
+
+    Batch jobs use it: documents already stamped newer are left alone.
+    """
+    ops = [UpdateOne(*stamped_upsert(i, v, f, replace_equal=True), upsert=True) for i, v, f in writes]
+    if not ops:
+        return
+    try:
+        collection.bulk_write(ops, ordered=False)
+    except BulkWriteError as e:
+        if e.details.get("writeConcernErrors") or any(
+                err.get("code") != DUPLICATE_KEY for err in e.details.get("writeErrors", [])):
+            raise
+
+
+def etag_for(current: Dict[str, int], *parts: str) -> str:
+    """Hash versions plus request-specific parts (path, query) into an ETag value."""
+    h = hashlib.sha256()
+    for key in sorted(current):
+        h.update(f"{key}={current[key]}\0".encode("utf-8"))
+    for part in parts:
+        h.update(f"{part}\0".encode("utf-8"))
+    return h.hexdigest()